@@ -0,0 +1,648 @@
+import asyncio
+import copy
+import logging
+import time
+from functools import partial
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from python_dhl.resources.helper import Endpoint, MeasurementUnit
+from python_dhl.resources.response import (
+    DHLShipmentResponse,
+    DHLPickupResponse,
+    DHLResponse,
+    DHLUploadResponse,
+    DHLTrackingResponse,
+    DHLRatesResponse,
+    DHLValidateAddressResponse,
+)
+from python_dhl.cache import cache_key
+from python_dhl.deadline import DHLDeadline, reports_remaining_time
+from python_dhl.exceptions import DHLDeadlineExceededError, DHLShipmentExistsError
+from python_dhl.retry import (
+    VERIFY_AND_RETRY,
+    payload_idempotency_key,
+    shipment_idempotency_key,
+)
+from python_dhl.service import BaseDHLService, _record_call, is_timezone_aware
+from python_dhl.stream import parse_documents_async, require_ijson
+from python_dhl.tracking import TRACKING_GROUP_SIZE, tracking_groups
+from python_dhl.validation import DOCUMENT, PICKUP, SHIPMENT
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDHLService(BaseDHLService):
+    """
+    asyncio version of DHLService, with the same methods as coroutines.
+    All the calls share one pooled httpx.AsyncClient, so many requests can be in flight on one event loop.
+    Requires httpx: pip install python-dhl-api[async]
+    """
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        account_number,
+        test_mode=False,
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=5.0,
+        rate_limiter=None,
+        max_throttle_retries=3,
+        retry_policy=None,
+        retry_policies=None,
+        idempotency_store=None,
+        connect_timeout=10.0,
+        read_timeout=60.0,
+        circuit_breakers=None,
+        rates_cache=None,
+        address_cache=None,
+        single_flight=None,
+        json_codec=None,
+        validator=None,
+        transport=None,
+    ):
+        """
+        :param max_connections: maximum number of concurrent connections to DHL
+        :param max_keepalive_connections: number of idle connections kept open
+        :param keepalive_expiry: seconds an idle connection is kept open
+        :param rate_limiter: DHLRateLimiter pacing the calls per endpoint
+        :param max_throttle_retries: times a call answered with 429 is retried, honouring Retry-After
+        :param retry_policy: DHLRetryPolicy used for transient failures of every endpoint, None disables retries
+        :param retry_policies: dict endpoint -> DHLRetryPolicy overriding retry_policy
+        :param idempotency_store: DHLIdempotencyStore remembering created shipments and pickups
+        :param connect_timeout: seconds to wait for a connection to DHL, None waits forever
+        :param read_timeout: seconds to wait for DHL to answer, None waits forever
+        :param circuit_breakers: dict endpoint -> DHLCircuitBreaker, open breakers fail the calls immediately
+        :param rates_cache: DHLResponseCache reusing the answers of get_rates
+        :param address_cache: DHLResponseCache reusing the answers of validate_address
+        :param single_flight: DHLSingleFlight sharing one request between identical concurrent get_rates and validate_address
+        :param json_codec: DHLJSONCodec or name ("json", "orjson", "ujson", "auto") encoding payloads and decoding answers
+        :param validator: DHLPayloadValidator checking the shipment, pickup and document payloads before sending them
+        :param transport: httpx.AsyncBaseTransport sending the requests, e.g. DHLFakeServer.async_transport(),
+                          the connection limits are then ignored
+        """
+        if httpx is None:
+            raise ImportError(
+                "AsyncDHLService requires httpx: pip install python-dhl-api[async]"
+            )
+        BaseDHLService.__init__(
+            self,
+            api_key,
+            api_secret,
+            account_number,
+            test_mode,
+            rate_limiter,
+            max_throttle_retries,
+            retry_policy,
+            retry_policies,
+            idempotency_store,
+            connect_timeout,
+            read_timeout,
+            circuit_breakers,
+            rates_cache,
+            address_cache,
+            single_flight,
+            json_codec,
+            validator,
+        )
+        self.client = httpx.AsyncClient(
+            auth=httpx.BasicAuth(api_key, api_secret),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=None,
+            transport=transport,
+        )
+
+    async def close(self):
+        """
+        Closes the pooled connections. The service must not be used afterwards.
+        """
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(
+        self,
+        method,
+        path,
+        endpoint,
+        before_resend=None,
+        timeout=None,
+        deadline=None,
+        stream=False,
+        **kwargs,
+    ):
+        """
+        See DHLService._request, before_resend is a coroutine function
+        """
+        policy = self._retry_policy(endpoint)
+        breaker = self.circuit_breakers.get(endpoint.value)
+        attempt = 0
+        throttled = 0
+        while True:
+            if breaker is not None:
+                breaker.check(endpoint.value)
+            if self.rate_limiter is not None:
+                waited = await self.rate_limiter.acquire_async(
+                    endpoint.value, self._limiter_wait(deadline)
+                )
+                if waited is None:
+                    raise DHLDeadlineExceededError(deadline.seconds)
+            connect_timeout, read_timeout = self._call_timeout(timeout, deadline)
+            if breaker is not None:
+                breaker.before_call(endpoint.value)
+            started = time.monotonic()
+            try:
+                request = self.client.build_request(
+                    method,
+                    self.endpoint_url + path,
+                    timeout=httpx.Timeout(
+                        read_timeout, connect=connect_timeout, pool=connect_timeout
+                    ),
+                    **kwargs,
+                )
+                response = await self.client.send(request, stream=stream)
+            except httpx.TransportError as err:
+                _record_call(breaker, True, started)
+                if deadline is not None and deadline.remaining() <= 0:
+                    raise DHLDeadlineExceededError(deadline.seconds) from err
+                action, delay = self._retry_action(
+                    policy,
+                    attempt,
+                    method,
+                    before_resend is not None,
+                    deadline,
+                    error=err,
+                    not_sent=isinstance(
+                        err,
+                        (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout),
+                    ),
+                )
+                if action is None:
+                    raise
+                logger.info("DHL %s %s failed, retrying: %s", method, path, err)
+            except Exception:
+                _record_call(breaker, True, started)
+                raise
+            else:
+                _record_call(breaker, response.status_code >= 500, started)
+                if response.status_code == 429:
+                    delay = self._throttle_delay(
+                        endpoint, response.headers, throttled, deadline
+                    )
+                    throttled += 1
+                    await response.aclose()
+                    if delay:
+                        await asyncio.sleep(delay)
+                    continue
+                action, delay = self._retry_action(
+                    policy,
+                    attempt,
+                    method,
+                    before_resend is not None,
+                    deadline,
+                    status=response.status_code,
+                )
+                if action is None:
+                    return response
+                await response.aclose()
+                logger.info(
+                    "DHL %s %s answered %s, retrying",
+                    method,
+                    path,
+                    response.status_code,
+                )
+            attempt += 1
+            await asyncio.sleep(delay)
+            if action == VERIFY_AND_RETRY:
+                await before_resend(timeout, deadline)
+
+    def _json_body(self, payload):
+        """
+        Request arguments sending payload, a dict or already encoded JSON bytes
+        """
+        if not isinstance(payload, bytes):
+            payload = self.json_codec.dumps(payload)
+        return {"content": payload, "headers": {"Content-Type": "application/json"}}
+
+    async def _read_answer(self, dhl_response, document_sink):
+        """
+        Parses an answer, passing its documents to document_sink if given (the response is then streamed)
+        """
+        if document_sink is None:
+            return self._loads(dhl_response)
+        try:
+            if dhl_response.status_code >= 300:
+                await dhl_response.aread()
+                return self._loads(dhl_response)
+            return await parse_documents_async(
+                _AsyncReader(dhl_response.aiter_bytes()), document_sink
+            )
+        finally:
+            await dhl_response.aclose()
+
+    async def _coalesced(self, prefix, params, deadline, call):
+        if self.single_flight is None:
+            return await call()
+        return copy.copy(
+            await self.single_flight.do_async(cache_key(prefix, params), call, deadline)
+        )
+
+    async def _fetch_address_validation(self, params, timeout, deadline):
+        dhl_response = await self._request(
+            "GET",
+            "/address-validate",
+            Endpoint.ADDRESS_VALIDATE,
+            timeout=timeout,
+            deadline=deadline,
+            params=params,
+        )
+        data = self._loads(dhl_response)
+        response = self._validate_address_response(data)
+        if dhl_response.status_code == 200:
+            self._cache_answer(self.address_cache, "address", params, data)
+        elif dhl_response.status_code in (400, 404):
+            self._cache_answer(
+                self.address_cache, "address", params, data, negative=True
+            )
+        return response
+
+    async def _fetch_rates(self, params, timeout, deadline):
+        dhl_response = await self._request(
+            "GET",
+            "/rates",
+            Endpoint.RATES,
+            timeout=timeout,
+            deadline=deadline,
+            params=params,
+        )
+        data = self._loads(dhl_response)
+        response = self._rates_response(data)
+        if dhl_response.status_code == 200:
+            self._cache_answer(self.rates_cache, "rates", params, data)
+        return response
+
+    async def find_shipment(self, dhl_shipment, timeout=None, deadline=None):
+        """
+        Searches DHL for a shipment already created: one with all the customer references and the receiver
+        of dhl_shipment, shipped within a day of its ship date
+        :param dhl_shipment: DHLShipment with customer references
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries
+        :return: tracking number of the shipment, None if DHL has none
+        Raises ValueError if the shipment has no customer references and any other error if DHL cannot tell,
+        in both cases it is unknown whether the shipment exists.
+        """
+        if not dhl_shipment.customer_references:
+            raise ValueError("A shipment without customer references cannot be found.")
+        dhl_response = await self._request(
+            "GET",
+            "/tracking",
+            Endpoint.TRACKING,
+            timeout=timeout,
+            deadline=DHLDeadline.start(deadline),
+            params=self._shipment_lookup_params(dhl_shipment),
+        )
+        return self._found_shipment(
+            dhl_shipment, dhl_response.status_code, self._loads(dhl_response)
+        )
+
+    async def _check_not_shipped(self, dhl_shipment, timeout, deadline):
+        tracking_number = await self.find_shipment(dhl_shipment, timeout, deadline)
+        if tracking_number is not None:
+            raise DHLShipmentExistsError(tracking_number)
+
+    @reports_remaining_time
+    async def validate_address(
+        self, address, shipment_type, timeout=None, deadline=None
+    ):
+        """
+        Checks if an address is valid for a shipment
+        :param address: DHLAddress
+        :param shipment_type: ShipmentType
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :return: DHLValidateAddressResponse
+        """
+        try:
+            params = self._validate_address_params(address, shipment_type)
+            cached = self._cached_answer(self.address_cache, "address", params)
+            if cached is not None:
+                return self._validate_address_response(cached)
+            return await self._coalesced(
+                "address",
+                params,
+                deadline,
+                partial(self._fetch_address_validation, params, timeout, deadline),
+            )
+        except Exception as err:
+            return self._failure(DHLValidateAddressResponse, "No address found.", err)
+
+    @reports_remaining_time
+    async def get_rates(
+        self,
+        sender,
+        receiver,
+        product,
+        shipment_date,
+        with_customs="false",
+        unit_of_measurement=MeasurementUnit.METRIC.value,
+        timeout=None,
+        deadline=None,
+    ):
+        """
+        Returns DHL's product capabilities and prices (where applicable)
+        :param sender: DHLPostalAddress
+        :param receiver: DHLPostalAddress
+        :param product: DHLProduct
+        :param shipment_date: Datetime timezone aware
+        :param with_customs: true/false as string
+        :param unit_of_measurement: MeasurementUnit
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :return: DHLRatesResponse
+        """
+        try:
+            if not is_timezone_aware(shipment_date):
+                return DHLRatesResponse(
+                    success=False, error_title="Ship date is not timezone aware."
+                )
+            params = self._rates_params(
+                sender,
+                receiver,
+                product,
+                shipment_date,
+                with_customs,
+                unit_of_measurement,
+            )
+            cached = self._cached_rates(params)
+            if cached is not None:
+                return self._rates_response(*cached)
+            return await self._coalesced(
+                "rates",
+                params,
+                deadline,
+                partial(self._fetch_rates, params, timeout, deadline),
+            )
+        except Exception as err:
+            return self._failure(DHLRatesResponse, "No rates found.", err)
+
+    @reports_remaining_time
+    async def get_shipment_status(self, tracking_number, timeout=None, deadline=None):
+        """
+        Returns all statuses given a tracking number
+        :param tracking_number: string
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        """
+        try:
+            dhl_response = await self._request(
+                "GET",
+                "/shipments/" + str(tracking_number) + "/tracking",
+                Endpoint.TRACKING,
+                timeout=timeout,
+                deadline=deadline,
+            )
+            return self._tracking_response(self._loads(dhl_response))
+        except Exception as err:
+            return self._failure(DHLTrackingResponse, "No shipments found.", err)
+
+    async def track_group(self, tracking_numbers, timeout=None, deadline=None):
+        """
+        Returns the statuses of several shipments with one request, see DHLService.track_group
+        :return: DHLTrackingResults, a dict of DHLTrackingResponse by tracking number
+        """
+        tracking_numbers = [str(t) for t in tracking_numbers]
+        try:
+            dhl_response = await self._request(
+                "GET",
+                "/tracking",
+                Endpoint.TRACKING,
+                timeout=timeout,
+                deadline=DHLDeadline.start(deadline),
+                params=self._tracking_params(tracking_numbers),
+            )
+            return self._tracking_results(tracking_numbers, self._loads(dhl_response))
+        except Exception as err:
+            return self._tracking_failures(tracking_numbers, err)
+
+    async def track_many(
+        self,
+        tracking_numbers,
+        group_size=TRACKING_GROUP_SIZE,
+        max_concurrency=8,
+        timeout=None,
+        deadline=None,
+    ):
+        """
+        Tracks many shipments with one request per group of group_size tracking numbers,
+        at most max_concurrency requests in flight, see DHLService.track_many
+        :return: async iterator of (tracking number, DHLTrackingResponse) as the groups complete
+        """
+        groups = tracking_groups(tracking_numbers, group_size)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < max_concurrency:
+                    group = next(groups, None)
+                    if group is None:
+                        break
+                    pending.add(
+                        asyncio.ensure_future(
+                            self.track_group(group, timeout=timeout, deadline=deadline)
+                        )
+                    )
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    for item in task.result().items():
+                        yield item
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @reports_remaining_time
+    async def check_shipment(
+        self, tracking_number, timeout=None, deadline=None, document_sink=None
+    ):
+        """
+        Returns all documents available given a tracking number
+        :param tracking_number: string
+        :param document_sink: callable receiving each document as it is read, see ship
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        """
+        try:
+            if document_sink is not None:
+                require_ijson()
+            dhl_response = await self._request(
+                "GET",
+                "/shipments/" + str(tracking_number) + "/proof-of-delivery",
+                Endpoint.PROOF_OF_DELIVERY,
+                timeout=timeout,
+                deadline=deadline,
+                stream=document_sink is not None,
+            )
+            return self._proof_of_delivery_response(
+                await self._read_answer(dhl_response, document_sink)
+            )
+        except Exception as err:
+            return self._failure(
+                DHLUploadResponse, "No electronic proof of delivery found.", err
+            )
+
+    @reports_remaining_time
+    async def ship(
+        self,
+        dhl_shipment,
+        idempotency_key=None,
+        timeout=None,
+        deadline=None,
+        document_sink=None,
+    ):
+        """
+        Generates a shipping label and transmit shipment detail to DHL, see DHLService.ship
+        :param dhl_shipment: DHLShipment
+        :param idempotency_key: string, defaults to the account and the customer references
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :param document_sink: callable receiving each label document as it is read, see DHLService.ship
+        :return: DHLShipmentResponse
+        """
+        try:
+            if document_sink is not None:
+                require_ijson()
+            if not is_timezone_aware(dhl_shipment.ship_datetime):
+                return DHLShipmentResponse(
+                    success=False, error_title="Ship date is not timezone aware."
+                )
+            key = idempotency_key or shipment_idempotency_key(
+                dhl_shipment, self.account_number
+            )
+            response = self._remembered(key)
+            if response is not None:
+                return response
+            shipment = self._shipment_payload(dhl_shipment)
+            self._preflight(SHIPMENT, shipment)
+            before_resend = None
+            if dhl_shipment.customer_references:
+                before_resend = partial(self._check_not_shipped, dhl_shipment)
+            try:
+                dhl_response = await self._request(
+                    "POST",
+                    "/shipments",
+                    Endpoint.SHIPMENTS,
+                    timeout=timeout,
+                    deadline=deadline,
+                    before_resend=before_resend,
+                    stream=document_sink is not None,
+                    **self._json_body(shipment),
+                )
+                response = self._shipment_response(
+                    await self._read_answer(dhl_response, document_sink)
+                )
+            except DHLShipmentExistsError as err:
+                response = self._existing_shipment_response(err.tracking_number)
+            self._remember(key, response)
+            return response
+        except Exception as err:
+            return self._failure(DHLShipmentResponse, "Shipment error. No label.", err)
+
+    @reports_remaining_time
+    async def pickup(
+        self, dhl_pickup, idempotency_key=None, timeout=None, deadline=None
+    ):
+        """
+        Creates a DHL Express pickup booking request, see DHLService.pickup
+        :param dhl_pickup: DHLPickup
+        :param idempotency_key: string, defaults to a hash of the pickup request
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :return: DHLPickupResponse
+        """
+        try:
+            if not is_timezone_aware(dhl_pickup.pickup_datetime):
+                return DHLPickupResponse(
+                    success=False, error_title="Pickup date is not timezone aware."
+                )
+            pickup = self._pickup_payload(dhl_pickup)
+            self._preflight(PICKUP, pickup)
+            key = idempotency_key or payload_idempotency_key("pickup", pickup)
+            response = self._remembered(key)
+            if response is not None:
+                return response
+            dhl_response = await self._request(
+                "POST",
+                "/pickups",
+                Endpoint.PICKUPS,
+                timeout=timeout,
+                deadline=deadline,
+                **self._json_body(pickup),
+            )
+            response = self._pickup_response(self._loads(dhl_response))
+            self._remember(key, response)
+            return response
+        except Exception as err:
+            return self._failure(DHLPickupResponse, "Pickup error. No label.", err)
+
+    @reports_remaining_time
+    async def upload_document(self, dhl_document, timeout=None, deadline=None):
+        """
+        Uploads updated customs documentation for your DHL Express shipment that has not been picked up yet
+        :param dhl_document: DHLDocument
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :return: DHLResponse
+        """
+        try:
+            if not is_timezone_aware(dhl_document.original_planned_shipping_date):
+                return DHLResponse(
+                    success=False, error_title="Ship date is not timezone aware."
+                )
+            document_data = self._create_document(dhl_document)
+            self._preflight(DOCUMENT, document_data)
+            dhl_response = await self._request(
+                "PATCH",
+                "/shipments/" + dhl_document.tracking_number + "/upload-image",
+                Endpoint.UPLOAD_IMAGE,
+                timeout=timeout,
+                deadline=deadline,
+                **self._json_body(document_data),
+            )
+            return self._upload_response(self._loads(dhl_response))
+        except Exception as err:
+            return DHLResponse(
+                success=False, error_title=str(err), status=getattr(err, "status", None)
+            )
+
+
+class _AsyncReader:
+    """
+    File-like object with a coroutine read over the chunks of a streamed answer
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def read(self, size=-1):
+        if size == 0:
+            return b""
+        try:
+            return await self.chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
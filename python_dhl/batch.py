@@ -0,0 +1,196 @@
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from python_dhl.resources.response import DHLResponse
+
+
+class DHLBatchResult:
+    """
+    The outcome of one item of a batch.
+    index is the position of the item in the input iterable, elapsed the seconds spent on its call.
+    error is the exception raised by the call, whose response is then a failed DHLResponse.
+    """
+
+    def __init__(self, index, item, response, elapsed, error=None):
+        self.index = index
+        self.item = item
+        self.response = response
+        self.elapsed = elapsed
+        self.error = error
+
+    def __str__(self):
+        return "%s: %s" % (self.index, self.response)
+
+
+class DHLLatencyHistogram:
+    """
+    Latencies counted in buckets growing by precision (5% by default) from min_latency seconds,
+    so percentiles of any number of calls are estimated in constant memory.
+    """
+
+    def __init__(self, min_latency=0.001, max_latency=3600.0, precision=0.05):
+        self.min_latency = min_latency
+        self.growth = math.log1p(precision)
+        self.buckets = [0] * (self._bucket(max_latency) + 1)
+        self.count = 0
+
+    def _bucket(self, latency):
+        if latency <= self.min_latency:
+            return 0
+        return int(math.log(latency / self.min_latency) / self.growth) + 1
+
+    def record(self, latency):
+        self.buckets[min(self._bucket(latency), len(self.buckets) - 1)] += 1
+        self.count += 1
+
+    def percentile(self, percent):
+        """
+        :param percent: e.g. 50, 95, 99
+        :return: upper bound in seconds of the latency of percent% of the calls, None if there are none
+        """
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percent / 100.0)
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= max(rank, 1):
+                return self.min_latency * math.exp(self.growth * index)
+        return None
+
+
+class DHLBatchStats:
+    """
+    Aggregate timing of a batch, updated while the results are consumed.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.min_latency = None
+        self.max_latency = None
+        self.started_at = None
+        self.finished_at = None
+        self.latencies = DHLLatencyHistogram()
+
+    def record(self, result):
+        self.count += 1
+        if result.response.success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.total_latency += result.elapsed
+        self.latencies.record(result.elapsed)
+        if self.min_latency is None or result.elapsed < self.min_latency:
+            self.min_latency = result.elapsed
+        if self.max_latency is None or result.elapsed > self.max_latency:
+            self.max_latency = result.elapsed
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.count if self.count else None
+
+    def percentile(self, percent):
+        """
+        Estimated latency of percent% of the items, see DHLLatencyHistogram
+        """
+        latency = self.latencies.percentile(percent)
+        return min(latency, self.max_latency) if latency is not None else None
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self):
+        """
+        Completed items per second of wall time.
+        """
+        elapsed = self.elapsed
+        return self.count / elapsed if elapsed else None
+
+    def __str__(self):
+        return "%s items (%s ok, %s failed) in %.2fs" % (
+            self.count,
+            self.succeeded,
+            self.failed,
+            self.elapsed,
+        )
+
+
+class DHLBatch:
+    """
+    Runs a service call over an iterable with bounded concurrency and yields DHLBatchResult objects.
+    The input is consumed lazily: at most max_concurrency items are taken from it and in flight at once,
+    so a large generator of shipments is never materialized in memory.
+    With ordered=True results come back in input order, otherwise as soon as they complete.
+    An item whose call raises fails alone, the others go on.
+    Stats are available in batch.stats while and after iterating.
+    """
+
+    def __init__(self, call, items, max_concurrency=8, ordered=True):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.call = call
+        self.items = items
+        self.max_concurrency = max_concurrency
+        self.ordered = ordered
+        self.stats = DHLBatchStats()
+
+    def _run_one(self, index, item):
+        start = time.perf_counter()
+        try:
+            response = self.call(item)
+        except Exception as err:
+            return DHLBatchResult(
+                index,
+                item,
+                DHLResponse(
+                    success=False, error_title="Call failed.", error_detail=str(err)
+                ),
+                time.perf_counter() - start,
+                err,
+            )
+        return DHLBatchResult(index, item, response, time.perf_counter() - start)
+
+    def __iter__(self):
+        self.stats.started_at = time.perf_counter()
+        items = enumerate(self.items)
+        pending = deque() if self.ordered else set()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            while True:
+                while len(pending) < self.max_concurrency:
+                    next_item = next(items, None)
+                    if next_item is None:
+                        break
+                    future = executor.submit(self._run_one, *next_item)
+                    if self.ordered:
+                        pending.append(future)
+                    else:
+                        pending.add(future)
+                if not pending:
+                    break
+                if self.ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    self.stats.record(result)
+                    yield result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.stats.finished_at = time.perf_counter()
+
+    def results(self):
+        """
+        Runs the whole batch and returns the list of results.
+        """
+        return list(self)
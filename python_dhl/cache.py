@@ -0,0 +1,263 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class DHLCacheBackend:
+    """
+    Storage of a DHLResponseCache. Implement get and set (e.g. on Redis or memcached)
+    to share the cached DHL answers between processes.
+    Values are the JSON documents answered by DHL: dicts and lists of plain values.
+    """
+
+    def get(self, key):
+        """
+        :return: the value stored for key, None if it is missing or expired
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """
+        Stores value for ttl seconds
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class DHLMemoryCacheBackend(DHLCacheBackend):
+    """
+    In memory backend shared by the threads of the process. When it is full the least recently used value is dropped.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        :param max_size: maximum number of values kept
+        """
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.values.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.values[key]
+                return None
+            self.values.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.values[key] = (time.monotonic() + ttl, value)
+            self.values.move_to_end(key)
+            while len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def __len__(self):
+        return len(self.values)
+
+
+class DHLSQLiteCacheBackend(DHLCacheBackend):
+    """
+    Backend stored in a SQLite file on the local disk, shared by the threads and processes of the host
+    and kept across restarts. Expired values are deleted every purge_every writes.
+    """
+
+    def __init__(self, path, timeout=5.0, purge_every=1000):
+        """
+        :param path: file of the database, created if missing
+        :param timeout: seconds to wait for a lock held by another process
+        :param purge_every: number of writes between two purges of the expired values, 0 never purges
+        """
+        self.path = path
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self.writes = 0
+        self.local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS dhl_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM dhl_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key, value, ttl):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO dhl_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+        self.writes += 1
+        if self.purge_every and self.writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM dhl_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM dhl_cache")
+
+    def purge(self):
+        """
+        Deletes the expired values
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM dhl_cache WHERE expires_at < ?", (time.time(),)
+            )
+
+    def close(self):
+        """
+        Closes the connection of the current thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+class DHLResponseCache:
+    """
+    Opt-in cache of DHL answers, keyed on the normalized parameters of the request.
+    Cached answers are shared by every caller, they must not be modified.
+    Negative answers (e.g. an address DHL does not know) are cached only if negative_ttl is set.
+    get_model also keeps a model built from each answer (e.g. the DHLRates of a rates answer),
+    so it is built once per cached answer instead of once per hit.
+
+    cache = DHLResponseCache(ttl=600, max_size=50000)
+    service = DHLService(api_key, api_secret, account_number, rates_cache=cache)
+    """
+
+    def __init__(self, ttl=300, max_size=10000, backend=None, negative_ttl=None):
+        """
+        :param ttl: seconds an answer is reused
+        :param max_size: maximum number of answers kept by the default in memory backend
+        :param backend: DHLCacheBackend, defaults to a DHLMemoryCacheBackend
+        :param negative_ttl: seconds a negative answer is reused, None does not cache them
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = (
+            backend if backend is not None else DHLMemoryCacheBackend(max_size)
+        )
+        self.max_models = max_size
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, prefix, params):
+        return self._get(cache_key(prefix, params))
+
+    def _get(self, key):
+        value = self.backend.get(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get_model(self, prefix, params, build):
+        """
+        The cached answer and build(answer), reused while the backend returns the same answer object.
+        The in memory backend returns the stored answer itself, so the model is built once per answer;
+        backends decoding the answer on every get (e.g. SQLite) build it on every hit.
+        :param build: function building an immutable model from the answer
+        :return: (answer, model), None if the answer is not cached
+        """
+        key = cache_key(prefix, params)
+        value = self._get(key)
+        if value is None:
+            return None
+        with self.lock:
+            built = self.models.get(key)
+            if built is not None and built[0] is value:
+                self.models.move_to_end(key)
+                return value, built[1]
+        model = build(value)
+        with self.lock:
+            self.models[key] = (value, model)
+            self.models.move_to_end(key)
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+        return value, model
+
+    def set(self, prefix, params, value, negative=False):
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl is not None:
+            self.backend.set(cache_key(prefix, params), value, ttl)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def cache_key(prefix, params):
+    """
+    Key of a request: text values are compared without case and surrounding spaces, numbers by value
+    """
+    normalized = {
+        name: _normalize(value) for name, value in params.items() if value is not None
+    }
+    digest = hashlib.sha256(
+        json.dumps(normalized, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return "%s:%s" % (prefix, digest)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip().upper()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
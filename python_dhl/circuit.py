@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+
+from python_dhl.exceptions import DHLCircuitOpenError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class DHLCircuitBreaker:
+    """
+    Stops calling an endpoint that is failing or too slow, so callers fail immediately and can fall back.
+    The breaker looks at the last window_size calls: when at least min_calls were made and the rate of
+    failed calls (network errors, timeouts, 5xx) or of slow calls reaches its threshold, it opens.
+    After open_seconds it lets half_open_calls trial calls through: if they succeed it closes again,
+    otherwise it opens for another open_seconds.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=None,
+        slow_call_rate_threshold=0.8,
+        window_size=20,
+        min_calls=10,
+        open_seconds=30.0,
+        half_open_calls=1,
+        clock=time.monotonic,
+    ):
+        """
+        :param failure_rate_threshold: rate of failed calls opening the breaker, between 0 and 1
+        :param slow_call_seconds: calls longer than this are slow, None ignores the latency
+        :param slow_call_rate_threshold: rate of slow calls opening the breaker, between 0 and 1
+        :param window_size: number of recent calls considered
+        :param min_calls: calls needed in the window before the breaker can open
+        :param open_seconds: seconds the breaker stays open before trying again
+        :param half_open_calls: trial calls allowed when half open
+        :param clock: function returning the current time in seconds
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.calls = deque(maxlen=window_size)
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_calls = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_endpoints(cls, endpoints, **settings):
+        """
+        One breaker per endpoint with the same settings, to be passed as circuit_breakers to the service
+        :param endpoints: iterable of Endpoint
+        :return: dict endpoint -> DHLCircuitBreaker
+        """
+        return {endpoint.value: cls(**settings) for endpoint in endpoints}
+
+    def check(self, endpoint):
+        """
+        Raises DHLCircuitOpenError if the breaker is open, without taking a trial call
+        """
+        with self.lock:
+            if self.state == OPEN and self.retry_in() > 0:
+                self.rejected += 1
+                raise DHLCircuitOpenError(endpoint, self.retry_in())
+
+    def before_call(self, endpoint):
+        """
+        Raises DHLCircuitOpenError if the call must not be made, every allowed call must be recorded
+        """
+        with self.lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    raise DHLCircuitOpenError(endpoint, self.retry_in())
+                self.state = HALF_OPEN
+                self.trial_calls = 0
+            if self.state == HALF_OPEN:
+                if self.trial_calls >= self.half_open_calls:
+                    self.rejected += 1
+                    raise DHLCircuitOpenError(endpoint, self.retry_in())
+                self.trial_calls += 1
+
+    def record(self, failed, elapsed):
+        """
+        Records the outcome of a call
+        :param failed: True for network errors, timeouts and 5xx answers
+        :param elapsed: seconds the call took
+        """
+        slow = self.slow_call_seconds is not None and elapsed > self.slow_call_seconds
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self.calls.clear()
+                return
+            self.calls.append((failed, slow))
+            if self.state == CLOSED and len(self.calls) >= self.min_calls:
+                failures = sum(1 for f, s in self.calls if f) / len(self.calls)
+                slow_calls = sum(1 for f, s in self.calls if s) / len(self.calls)
+                if (
+                    failures >= self.failure_rate_threshold
+                    or slow_calls >= self.slow_call_rate_threshold
+                ):
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.calls.clear()
+
+    def retry_in(self):
+        """
+        Seconds before the breaker lets a trial call through, 0 if it is not open
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self.clock() - self.opened_at))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "calls": len(self.calls),
+                "failures": sum(1 for f, s in self.calls if f),
+                "slow_calls": sum(1 for f, s in self.calls if s),
+                "rejected": self.rejected,
+            }
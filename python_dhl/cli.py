@@ -0,0 +1,158 @@
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from python_dhl.batch import DHLBatchStats
+from python_dhl.fake import DHLFakeServer
+from python_dhl.manifest import CSV, JSONL, DHLManifestShipper
+from python_dhl.resources.shipment import DHLShipmentOutput
+from python_dhl.service import DHLService
+
+
+def main(argv=None):
+    """
+    python -m python_dhl ship orders.csv --logo logo.png --output results.jsonl --labels-dir labels
+    python -m python_dhl fake-server --port 8080 --latency 0.2 --throttle-rate 0.05
+    :return: exit code, 1 if some row failed
+    """
+    parser = argparse.ArgumentParser(prog="python -m python_dhl")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ship = commands.add_parser(
+        "ship",
+        help="ship the orders of a CSV or JSON Lines manifest and save their labels",
+    )
+    ship.add_argument("manifest", help="CSV or JSON Lines file, one shipment per row")
+    ship.add_argument("--format", choices=(CSV, JSONL), help="default from extension")
+    ship.add_argument("--output", default="results.jsonl", help="results JSON Lines")
+    ship.add_argument("--labels-dir", default="labels", help="label documents")
+    ship.add_argument("--checkpoint", help="default: <output>.checkpoint")
+    ship.add_argument("--checkpoint-every", type=int, default=100, metavar="ROWS")
+    ship.add_argument("--resume", action="store_true", help="continue a stopped run")
+    ship.add_argument("--concurrency", type=int, default=8, help="shipments in flight")
+    ship.add_argument("--defaults", help="JSON file of the values of missing columns")
+    ship.add_argument("--logo", required=True, help="logo printed on the labels")
+    ship.add_argument("--dpi", type=int, default=300)
+    ship.add_argument("--api-key", default=os.environ.get("DHL_API_KEY"))
+    ship.add_argument("--api-secret", default=os.environ.get("DHL_API_SECRET"))
+    ship.add_argument("--account", default=os.environ.get("DHL_ACCOUNT"))
+    ship.add_argument("--test-mode", action="store_true", help="use the DHL test API")
+    ship.add_argument("--endpoint-url", help="e.g. the URL of a fake-server")
+    ship.set_defaults(run=run_ship)
+    fake = commands.add_parser(
+        "fake-server", help="serve a fake MyDHL API on localhost for load tests"
+    )
+    fake.add_argument("--host", default="127.0.0.1")
+    fake.add_argument("--port", type=int, default=8080)
+    fake.add_argument("--latency", type=float, default=0.0, metavar="SECONDS")
+    fake.add_argument("--latency-jitter", type=float, default=0.0, metavar="SECONDS")
+    fake.add_argument("--error-rate", type=float, default=0.0, help="503 answers")
+    fake.add_argument("--throttle-rate", type=float, default=0.0, help="429 answers")
+    fake.add_argument("--retry-after", type=int, default=1, metavar="SECONDS")
+    fake.add_argument("--label-size", type=int, default=2048, metavar="BYTES")
+    fake.add_argument("--seed", type=int)
+    fake.set_defaults(run=run_fake_server)
+    args = parser.parse_args(argv)
+    return args.run(parser, args)
+
+
+def run_ship(parser, args):
+    if not (args.api_key and args.api_secret and args.account):
+        parser.error(
+            "set --api-key, --api-secret and --account "
+            "or DHL_API_KEY, DHL_API_SECRET and DHL_ACCOUNT"
+        )
+    defaults = None
+    if args.defaults:
+        with open(args.defaults, encoding="utf-8") as file:
+            defaults = json.load(file)
+    with open(args.logo, "rb") as file:
+        logo = base64.b64encode(file.read()).decode("ascii")
+    output_format = DHLShipmentOutput(
+        dpi=args.dpi,
+        logo_file_format=os.path.splitext(args.logo)[1].lstrip(".") or "png",
+        logo_file_base64=logo,
+    )
+    with DHLService(
+        args.api_key,
+        args.api_secret,
+        args.account,
+        test_mode=args.test_mode,
+        pool_maxsize=max(10, args.concurrency),
+    ) as service:
+        if args.endpoint_url:
+            service.endpoint_url = args.endpoint_url.rstrip("/")
+        shipper = DHLManifestShipper(
+            service,
+            output_format,
+            args.output,
+            labels_directory=args.labels_dir,
+            checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every,
+            max_concurrency=args.concurrency,
+            defaults=defaults,
+        )
+        try:
+            stats = shipper.run(args.manifest, resume=args.resume, format=args.format)
+        except KeyboardInterrupt:
+            # stopped before the first row was sent: nothing shipped
+            stats = (
+                shipper.batch.stats if shipper.batch is not None else DHLBatchStats()
+            )
+            print("Interrupted, run again with --resume to continue.", file=sys.stderr)
+    print(report(stats, shipper.skipped))
+    return 1 if stats.failed else 0
+
+
+def run_fake_server(parser, args):
+    fake = DHLFakeServer(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        label_size=args.label_size,
+        seed=args.seed,
+    )
+    with fake:
+        print(
+            "Fake MyDHL API on %s, Ctrl+C to stop." % fake.serve(args.host, args.port)
+        )
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps(fake.stats(), indent=2))
+    return 0
+
+
+def report(stats, skipped=0):
+    """
+    :param stats: DHLBatchStats of a run
+    :param skipped: rows already shipped by a previous run
+    :return: summary with the throughput and latency percentiles
+    """
+    lines = [
+        "%s rows: %s labels, %s failed" % (stats.count, stats.succeeded, stats.failed)
+    ]
+    if skipped:
+        lines.append("%s rows skipped, already shipped" % skipped)
+    if stats.count:
+        elapsed = stats.elapsed
+        lines.append(
+            "%.1fs, %.2f labels/s"
+            % (elapsed, stats.succeeded / elapsed if elapsed else 0.0)
+        )
+        lines.append(
+            "latency p50 %.3fs, p95 %.3fs, p99 %.3fs, max %.3fs"
+            % (
+                stats.percentile(50),
+                stats.percentile(95),
+                stats.percentile(99),
+                stats.max_latency,
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+from python_dhl.exceptions import DHLDeadlineExceededError
+
+
+class DHLSingleFlight:
+    """
+    Coalesces identical concurrent lookups: while a call for a key is running, the other callers
+    with the same key wait for it and receive the same response object (or the same error)
+    instead of sending their own request to DHL.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, call, deadline=None):
+        """
+        Runs call() unless a call with the same key is already running, in which case its result is returned
+        :param key: identifies identical calls
+        :param call: function without arguments
+        :param deadline: DHLDeadline bounding the wait for a running call
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.flights[key] = flight
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                flight.result = call()
+            except BaseException as err:
+                flight.error = err
+                raise
+            finally:
+                with self.lock:
+                    del self.flights[key]
+                flight.done.set()
+            return flight.result
+        if not flight.done.wait(None if deadline is None else deadline.remaining()):
+            raise DHLDeadlineExceededError(deadline.seconds)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def do_async(self, key, call, deadline=None):
+        """
+        asyncio version of do, call is a coroutine function
+        """
+        with self.lock:
+            task = self.tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._run(key, call))
+                self.tasks[key] = task
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        try:
+            error, result = await asyncio.wait_for(
+                asyncio.shield(task),
+                None if deadline is None else deadline.remaining(),
+            )
+        except asyncio.TimeoutError:
+            raise DHLDeadlineExceededError(deadline.seconds) from None
+        if error is not None:
+            raise error
+        return result
+
+    async def _run(self, key, call):
+        try:
+            return None, await call()
+        except Exception as err:
+            return err, None
+        finally:
+            with self.lock:
+                del self.tasks[key]
+
+    def stats(self):
+        """
+        :return: dict with the calls made and the calls saved by waiting for an identical one
+        """
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.flights) + len(self.tasks),
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,96 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover - optional dependency
+    ujson = None
+
+
+class DHLJSONCodec:
+    """
+    Encodes the request payloads and decodes the DHL answers, with the json module of the standard library.
+    Subclass it to use another JSON library.
+    """
+
+    name = "json"
+
+    def dumps(self, value):
+        """
+        :return: bytes
+        """
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, data):
+        """
+        :param data: bytes or str
+        """
+        return json.loads(data)
+
+
+class DHLOrjsonCodec(DHLJSONCodec):
+    """
+    Codec using orjson (pip install python-dhl-api[fast-json])
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("DHLOrjsonCodec requires orjson: pip install orjson")
+
+    def dumps(self, value):
+        return orjson.dumps(value)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class DHLUjsonCodec(DHLJSONCodec):
+    """
+    Codec using ujson
+    """
+
+    name = "ujson"
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("DHLUjsonCodec requires ujson: pip install ujson")
+
+    def dumps(self, value):
+        return ujson.dumps(value, ensure_ascii=False).encode()
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {
+    DHLJSONCodec.name: DHLJSONCodec,
+    DHLOrjsonCodec.name: DHLOrjsonCodec,
+    DHLUjsonCodec.name: DHLUjsonCodec,
+}
+
+
+def get_json_codec(codec=None):
+    """
+    :param codec: a DHLJSONCodec, one of "json", "orjson", "ujson",
+                  "auto" for the fastest installed library, or None for the standard library
+    :return: DHLJSONCodec
+    """
+    if isinstance(codec, DHLJSONCodec):
+        return codec
+    if codec is None:
+        return DHLJSONCodec()
+    if codec == "auto":
+        if orjson is not None:
+            return DHLOrjsonCodec()
+        if ujson is not None:
+            return DHLUjsonCodec()
+        return DHLJSONCodec()
+    if codec not in CODECS:
+        raise ValueError("Unknown JSON codec %r." % codec)
+    return CODECS[codec]()
@@ -0,0 +1,82 @@
+import functools
+import inspect
+import time
+
+from python_dhl.exceptions import DHLDeadlineExceededError
+
+
+class DHLDeadline:
+    """
+    Time budget of a whole service call: rate limiter waits, retries, backoffs and every HTTP request.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def start(cls, deadline):
+        """
+        :param deadline: seconds, a DHLDeadline (returned as is) or None
+        :return: DHLDeadline or None
+        """
+        if deadline is None or isinstance(deadline, DHLDeadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """
+        Raises DHLDeadlineExceededError if there is no time left
+        """
+        if self.remaining() <= 0:
+            raise DHLDeadlineExceededError(self.seconds)
+
+    def allows(self, delay):
+        """
+        True if there is still time left after waiting delay seconds
+        """
+        return delay < self.remaining()
+
+    def timeout(self, timeout):
+        """
+        Shortens a (connect, read) timeout to the remaining time
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DHLDeadlineExceededError(self.seconds)
+        connect, read = timeout
+        return (
+            remaining if connect is None else min(connect, remaining),
+            remaining if read is None else min(read, remaining),
+        )
+
+
+def reports_remaining_time(method):
+    """
+    Decorates a service method accepting deadline=: the deadline is started when the method is called
+    and the seconds left when it returns are set in response.remaining_time
+    """
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, deadline=None, **kwargs):
+            deadline = DHLDeadline.start(deadline)
+            response = await method(self, *args, deadline=deadline, **kwargs)
+            if deadline is not None:
+                response.remaining_time = deadline.remaining()
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, deadline=None, **kwargs):
+        deadline = DHLDeadline.start(deadline)
+        response = method(self, *args, deadline=deadline, **kwargs)
+        if deadline is not None:
+            response.remaining_time = deadline.remaining()
+        return response
+
+    return wrapper
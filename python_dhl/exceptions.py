@@ -0,0 +1,79 @@
+from python_dhl.resources.helper import ResponseStatus
+
+
+class DHLError(Exception):
+    """
+    Base class of the errors raised while calling DHL.
+    The service methods turn them into a failed DHLResponse with status set to the status of the error.
+    """
+
+    status = None
+
+
+class DHLThrottledError(DHLError):
+    """
+    DHL kept answering 429 Too Many Requests after all the allowed retries.
+    """
+
+    status = 429
+
+    def __init__(self, endpoint, retry_after):
+        DHLError.__init__(
+            self,
+            "Too many requests to %s, retry after %.1f seconds."
+            % (endpoint, retry_after),
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class DHLShipmentExistsError(DHLError):
+    """
+    A shipment creation failed ambiguously (timeout or server error) but DHL already has the shipment,
+    found by its customer reference, so it must not be created again.
+    """
+
+    def __init__(self, tracking_number):
+        DHLError.__init__(self, "Shipment %s already exists." % tracking_number)
+        self.tracking_number = tracking_number
+
+
+class DHLDeadlineExceededError(DHLError):
+    """
+    The deadline of a call expired before DHL answered.
+    """
+
+    status = ResponseStatus.DEADLINE_EXCEEDED.value
+
+    def __init__(self, seconds):
+        DHLError.__init__(self, "Deadline of %s seconds exceeded." % seconds)
+        self.seconds = seconds
+
+
+class DHLCircuitOpenError(DHLError):
+    """
+    The circuit breaker of the endpoint is open: DHL was failing or too slow, so the call is not made.
+    """
+
+    status = ResponseStatus.CIRCUIT_OPEN.value
+
+    def __init__(self, endpoint, retry_in):
+        DHLError.__init__(
+            self,
+            "Circuit open for %s, retry in %.1f seconds." % (endpoint, retry_in),
+        )
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class DHLValidationError(DHLError):
+    """
+    The payload of a call is not valid, it was not sent to DHL. details has one message per error.
+    """
+
+    status = ResponseStatus.INVALID_PAYLOAD.value
+
+    def __init__(self, kind, details):
+        DHLError.__init__(self, "%d errors in the %s payload." % (len(details), kind))
+        self.kind = kind
+        self.details = details
@@ -0,0 +1,513 @@
+import asyncio
+import base64
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from python_dhl.transport import DHLTransport
+
+REQUIRED_SHIPMENT_FIELDS = (
+    "plannedShippingDateAndTime",
+    "productCode",
+    "customerDetails",
+    "content",
+    "accounts",
+)
+UNKNOWN_POSTAL_CODE = "00000"  # answered 404 by address-validate
+
+_PATH = re.compile(r"^(?:/mydhlapi)?(?:/test)?(/.*)$")
+_SHIPMENT_PATH = re.compile(
+    r"^/shipments/([^/]+)/(tracking|upload-image|proof-of-delivery)$"
+)
+
+
+class DHLFakeServer:
+    """
+    Fake MyDHL API for load and resilience tests without network: shipments, pickups, rates, address-validate,
+    tracking, upload-image and proof-of-delivery answer like DHL, with configurable latency, injected errors,
+    429 answers and label size. Created shipments are kept, so they can be tracked and searched by reference.
+
+    In the same process, without sockets:
+    fake = DHLFakeServer(latency=0.05, error_rate=0.01, throttle_rate=0.02)
+    service = DHLService(api_key, api_secret, account_number, transport=fake.transport())
+    async_service = AsyncDHLService(api_key, api_secret, account_number, transport=fake.async_transport())
+
+    Over HTTP on localhost, e.g. for another process: service.endpoint_url = fake.serve()
+    or python -m python_dhl fake-server --port 8080.
+    fake.stats() counts the requests by route and the answers by status.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        latency_jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        label_size=2048,
+        seed=None,
+    ):
+        """
+        :param latency: seconds before each answer
+        :param latency_jitter: random seconds added to latency, up to this value
+        :param error_rate: fraction of the requests answered 503
+        :param throttle_rate: fraction of the requests answered 429 with Retry-After
+        :param retry_after: seconds of the Retry-After header of the 429 answers
+        :param label_size: bytes of each label document before base64 encoding
+        :param seed: seed of the random faults and jitter, for repeatable runs
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.label = base64.b64encode(b"%PDF" + b"\0" * max(0, label_size - 4)).decode(
+            "ascii"
+        )
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.shipments = {}
+        self.references = {}
+        self.requests = Counter()
+        self.answers = Counter()
+        self.tracking_numbers = itertools.count(1000000001)
+        self.pickup_numbers = itertools.count(1)
+        self.httpd = None
+
+    def delay(self):
+        """
+        Seconds before the next answer
+        """
+        if not self.latency_jitter:
+            return self.latency
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.latency_jitter)
+
+    def handle(self, method, path, query=None, body=None):
+        """
+        Answers a request, without waiting for the latency
+        :param path: URL path, the /mydhlapi and /test prefixes are optional
+        :param query: dict of the query string, name -> list of values
+        :param body: request body bytes
+        :return: (status, dict of headers, body bytes)
+        """
+        path = _PATH.match(path).group(1).rstrip("/") or "/"
+        query = query or {}
+        match = _SHIPMENT_PATH.match(path)
+        route = "/shipments/{}/" + match.group(2) if match else path
+        with self.lock:
+            self.requests["%s %s" % (method, route)] += 1
+            fault = self.random.random()
+        if fault < self.throttle_rate:
+            status, headers, answer = (
+                429,
+                {"Retry-After": str(self.retry_after)},
+                _problem(429, "Too many requests", "Injected throttling."),
+            )
+        elif fault < self.throttle_rate + self.error_rate:
+            status, headers, answer = (
+                503,
+                {},
+                _problem(503, "Service unavailable", "Injected failure."),
+            )
+        else:
+            headers = {}
+            try:
+                status, answer = self._route(method, path, match, query, body)
+            except (ValueError, KeyError, TypeError) as err:
+                status, answer = 400, _problem(400, "Bad request", str(err))
+        with self.lock:
+            self.answers[status] += 1
+        headers["Content-Type"] = "application/json"
+        return status, headers, json.dumps(answer).encode()
+
+    def stats(self):
+        """
+        :return: dict with the requests by route and the answers by status
+        """
+        with self.lock:
+            return {"requests": dict(self.requests), "answers": dict(self.answers)}
+
+    def _route(self, method, path, match, query, body):
+        if match is not None:
+            tracking_number, action = match.groups()
+            if method == "GET" and action == "tracking":
+                return self._track([tracking_number])
+            if method == "PATCH" and action == "upload-image":
+                return self._upload_image(tracking_number, body)
+            if method == "GET" and action == "proof-of-delivery":
+                return self._proof_of_delivery(tracking_number)
+        elif method == "POST" and path == "/shipments":
+            return self._create_shipment(json.loads(body))
+        elif method == "POST" and path == "/pickups":
+            return self._create_pickup(json.loads(body))
+        elif method == "GET" and path == "/rates":
+            return self._rates(query)
+        elif method == "GET" and path == "/address-validate":
+            return self._validate_address(query)
+        elif method == "GET" and path == "/tracking":
+            if "shipmentReference" in query:
+                return self._track(self._search(query))
+            return self._track(query.get("shipmentTrackingNumber", []))
+        return 404, _problem(404, "Not found", "%s %s" % (method, path))
+
+    def _create_shipment(self, payload):
+        missing = [name for name in REQUIRED_SHIPMENT_FIELDS if name not in payload]
+        if missing:
+            return 400, _problem(400, "Bad request", "Missing " + ", ".join(missing))
+        references = [r["value"] for r in payload.get("customerReferences", [])]
+        packages = payload["content"].get("packages", [])
+        with self.lock:
+            tracking_number = str(next(self.tracking_numbers))
+            self.shipments[tracking_number] = {
+                "shipmentTrackingNumber": tracking_number,
+                "productCode": payload["productCode"],
+                "shipmentTimestamp": payload["plannedShippingDateAndTime"][:19],
+                "references": references,
+                "receiver": payload["customerDetails"]["receiverDetails"][
+                    "postalAddress"
+                ],
+                "packages": len(packages),
+                "documents": 0,
+            }
+            for reference in references:
+                self.references.setdefault(reference, []).append(tracking_number)
+        answer = {
+            "shipmentTrackingNumber": tracking_number,
+            "trackingUrl": "https://express.api.dhl.com/mydhlapi/shipments/%s/tracking"
+            % tracking_number,
+            "packages": [
+                {
+                    "referenceNumber": index + 1,
+                    "trackingNumber": "JD%s%03d" % (tracking_number, index + 1),
+                }
+                for index in range(len(packages))
+            ],
+            "documents": [
+                {"imageFormat": "PDF", "content": self.label, "typeCode": "label"}
+            ],
+        }
+        if payload.get("pickup", {}).get("isRequested"):
+            answer["dispatchConfirmationNumber"] = self._pickup_number()
+        return 201, answer
+
+    def _create_pickup(self, payload):
+        if "plannedPickupDateAndTime" not in payload:
+            return 400, _problem(400, "Bad request", "Missing plannedPickupDateAndTime")
+        return 201, {
+            "dispatchConfirmationNumbers": [self._pickup_number()],
+            "readyByTime": "10:00",
+            "nextPickupDate": payload["plannedPickupDateAndTime"][:10],
+        }
+
+    def _pickup_number(self):
+        with self.lock:
+            return "PRG%09d" % next(self.pickup_numbers)
+
+    def _rates(self, query):
+        weight = float(query["weight"][0])
+        shipping_date = date.fromisoformat(query["plannedShippingDate"][0])
+        domestic = query["originCountryCode"][0] == query["destinationCountryCode"][0]
+        products = [
+            (
+                ("N", "EXPRESS DOMESTIC", 12.0, 1)
+                if domestic
+                else ("P", "EXPRESS WORLDWIDE", 35.0, 1)
+            ),
+            ("T", "EXPRESS 12:00", 45.0, 1),
+            ("H", "ECONOMY SELECT", 18.0, 4),
+        ]
+        return 200, {
+            "products": [
+                _rated_product(code, name, base + weight * 4.5, shipping_date, days)
+                for code, name, base, days in products
+            ]
+        }
+
+    def _validate_address(self, query):
+        postal_code = query["postalCode"][0]
+        if postal_code == UNKNOWN_POSTAL_CODE:
+            return 404, _problem(404, "Not found", "Address not found.")
+        return 200, {
+            "address": [
+                {
+                    "countryCode": query["countryCode"][0],
+                    "postalCode": postal_code,
+                    "cityName": query["cityName"][0].upper(),
+                    "serviceArea": {"code": "FAK", "description": "Fake service area"},
+                }
+            ]
+        }
+
+    def _search(self, query):
+        """
+        Tracking numbers of the shipments with a reference, shipped between dateRangeFrom and dateRangeTo
+        """
+        date_from = query.get("dateRangeFrom", ["0000"])[0]
+        date_to = query.get("dateRangeTo", ["9999"])[0]
+        with self.lock:
+            return [
+                number
+                for number in self.references.get(query["shipmentReference"][0], [])
+                if date_from
+                <= self.shipments[number]["shipmentTimestamp"][:10]
+                <= date_to
+            ]
+
+    def _track(self, tracking_numbers):
+        with self.lock:
+            found = [
+                self.shipments[number]
+                for number in tracking_numbers
+                if number in self.shipments
+            ]
+        if not found:
+            return 404, _problem(404, "Not found", "No shipments found.")
+        return 200, {"shipments": [_tracked(shipment) for shipment in found]}
+
+    def _upload_image(self, tracking_number, body):
+        payload = json.loads(body)
+        with self.lock:
+            shipment = self.shipments.get(tracking_number)
+            if shipment is not None:
+                shipment["documents"] += len(payload["documentImages"])
+        if shipment is None:
+            return 404, _problem(404, "Not found", "No shipments found.")
+        return 200, {"status": "OK"}
+
+    def _proof_of_delivery(self, tracking_number):
+        with self.lock:
+            found = tracking_number in self.shipments
+        if not found:
+            return 404, _problem(404, "Not found", "No shipments found.")
+        return 200, {
+            "documents": [
+                {"encodingFormat": "PDF", "content": self.label, "typeCode": "POD"}
+            ]
+        }
+
+    def transport(self):
+        """
+        :return: DHLFakeTransport answering the requests of a DHLService in this process
+        """
+        return DHLFakeTransport(self)
+
+    def async_transport(self):
+        """
+        :return: httpx transport answering the requests of an AsyncDHLService in this process
+        """
+        if httpx is None:
+            raise ImportError("async_transport requires httpx: pip install httpx")
+
+        async def answer(request):
+            delay = self.delay()
+            read_timeout = request.extensions.get("timeout", {}).get("read")
+            if read_timeout is not None and delay > read_timeout:
+                await asyncio.sleep(read_timeout)
+                raise httpx.ReadTimeout("Fake DHL answered too late.", request=request)
+            await asyncio.sleep(delay)
+            status, headers, body = self.handle(
+                request.method,
+                request.url.path,
+                parse_qs(request.url.query.decode()),
+                request.content,
+            )
+            return httpx.Response(status, headers=headers, content=body)
+
+        return httpx.MockTransport(answer)
+
+    def serve(self, host="127.0.0.1", port=0):
+        """
+        Serves the fake over HTTP in a background thread
+        :param port: 0 picks a free port
+        :return: URL to use as service.endpoint_url
+        """
+        fake = self
+
+        class Handler(_FakeRequestHandler):
+            server_fake = fake
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self.url
+
+    @property
+    def url(self):
+        if self.httpd is None:
+            return None
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%s" % (host, port)
+
+    def close(self):
+        """
+        Stops serving over HTTP
+        """
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DHLFakeTransport(DHLTransport):
+    """
+    DHLTransport answering with a DHLFakeServer in the same process, sleeping its latency.
+    An answer later than the read timeout raises requests.ReadTimeout.
+    """
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        headers=None,
+        timeout=None,
+        stream=False,
+    ):
+        delay = self.fake.delay()
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and delay > read_timeout:
+            time.sleep(read_timeout)
+            raise requests.ReadTimeout("Fake DHL answered too late.")
+        time.sleep(delay)
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        for name, value in (params or {}).items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            query.setdefault(name, []).extend(str(v) for v in values)
+        status, answer_headers, body = self.fake.handle(method, parts.path, query, data)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(answer_headers)
+        response.raw = io.BytesIO(body)
+        response.url = url
+        response.encoding = "utf-8"
+        return response
+
+
+class _FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_fake = None
+
+    def _answer(self):
+        fake = self.server_fake
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        time.sleep(fake.delay())
+        parts = urlsplit(self.path)
+        status, headers, answer = fake.handle(
+            self.command, parts.path, parse_qs(parts.query), body
+        )
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    do_GET = do_POST = do_PATCH = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _problem(status, title, detail):
+    return {"title": title, "detail": detail, "status": str(status)}
+
+
+def _rated_product(code, name, price, shipping_date, days):
+    price = round(price, 2)
+    delivery = datetime.combine(
+        shipping_date + timedelta(days=days), datetime.min.time()
+    )
+    return {
+        "productName": name,
+        "productCode": code,
+        "localProductCode": code,
+        "networkTypeCode": "TD",
+        "isCustomerAgreement": False,
+        "totalPrice": [
+            {"currencyType": "BILLC", "priceCurrency": "EUR", "price": price},
+            {
+                "currencyType": "PULCL",
+                "priceCurrency": "USD",
+                "price": round(price * 1.08, 2),
+            },
+        ],
+        "totalPriceBreakdown": [
+            {
+                "currencyType": "BILLC",
+                "priceCurrency": "EUR",
+                "priceBreakdown": [
+                    {"typeCode": "SPRQT", "price": round(price * 0.85, 2)},
+                    {
+                        "typeCode": "STSCH",
+                        "price": round(price - round(price * 0.85, 2), 2),
+                    },
+                ],
+            }
+        ],
+        "deliveryCapabilities": {
+            "deliveryTypeCode": "QDDC",
+            "estimatedDeliveryDateAndTime": (
+                delivery + timedelta(hours=18)
+            ).isoformat(),
+            "totalTransitDays": str(days),
+        },
+    }
+
+
+def _tracked(shipment):
+    timestamp = datetime.fromisoformat(shipment["shipmentTimestamp"])
+    return {
+        "shipmentTrackingNumber": shipment["shipmentTrackingNumber"],
+        "status": "transit",
+        "shipmentTimestamp": shipment["shipmentTimestamp"],
+        "productCode": shipment["productCode"],
+        "numberOfPieces": shipment["packages"],
+        "shipperReferences": [
+            {"value": reference, "typeCode": "CU"}
+            for reference in shipment["references"]
+        ],
+        "receiverDetails": {
+            "postalAddress": {
+                "postalCode": shipment["receiver"].get("postalCode"),
+                "cityName": shipment["receiver"].get("cityName"),
+                "countryCode": shipment["receiver"].get("countryCode"),
+            }
+        },
+        "events": [
+            {
+                "date": timestamp.date().isoformat(),
+                "time": timestamp.time().isoformat(),
+                "typeCode": "PU",
+                "description": "Shipment picked up",
+            }
+        ],
+    }
@@ -0,0 +1,404 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+from python_dhl.batch import DHLBatch
+from python_dhl.resources.address import DHLContactInformation, DHLPostalAddress
+from python_dhl.resources.helper import (
+    AccountType,
+    MeasurementUnit,
+    ResponseStatus,
+    ShipperType,
+)
+from python_dhl.resources.response import DHLShipmentResponse
+from python_dhl.resources.shipment import (
+    DHLAccountType,
+    DHLAddedService,
+    DHLProduct,
+    DHLShipment,
+    DHLShipmentContent,
+)
+
+CSV = "csv"
+JSONL = "jsonl"
+
+
+def manifest_format(path):
+    """
+    :return: CSV or JSONL from the extension of path
+    """
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        return JSONL
+    return CSV
+
+
+def read_manifest(path, format=None):
+    """
+    Reads a manifest lazily
+    :param format: CSV or JSONL, defaults to the one of the extension of path
+    :return: iterator of (row number starting from 1, dict of the non empty columns)
+    """
+    format = format or manifest_format(path)
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        if format == JSONL:
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+        for number, row in enumerate(rows, 1):
+            yield number, {
+                name.strip(): value.strip() if isinstance(value, str) else value
+                for name, value in row.items()
+                if name and value not in (None, "")
+            }
+
+
+def shipment_from_row(row, account_number, output_format, defaults=None):
+    """
+    Maps a manifest row to a DHLShipment. The columns (JSON Lines use the same keys) are:
+        sender_company, sender_name, sender_phone, sender_email, sender_type (default business),
+        sender_street1, sender_street2, sender_street3, sender_city, sender_postal_code, sender_province,
+        sender_country, the same with receiver_,
+        reference, ship_datetime (ISO 8601 with the UTC offset), product_code, services (codes separated by spaces),
+        weight, length, width, height, packages (number of identical packages, default 1),
+        description, incoterm (default DAP), unit (default metric), customs (true/false),
+        declared_value, currency, request_pickup (true/false), pickup_close_time (HH:MM), pickup_location
+    The columns shared by every row, usually the sender ones, can be given once as defaults.
+    :param row: dict of the columns
+    :param account_number: shipper account
+    :param output_format: DHLShipmentOutput of the labels
+    :param defaults: dict of the values of the columns missing from the row
+    :return: DHLShipment
+    :raise ValueError: if a column is missing or not valid
+    """
+    if defaults:
+        row = dict(defaults, **row)
+    reader = _RowReader(row)
+    customs = reader.boolean("customs", False)
+    packages = [
+        DHLProduct(
+            weight=reader.number("weight"),
+            length=reader.number("length"),
+            width=reader.number("width"),
+            height=reader.number("height"),
+        )
+    ] * int(reader.number("packages", 1))
+    references = [reader.text("reference")] if row.get("reference") else None
+    return DHLShipment(
+        sender_contact=_contact(reader, "sender"),
+        sender_address=_address(reader, "sender"),
+        receiver_contact=_contact(reader, "receiver"),
+        receiver_address=_address(reader, "receiver"),
+        ship_datetime=reader.datetime("ship_datetime"),
+        product_code=reader.text("product_code"),
+        added_services=[
+            DHLAddedService(code) for code in reader.text("services", "").split()
+        ],
+        content=DHLShipmentContent(
+            packages=packages,
+            is_custom_declarable=customs,
+            description=reader.text("description"),
+            incoterm_code=reader.text("incoterm", "DAP"),
+            unit_of_measurement=reader.text("unit", MeasurementUnit.METRIC.value),
+            declared_value=reader.number("declared_value", None),
+            declared_value_currency=reader.text("currency", None),
+        ),
+        output_format=output_format,
+        accounts=[DHLAccountType(type_code=AccountType.SHIPPER, number=account_number)],
+        customer_references=references,
+        request_pickup=reader.boolean("request_pickup", False),
+        pickup_close_time=reader.text("pickup_close_time", None),
+        pickup_location=reader.text("pickup_location", None),
+    )
+
+
+class DHLManifestRow:
+    """
+    One row of a manifest being shipped: its number, columns, the DHLShipment mapped from them
+    or the error that prevented the mapping, and the paths of the label documents saved.
+    """
+
+    def __init__(self, number, row, shipment=None, error=None, verify=False):
+        self.number = number
+        self.row = row
+        self.shipment = shipment
+        self.error = error
+        self.verify = verify
+        self.documents = []
+
+
+class DHLManifestShipper:
+    """
+    Ships a manifest row by row: only the rows in flight are in memory, whatever the size of the file.
+    Every row gets one line in the results JSON Lines file, in manifest order, and its labels are saved
+    in labels_directory. The checkpoint file records the last row written so an interrupted run resumes after it:
+
+    shipper = DHLManifestShipper(service, output_format, "results.jsonl", "labels", "results.checkpoint")
+    stats = shipper.run("orders.csv", resume=True)
+    stats.throughput, stats.percentile(95)
+
+    On resume the rows that may have been in flight when the run stopped are searched by their customer
+    reference before being shipped again, rows without a reference are shipped again.
+    """
+
+    def __init__(
+        self,
+        service,
+        output_format,
+        results_path,
+        labels_directory=None,
+        checkpoint_path=None,
+        checkpoint_every=100,
+        max_concurrency=8,
+        defaults=None,
+    ):
+        """
+        :param service: DHLService
+        :param output_format: DHLShipmentOutput of the labels
+        :param results_path: JSON Lines file of the results
+        :param labels_directory: directory of the label documents, they are not saved if None
+        :param checkpoint_path: file of the checkpoint, defaults to results_path + ".checkpoint"
+        :param checkpoint_every: rows between two checkpoints
+        :param max_concurrency: number of shipments in flight
+        :param defaults: dict of the values of the columns missing from the rows
+        """
+        self.service = service
+        self.output_format = output_format
+        self.results_path = results_path
+        self.labels_directory = labels_directory
+        self.checkpoint_path = checkpoint_path or results_path + ".checkpoint"
+        self.checkpoint_every = checkpoint_every
+        self.max_concurrency = max_concurrency
+        self.defaults = defaults
+        self.skipped = 0
+        self.batch = None
+
+    def run(self, manifest_path, resume=False, format=None, on_result=None):
+        """
+        :param manifest_path: CSV or JSON Lines manifest
+        :param resume: if True continues after the checkpoint appending to the results, otherwise starts again
+        :param format: CSV or JSONL, defaults to the one of the extension of manifest_path
+        :param on_result: callable receiving each DHLBatchResult, whose item is a DHLManifestRow
+        :return: DHLBatchStats of the rows shipped by this run
+        """
+        manifest_path = os.path.abspath(manifest_path)
+        done, verify_until = self._resume_point(manifest_path) if resume else (0, 0)
+        self.skipped = done
+        if self.labels_directory:
+            os.makedirs(self.labels_directory, exist_ok=True)
+        rows = self._rows(manifest_path, format, done, verify_until)
+        # saved before any row is sent, so that a run stopped early still knows its rows in flight
+        self._save_checkpoint(manifest_path, done, verify_until)
+        self.batch = DHLBatch(self._ship_row, rows, self.max_concurrency, ordered=True)
+        last = done
+        with open(
+            self.results_path, "a" if resume else "w", encoding="utf-8"
+        ) as results:
+            try:
+                for result in self.batch:
+                    results.write(json.dumps(self._result_line(result)) + "\n")
+                    last = result.item.number
+                    if on_result is not None:
+                        on_result(result)
+                    if (last - done) % self.checkpoint_every == 0:
+                        results.flush()
+                        self._save_checkpoint(manifest_path, last, verify_until)
+            finally:
+                results.flush()
+                self._save_checkpoint(manifest_path, last, verify_until)
+        return self.batch.stats
+
+    def _rows(self, manifest_path, format, done, verify_until):
+        """
+        :param verify_until: the rows up to it may have been sent by the stopped run, they are searched first
+        """
+        for number, row in read_manifest(manifest_path, format):
+            if number <= done:
+                continue
+            verify = number <= verify_until
+            try:
+                shipment = shipment_from_row(
+                    row,
+                    self.service.account_number,
+                    self.output_format,
+                    self.defaults,
+                )
+            except ValueError as err:
+                yield DHLManifestRow(number, row, error=err)
+            else:
+                yield DHLManifestRow(number, row, shipment, verify=verify)
+
+    def _ship_row(self, item):
+        if item.error is not None:
+            return DHLShipmentResponse(
+                success=False,
+                error_title="Row not valid.",
+                error_detail=str(item.error),
+                status=ResponseStatus.INVALID_PAYLOAD.value,
+            )
+        if item.verify and item.shipment.customer_references:
+            try:
+                tracking_number = self.service.find_shipment(item.shipment)
+            except Exception as err:
+                return self.service._failure(
+                    DHLShipmentResponse, "Shipment not verified. No label.", err
+                )
+            if tracking_number is not None:
+                return self.service._existing_shipment_response(tracking_number)
+        response = self.service.ship(item.shipment)
+        if response.success and self.labels_directory:
+            item.documents = response.save_documents(self.labels_directory)
+        return response
+
+    def _result_line(self, result):
+        item, response = result.item, result.response
+        return {
+            "row": item.number,
+            "reference": item.row.get("reference"),
+            "success": response.success,
+            "tracking_number": getattr(response, "tracking_number", None),
+            "documents": item.documents,
+            "message": getattr(response, "message", None),
+            "error": response.error_title,
+            "detail": response.error_detail,
+            "status": response.status,
+            "elapsed": round(result.elapsed, 3),
+        }
+
+    def _resume_point(self, manifest_path):
+        """
+        Last row already written: the checkpoint or, if the run stopped between two checkpoints,
+        the last complete line of the results file.
+        The stopped run had at most its max_concurrency rows in flight after it, and had not verified
+        the rows up to the verify_until of its own checkpoint.
+        :return: (last row written, last row that may have been sent)
+        """
+        done = 0
+        concurrency = self.max_concurrency
+        verify_until = 0
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as file:
+                checkpoint = json.load(file)
+        except FileNotFoundError:
+            checkpoint = None
+        if checkpoint is not None:
+            if checkpoint["manifest"] != manifest_path:
+                raise ValueError(
+                    "The checkpoint %s is of another manifest: %s."
+                    % (self.checkpoint_path, checkpoint["manifest"])
+                )
+            done = checkpoint["row"]
+            concurrency = checkpoint.get("concurrency", concurrency)
+            verify_until = checkpoint.get("verify_until", 0)
+        done = max(done, _last_result_row(self.results_path))
+        return done, max(verify_until, done + concurrency)
+
+    def _save_checkpoint(self, manifest_path, row, verify_until=0):
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "manifest": manifest_path,
+                    "row": row,
+                    "concurrency": self.max_concurrency,
+                    "verify_until": verify_until,
+                },
+                file,
+            )
+        os.replace(temporary, self.checkpoint_path)
+
+
+def _last_result_row(path, tail_size=65536):
+    """
+    Row of the last complete line of a results file. A partial last line, written when the run stopped, is removed.
+    """
+    try:
+        file = open(path, "rb+")
+    except FileNotFoundError:
+        return 0
+    with file:
+        size = file.seek(0, os.SEEK_END)
+        start = max(0, size - tail_size)
+        file.seek(start)
+        tail = file.read()
+        end = tail.rfind(b"\n")
+        if start + end + 1 < size:
+            file.truncate(start + end + 1)
+        lines = tail[: max(end, 0)].split(b"\n")
+        if not lines[-1].strip():
+            return 0
+        return json.loads(lines[-1])["row"]
+
+
+def _contact(reader, prefix):
+    return DHLContactInformation(
+        full_name=reader.text(prefix + "_name"),
+        phone=reader.text(prefix + "_phone"),
+        contact_type=reader.text(prefix + "_type", ShipperType.BUSINESS.value),
+        company_name=reader.text(prefix + "_company", None),
+        email=reader.text(prefix + "_email", None),
+    )
+
+
+def _address(reader, prefix):
+    return DHLPostalAddress(
+        street_line1=reader.text(prefix + "_street1"),
+        city_name=reader.text(prefix + "_city"),
+        postal_code=reader.text(prefix + "_postal_code"),
+        country_code=reader.text(prefix + "_country").upper(),
+        province_code=reader.text(prefix + "_province", None),
+        street_line2=reader.text(prefix + "_street2", None),
+        street_line3=reader.text(prefix + "_street3", None),
+    )
+
+
+_REQUIRED = object()
+
+
+class _RowReader:
+    def __init__(self, row):
+        self.row = row
+
+    def _value(self, name, default):
+        value = self.row.get(name)
+        if value is None or value == "":
+            if default is _REQUIRED:
+                raise ValueError("Missing column %s." % name)
+            return default
+        return value
+
+    def text(self, name, default=_REQUIRED):
+        value = self._value(name, default)
+        return str(value) if value is not None else None
+
+    def number(self, name, default=_REQUIRED):
+        value = self._value(name, default)
+        if value is None or isinstance(value, (int, float)):
+            return value
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError("Column %s is not a number: %r." % (name, value))
+        return int(number) if number.is_integer() else number
+
+    def boolean(self, name, default=_REQUIRED):
+        value = self._value(name, default)
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("true", "yes", "1"):
+            return True
+        if str(value).lower() in ("false", "no", "0"):
+            return False
+        raise ValueError("Column %s is not true or false: %r." % (name, value))
+
+    def datetime(self, name):
+        value = self._value(name, _REQUIRED)
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "Column %s is not an ISO 8601 datetime: %r." % (name, value)
+            )
+        if parsed.tzinfo is None:
+            raise ValueError("Column %s has no UTC offset: %r." % (name, value))
+        return parsed
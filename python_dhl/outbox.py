@@ -0,0 +1,486 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from python_dhl.deadline import DHLDeadline
+from python_dhl.resources.address import DHLPostalAddress
+from python_dhl.resources.helper import (
+    AccountType,
+    ResponseStatus,
+    parse_dhl_datetime,
+)
+from python_dhl.resources.shipment import DHLAccountType, DHLShipment
+from python_dhl.retry import shipment_idempotency_key
+
+PENDING = "pending"
+SENDING = "sending"
+SHIPPED = "shipped"
+FAILED = "failed"
+# the shipment may have been created but it has no customer reference to check it, it needs a manual check
+UNKNOWN = "unknown"
+
+_COLUMNS = (
+    "id, key, state, attempts, verify, tracking_number, "
+    "dispatch_confirmation_number, documents, error, created_at, updated_at"
+)
+
+
+class DHLOutboxShipment(DHLShipment):
+    """
+    Shipment read back from a DHLOutbox: its stored payload is sent as is.
+    Only the fields used to ship and find it (date, accounts, references, receiver address) are set.
+    """
+
+    def __init__(self, entry_id, payload):
+        """
+        :param entry_id: id of the outbox entry
+        :param payload: JSON bytes of POST /shipments
+        """
+        data = json.loads(payload)
+        receiver = data["customerDetails"]["receiverDetails"]["postalAddress"]
+        DHLShipment.__init__(
+            self,
+            sender_contact=None,
+            sender_address=None,
+            receiver_contact=None,
+            receiver_address=DHLPostalAddress(
+                street_line1=receiver.get("addressLine1"),
+                city_name=receiver.get("cityName"),
+                postal_code=receiver.get("postalCode"),
+                country_code=receiver.get("countryCode"),
+            ),
+            ship_datetime=parse_dhl_datetime(data["plannedShippingDateAndTime"]),
+            product_code=data.get("productCode"),
+            added_services=None,
+            content=None,
+            output_format=None,
+            accounts=[
+                DHLAccountType(AccountType(a["typeCode"]), a["number"])
+                for a in data.get("accounts", [])
+            ],
+            customer_references=[
+                r["value"] for r in data.get("customerReferences", [])
+            ],
+        )
+        self.entry_id = entry_id
+        self.payload = payload
+
+    def to_payload(self, create):
+        return self.payload
+
+
+class DHLOutboxEntry:
+    """
+    A shipment of a DHLOutbox and the outcome of its creation.
+    documents is the list of the files of its label documents, error the failure of the last attempt.
+    """
+
+    def __init__(
+        self,
+        id,
+        key,
+        state,
+        attempts,
+        verify,
+        tracking_number,
+        dispatch_confirmation_number,
+        documents,
+        error,
+        created_at,
+        updated_at,
+    ):
+        self.id = id
+        self.key = key
+        self.state = state
+        self.attempts = attempts
+        self.verify = bool(verify)
+        self.tracking_number = tracking_number
+        self.dispatch_confirmation_number = dispatch_confirmation_number
+        self.documents = json.loads(documents) if documents else []
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def __str__(self):
+        return "%s: %s %s" % (self.id, self.state, self.tracking_number or "")
+
+
+class DHLOutbox:
+    """
+    Durable queue of shipments to create, stored in a SQLite file. The payload of a shipment is stored
+    when it is enqueued, workers send it with the service and write the outcome back in the same transaction
+    that ends the entry, so a restart resumes with the entries not shipped yet.
+
+    An entry whose worker died while shipping it, or whose attempt failed transiently, is shipped again only
+    after checking with service.find_shipment that DHL did not create it; without customer references it cannot
+    be checked and is left in the unknown state.
+
+    outbox = DHLOutbox(service, "outbox.sqlite", documents_directory="/var/labels")
+    for order in orders:
+        outbox.enqueue(order.shipment)
+    outbox.drain(workers=8)
+    """
+
+    def __init__(
+        self,
+        service,
+        path,
+        documents_directory=None,
+        lease=300,
+        max_attempts=5,
+        retry_delay=30,
+        timeout=5.0,
+        deadline=None,
+    ):
+        """
+        :param service: DHLService shipping the entries
+        :param path: file of the database, created if missing
+        :param documents_directory: directory where the label documents are saved, None does not save them
+        :param lease: seconds a worker has to ship an entry, after that it is considered dead
+        :param max_attempts: attempts before an entry failing transiently (timeouts, 5xx, 429) is failed
+        :param retry_delay: seconds before the second attempt, doubled at every following one
+        :param timeout: seconds to wait for a lock held by another process
+        :param deadline: seconds to look up and ship an entry including retries, shorter than the lease so that
+                         the documents are saved before it expires, defaults to half the lease
+        """
+        if deadline is None:
+            deadline = lease / 2
+        if deadline >= lease:
+            raise ValueError("deadline must be shorter than the lease.")
+        self.service = service
+        self.path = path
+        self.documents_directory = documents_directory
+        self.lease = lease
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.local = threading.local()
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS dhl_outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, payload BLOB NOT NULL, "
+                "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "verify INTEGER NOT NULL DEFAULT 0, leased_until REAL, next_attempt_at REAL, "
+                "tracking_number TEXT, dispatch_confirmation_number TEXT, documents TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS dhl_outbox_state ON dhl_outbox (state, id)"
+            )
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            self.local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction, taking the database lock at once so concurrent workers cannot claim the same entry
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def enqueue(self, dhl_shipment, key=None):
+        """
+        Stores a shipment to create. A shipment with the same key (by default its account and customer
+        references) already in the outbox is not added again.
+        :param dhl_shipment: DHLShipment
+        :param key: string identifying the shipment
+        :return: id of the entry
+        """
+        key = key or shipment_idempotency_key(dhl_shipment, self.service.account_number)
+        payload = self.service._shipment_payload(dhl_shipment)
+        if not isinstance(payload, bytes):
+            payload = self.service.json_codec.dumps(payload)
+        now = time.time()
+        with self._transaction() as connection:
+            if key is not None:
+                row = connection.execute(
+                    "SELECT id FROM dhl_outbox WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+            return connection.execute(
+                "INSERT INTO dhl_outbox (key, payload, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, PENDING, now, now),
+            ).lastrowid
+
+    def entry(self, entry_id):
+        """
+        :return: DHLOutboxEntry or None
+        """
+        row = (
+            self._connection()
+            .execute("SELECT %s FROM dhl_outbox WHERE id = ?" % _COLUMNS, (entry_id,))
+            .fetchone()
+        )
+        return DHLOutboxEntry(*row) if row is not None else None
+
+    def entries(self, state=None):
+        """
+        :param state: PENDING, SENDING, SHIPPED, FAILED, UNKNOWN or None for all the entries
+        :return: list of DHLOutboxEntry in enqueue order
+        """
+        query = "SELECT %s FROM dhl_outbox" % _COLUMNS
+        params = ()
+        if state is not None:
+            query += " WHERE state = ?"
+            params = (state,)
+        rows = self._connection().execute(query + " ORDER BY id", params)
+        return [DHLOutboxEntry(*row) for row in rows]
+
+    def counts(self):
+        """
+        :return: dict of the number of entries by state
+        """
+        rows = self._connection().execute(
+            "SELECT state, COUNT(*) FROM dhl_outbox GROUP BY state"
+        )
+        return dict(rows.fetchall())
+
+    def retry(self, entry_id, verify=None):
+        """
+        Queues again a failed or unknown entry. An entry that DHL may have created (its last attempt timed out
+        or failed with a server error) is searched by customer reference before being sent, as stored with it.
+        An unknown entry without references cannot be searched: check it by hand and pass verify=False.
+        :param verify: True searches it before sending it, False sends it as is, None keeps the stored choice
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE dhl_outbox SET state = ?, attempts = 0, verify = COALESCE(?, verify), "
+                "next_attempt_at = NULL, updated_at = ? WHERE id = ? AND state IN (?, ?)",
+                (
+                    PENDING,
+                    None if verify is None else int(verify),
+                    time.time(),
+                    entry_id,
+                    FAILED,
+                    UNKNOWN,
+                ),
+            )
+
+    def recover(self):
+        """
+        Queues again the entries whose worker died while shipping them (lease expired): they will be checked
+        by customer reference before being sent, those without references are set to UNKNOWN.
+        :return: number of entries recovered
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, payload FROM dhl_outbox WHERE state = ? AND leased_until < ?",
+                (SENDING, now),
+            ).fetchall()
+            for entry_id, payload in rows:
+                if DHLOutboxShipment(entry_id, payload).customer_references:
+                    state, error = PENDING, None
+                else:
+                    state, error = UNKNOWN, "Interrupted while shipping."
+                connection.execute(
+                    "UPDATE dhl_outbox SET state = ?, verify = 1, error = ?, "
+                    "leased_until = NULL, updated_at = ? WHERE id = ?",
+                    (state, error, now, entry_id),
+                )
+        return len(rows)
+
+    def drain(self, workers=4, stop=None):
+        """
+        Ships the pending entries with a pool of worker threads until none is ready or stop is set.
+        Entries of workers that died are recovered first. Entries waiting to be retried after a transient
+        failure stay pending if their retry time comes after the other entries are done.
+        :param workers: number of threads, keep it within the pool_maxsize of the service
+        :param stop: threading.Event
+        :return: dict of the number of entries processed by final state
+        """
+        self.recover()
+        outcomes = {}
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while stop is None or not stop.is_set():
+                    claimed = self._claim()
+                    if claimed is None:
+                        return
+                    state = self._process(*claimed)
+                    with lock:
+                        outcomes[state] = outcomes.get(state, 0) + 1
+            finally:
+                self.close()
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def close(self):
+        """
+        Closes the connection of the current thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def _claim(self):
+        """
+        Leases the oldest pending entry ready to be sent to the current worker
+        :return: (id, payload, verify) or None
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, payload, verify FROM dhl_outbox WHERE state = ? "
+                "AND (next_attempt_at IS NULL OR next_attempt_at <= ?) ORDER BY id LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE dhl_outbox SET state = ?, attempts = attempts + 1, leased_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (SENDING, now + self.lease, now, row[0]),
+            )
+        return row
+
+    def _process(self, entry_id, payload, verify):
+        """
+        Ships a claimed entry and stores the outcome
+        :return: the new state of the entry
+        """
+        dhl_shipment = DHLOutboxShipment(entry_id, payload)
+        deadline = DHLDeadline(self.deadline)
+        if verify:
+            if not dhl_shipment.customer_references:
+                return self._finish(
+                    entry_id, UNKNOWN, error="No customer reference to check it."
+                )
+            try:
+                tracking_number = self.service.find_shipment(
+                    dhl_shipment, deadline=deadline
+                )
+            except Exception as err:
+                return self._finish_attempt(entry_id, str(err), verify=True)
+            if tracking_number is not None:
+                return self._finish(
+                    entry_id,
+                    SHIPPED,
+                    tracking_number=tracking_number,
+                    error="Shipment already created, the documents are not returned again.",
+                )
+        response = self.service.ship(dhl_shipment, deadline=deadline)
+        if response.success:
+            documents = []
+            error = response.message
+            if self.documents_directory is not None:
+                try:
+                    documents = response.save_documents(self.documents_directory)
+                except OSError as err:
+                    error = "Documents not saved: %s" % err
+            return self._finish(
+                entry_id,
+                SHIPPED,
+                tracking_number=response.tracking_number,
+                dispatch_confirmation_number=response.dispatch_confirmation_number,
+                documents=documents,
+                error=error,
+            )
+        error = json.dumps(
+            {
+                "title": response.error_title,
+                "detail": response.error_detail,
+                "status": response.status,
+                "additionalDetails": response.additional_error_details,
+            },
+            default=str,
+        )
+        if _refused(response.status):
+            return self._finish(entry_id, FAILED, error=error)
+        # timeouts, throttling and server errors: DHL may have created the shipment
+        if not dhl_shipment.customer_references:
+            return self._finish(entry_id, UNKNOWN, error=error)
+        return self._finish_attempt(entry_id, error, verify=True)
+
+    def _finish_attempt(self, entry_id, error, verify):
+        """
+        Queues again an entry after a transient failure, or fails it when it has no attempts left
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            (attempts,) = connection.execute(
+                "SELECT attempts FROM dhl_outbox WHERE id = ?", (entry_id,)
+            ).fetchone()
+            state = PENDING if attempts < self.max_attempts else FAILED
+            connection.execute(
+                "UPDATE dhl_outbox SET state = ?, verify = ?, error = ?, leased_until = NULL, "
+                "next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (
+                    state,
+                    int(verify),
+                    error,
+                    now + self.retry_delay * 2 ** (attempts - 1),
+                    now,
+                    entry_id,
+                ),
+            )
+        return state
+
+    def _finish(
+        self,
+        entry_id,
+        state,
+        tracking_number=None,
+        dispatch_confirmation_number=None,
+        documents=None,
+        error=None,
+    ):
+        # an unknown entry may have been created by DHL: it is searched if it is retried
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE dhl_outbox SET state = ?, tracking_number = ?, dispatch_confirmation_number = ?, "
+                "documents = ?, error = ?, verify = MAX(verify, ?), leased_until = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (
+                    state,
+                    tracking_number,
+                    dispatch_confirmation_number,
+                    json.dumps(documents or []),
+                    error,
+                    int(state == UNKNOWN),
+                    time.time(),
+                    entry_id,
+                ),
+            )
+        return state
+
+
+def _refused(status):
+    """
+    True if DHL refused the shipment (4xx but 429) or it is not valid: sending it again gives the same answer
+    """
+    if status == ResponseStatus.INVALID_PAYLOAD.value:
+        return True
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= status < 500 and status != 429
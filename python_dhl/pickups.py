@@ -0,0 +1,192 @@
+import asyncio
+
+from python_dhl.batch import DHLBatch
+from python_dhl.cache import cache_key
+from python_dhl.resources.shipment import DHLPickup, DHLShipment
+
+
+class DHLPickupGroup(DHLPickup):
+    """
+    One pickup booking for shipments leaving the same sender address with the same accounts
+    in the same pickup window: its payload has the shipment details of all of them.
+    The planned pickup time is the latest of the group, when every shipment is ready.
+    """
+
+    def __init__(self, items, close_time=None, location=None):
+        """
+        :param items: list of DHLPickup or DHLShipment
+        :param close_time: latest pickup time as HH:MM
+        :param location: where the courier picks up the packages
+        """
+        first = items[0]
+        DHLPickup.__init__(
+            self,
+            first.sender_contact,
+            first.sender_address,
+            first.receiver_contact,
+            first.receiver_address,
+            max(_pickup_datetime(item) for item in items),
+            first.content,
+            first.accounts,
+            first.sender_registration_numbers,
+        )
+        self.items = items
+        self.close_time = close_time
+        self.location = location
+        self.shipment_details = [_shipment_details(item) for item in items]
+
+    def to_payload(self, create):
+        json_data = create(self)
+        json_data["shipmentDetails"] = self.shipment_details
+        if self.close_time:
+            json_data["closeTime"] = self.close_time
+        if self.location:
+            json_data["location"] = self.location
+        return json_data
+
+
+class DHLPickupConsolidator:
+    """
+    Books one pickup per sender address, accounts and pickup window (day and close time)
+    instead of one per shipment. Add the DHLPickup or DHLShipment objects (shipped with request_pickup=False)
+    and book them:
+
+    consolidator = DHLPickupConsolidator()
+    consolidator.add_all(shipments)
+    bookings = consolidator.book(service)
+    bookings.dispatch_confirmation_numbers()  # {shipment: "PRG...", ...}
+    """
+
+    def __init__(self, max_shipments=None):
+        """
+        :param max_shipments: maximum number of shipments in one pickup booking, a larger group is split
+        """
+        if max_shipments is not None and max_shipments < 1:
+            raise ValueError("max_shipments must be at least 1.")
+        self.max_shipments = max_shipments
+        self.pending = {}
+
+    def add(self, item):
+        """
+        :param item: DHLPickup or DHLShipment
+        :return: key of the group of the item
+        """
+        key = pickup_group_key(item)
+        self.pending.setdefault(key, []).append(item)
+        return key
+
+    def add_all(self, items):
+        for item in items:
+            self.add(item)
+
+    def groups(self):
+        """
+        :return: list of DHLPickupGroup, one per booking to make
+        """
+        groups = []
+        for items in self.pending.values():
+            first = items[0]
+            size = self.max_shipments or len(items)
+            for start in range(0, len(items), size):
+                groups.append(
+                    DHLPickupGroup(
+                        items[start : start + size],
+                        getattr(first, "pickup_close_time", None),
+                        getattr(first, "pickup_location", None),
+                    )
+                )
+        return groups
+
+    def book(self, service, max_concurrency=8):
+        """
+        Books the pickups with a DHLService, at most max_concurrency at once, and empties the consolidator
+        :return: DHLPickupBookings
+        """
+        groups = self.groups()
+        self.pending = {}
+        bookings = DHLPickupBookings()
+        for result in DHLBatch(service.pickup, groups, max_concurrency, ordered=False):
+            bookings.add(result.item, result.response)
+        return bookings
+
+    async def book_async(self, service, max_concurrency=8):
+        """
+        book() with an AsyncDHLService
+        """
+        groups = self.groups()
+        self.pending = {}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def book_group(group):
+            async with semaphore:
+                return await service.pickup(group)
+
+        responses = await asyncio.gather(*(book_group(group) for group in groups))
+        bookings = DHLPickupBookings()
+        for group, response in zip(groups, responses):
+            bookings.add(group, response)
+        return bookings
+
+
+class DHLPickupBookings(dict):
+    """
+    DHLPickupResponse of each consolidated item, shared by the items booked together.
+    requests is the number of pickup calls made.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.requests = 0
+
+    def add(self, group, response):
+        self.requests += 1
+        for item in group.items:
+            self[item] = response
+
+    def dispatch_confirmation_numbers(self):
+        """
+        :return: dict of the dispatch confirmation number by item, None if its booking failed
+        """
+        return {
+            item: (
+                response.dispatch_confirmation_numbers[0]
+                if response.success and response.dispatch_confirmation_numbers
+                else None
+            )
+            for item, response in self.items()
+        }
+
+    def failed(self):
+        """
+        :return: list of the items whose booking failed
+        """
+        return [item for item, response in self.items() if not response.success]
+
+
+def pickup_group_key(item):
+    """
+    Key of the pickup booking of a DHLPickup or DHLShipment: sender address, accounts, day and close time.
+    Addresses are compared without case and surrounding spaces.
+    """
+    params = dict(item.sender_address.to_dict())
+    params["accounts"] = ",".join(
+        "%s:%s" % (a["typeCode"], a["number"])
+        for a in (account.to_dict() for account in item.accounts)
+    )
+    params["pickupDate"] = _pickup_datetime(item).date().isoformat()
+    params["closeTime"] = getattr(item, "pickup_close_time", None)
+    params["location"] = getattr(item, "pickup_location", None)
+    return cache_key("pickup", params)
+
+
+def _pickup_datetime(item):
+    if isinstance(item, DHLShipment):
+        return item.ship_datetime
+    return item.pickup_datetime
+
+
+def _shipment_details(item):
+    details = item.content.to_dict_pickup()
+    if isinstance(item, DHLShipment) and not details.get("productCode"):
+        details = dict(details, productCode=item.product_code)
+    return details
@@ -0,0 +1,398 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from python_dhl.tracking import TRACKING_GROUP_SIZE
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# seconds between two polls by type code of the last event
+DEFAULT_INTERVALS = {
+    "WC": 15 * 60,  # with courier, out for delivery
+    "AR": 2 * HOUR,  # arrived at the delivery facility
+    "AF": 3 * HOUR,
+    "PL": 3 * HOUR,
+    "DF": 3 * HOUR,
+    "PU": 4 * HOUR,
+    "NH": 6 * HOUR,  # not home, delivery attempted
+    "CC": 6 * HOUR,  # awaiting collection by the consignee
+    "CD": 12 * HOUR,  # customs clearance delay
+    "CI": 12 * HOUR,
+    "CR": 6 * HOUR,
+    "OH": 12 * HOUR,  # on hold
+    "BA": 12 * HOUR,  # bad address
+}
+
+
+class DHLPollSchedule:
+    """
+    Decides when a shipment is polled again from the type code of its last event and its age:
+    often when it is out for delivery, rarely when it is held in customs, never again once delivered.
+    Shipments without news are polled less and less often and dropped after expire_after seconds.
+    """
+
+    def __init__(
+        self,
+        intervals=None,
+        default_interval=4 * HOUR,
+        not_found_interval=6 * HOUR,
+        error_interval=15 * 60,
+        final_types=("OK",),
+        dormant_after=2 * DAY,
+        max_interval=DAY,
+        expire_after=60 * DAY,
+    ):
+        """
+        :param intervals: dict of seconds by event type code, defaults to DEFAULT_INTERVALS
+        :param default_interval: seconds for the event types missing from intervals
+        :param not_found_interval: seconds when DHL has no events yet (label created, not picked up)
+        :param error_interval: seconds when the tracking request failed
+        :param final_types: event type codes after which the shipment is not polled anymore
+        :param dormant_after: seconds without new events after which the interval grows with the age of the last event
+        :param max_interval: longest interval of a dormant shipment
+        :param expire_after: seconds without new events (or since it was added) after which the shipment is dropped
+        """
+        self.intervals = dict(DEFAULT_INTERVALS if intervals is None else intervals)
+        self.default_interval = default_interval
+        self.not_found_interval = not_found_interval
+        self.error_interval = error_interval
+        self.final_types = frozenset(final_types)
+        self.dormant_after = dormant_after
+        self.max_interval = max_interval
+        self.expire_after = expire_after
+
+    def interval(self, tracked, now):
+        """
+        :param tracked: DHLTrackedShipment just polled
+        :param now: timestamp of the poll
+        :return: seconds before the next poll, None to stop polling the shipment
+        """
+        if tracked.event_type in self.final_types:
+            return None
+        age = now - (tracked.event_at or tracked.added_at)
+        if age > self.expire_after:
+            return None
+        if tracked.error:
+            return self.error_interval
+        if tracked.event_type is None:
+            return self.not_found_interval
+        interval = self.intervals.get(tracked.event_type, self.default_interval)
+        if age > self.dormant_after:
+            interval = max(interval, min(self.max_interval, interval * age / DAY))
+        return interval
+
+
+class DHLTrackedShipment:
+    """
+    Last known status of a shipment followed by a DHLTrackingPoller.
+    event is the last tracking event answered by DHL, event_type its type code and event_at its timestamp.
+    """
+
+    def __init__(self, tracking_number, added_at, next_poll_at):
+        self.tracking_number = tracking_number
+        self.added_at = added_at
+        self.next_poll_at = next_poll_at
+        self.event = None
+        self.event_type = None
+        self.event_at = None
+        self.polls = 0
+        self.error = None
+
+    def __str__(self):
+        return "%s: %s" % (self.tracking_number, self.event_type)
+
+
+class DHLStatusChange:
+    """
+    A new tracking event of a shipment, emitted by DHLTrackingPoller.
+    previous is the event known before (None on the first one), shipment the tracking answer of the shipment,
+    done is True when the shipment is not polled anymore.
+    """
+
+    def __init__(self, tracking_number, previous, event, shipment, done):
+        self.tracking_number = tracking_number
+        self.previous = previous
+        self.event = event
+        self.shipment = shipment
+        self.done = done
+
+    @property
+    def event_type(self):
+        return self.event.get("typeCode")
+
+    def __str__(self):
+        return "%s: %s -> %s" % (
+            self.tracking_number,
+            (self.previous or {}).get("typeCode"),
+            self.event_type,
+        )
+
+
+class DHLTrackingStore:
+    """
+    Storage of the shipments followed by a DHLTrackingPoller.
+    Implement it on a database to keep the last known statuses across restarts.
+    """
+
+    def get(self, tracking_number):
+        """
+        :return: DHLTrackedShipment or None
+        """
+        raise NotImplementedError
+
+    def put(self, tracked):
+        """
+        Stores a new or updated DHLTrackedShipment
+        """
+        raise NotImplementedError
+
+    def remove(self, tracking_number):
+        raise NotImplementedError
+
+    def due(self, now, limit=None):
+        """
+        :return: list of the DHLTrackedShipment whose next_poll_at is not after now, the most late first
+        """
+        raise NotImplementedError
+
+    def next_poll_at(self):
+        """
+        :return: the earliest next_poll_at, None if the store is empty
+        """
+        raise NotImplementedError
+
+
+class DHLMemoryTrackingStore(DHLTrackingStore):
+    """
+    In memory store, ordered by next poll time.
+    """
+
+    def __init__(self):
+        self.shipments = {}
+        self.schedule = []
+        self.lock = threading.Lock()
+
+    def get(self, tracking_number):
+        return self.shipments.get(tracking_number)
+
+    def put(self, tracked):
+        with self.lock:
+            self.shipments[tracked.tracking_number] = tracked
+            heapq.heappush(
+                self.schedule, (tracked.next_poll_at, tracked.tracking_number)
+            )
+
+    def remove(self, tracking_number):
+        with self.lock:
+            self.shipments.pop(tracking_number, None)
+
+    def due(self, now, limit=None):
+        due = []
+        with self.lock:
+            while self.schedule and self.schedule[0][0] <= now:
+                if limit is not None and len(due) >= limit:
+                    break
+                next_poll_at, tracking_number = heapq.heappop(self.schedule)
+                tracked = self.shipments.get(tracking_number)
+                # entries of removed or rescheduled shipments are skipped
+                if tracked is not None and tracked.next_poll_at == next_poll_at:
+                    due.append(tracked)
+        return due
+
+    def next_poll_at(self):
+        with self.lock:
+            while self.schedule:
+                next_poll_at, tracking_number = self.schedule[0]
+                tracked = self.shipments.get(tracking_number)
+                if tracked is not None and tracked.next_poll_at == next_poll_at:
+                    return next_poll_at
+                heapq.heappop(self.schedule)
+        return None
+
+    def __len__(self):
+        return len(self.shipments)
+
+
+class DHLTrackingPoller:
+    """
+    Polls the shipments added to it when they are due, in groups with service.track_many,
+    and emits only their status changes. The DHLPollSchedule decides when each shipment is polled again
+    and when it is dropped (e.g. delivered).
+
+    poller = DHLTrackingPoller(service, on_change=notify_customer)
+    poller.add(response.tracking_number)
+    poller.run()
+    """
+
+    def __init__(
+        self,
+        service,
+        schedule=None,
+        store=None,
+        on_change=None,
+        group_size=TRACKING_GROUP_SIZE,
+        max_concurrency=8,
+        max_polls=None,
+        clock=time.time,
+    ):
+        """
+        :param service: DHLService or AsyncDHLService (use poll_async)
+        :param schedule: DHLPollSchedule
+        :param store: DHLTrackingStore, in memory by default
+        :param on_change: callable receiving each DHLStatusChange
+        :param group_size: tracking numbers per request
+        :param max_concurrency: tracking requests in flight
+        :param max_polls: maximum number of shipments polled by one poll() call
+        :param clock: function returning the current timestamp
+        """
+        self.service = service
+        self.schedule = schedule or DHLPollSchedule()
+        self.store = store if store is not None else DHLMemoryTrackingStore()
+        self.on_change = on_change
+        self.group_size = group_size
+        self.max_concurrency = max_concurrency
+        self.max_polls = max_polls
+        self.clock = clock
+        self.polls = 0
+        self.changes = 0
+
+    def add(self, tracking_number, first_poll_at=None):
+        """
+        Starts following a shipment, polled first at first_poll_at (default now)
+        """
+        now = self.clock()
+        tracking_number = str(tracking_number)
+        if self.store.get(tracking_number) is None:
+            self.store.put(
+                DHLTrackedShipment(tracking_number, now, first_poll_at or now)
+            )
+
+    def remove(self, tracking_number):
+        self.store.remove(str(tracking_number))
+
+    def poll(self):
+        """
+        Polls the shipments that are due
+        :return: list of DHLStatusChange
+        """
+        now = self.clock()
+        due = self._due(now)
+        if not due:
+            return []
+        batch = self.service.track_many(
+            list(due), self.group_size, self.max_concurrency
+        )
+        return self._changes(due, batch, now)
+
+    async def poll_async(self):
+        """
+        poll() with an AsyncDHLService
+        """
+        now = self.clock()
+        due = self._due(now)
+        if not due:
+            return []
+        changes = []
+        async for tracking_number, response in self.service.track_many(
+            list(due), self.group_size, self.max_concurrency
+        ):
+            change = self._update(due[tracking_number], response, now)
+            if change is not None:
+                changes.append(change)
+        return changes
+
+    def run(self, stop=None, idle_sleep=60):
+        """
+        Polls until stop is set or no shipment is left, yielding the status changes.
+        :param stop: threading.Event
+        :param idle_sleep: longest sleep in seconds when no shipment is due
+        """
+        while len(self) and not (stop is not None and stop.is_set()):
+            yield from self.poll()
+            next_poll_at = self.store.next_poll_at()
+            if next_poll_at is None:
+                break
+            wait = min(idle_sleep, next_poll_at - self.clock())
+            if wait > 0:
+                if stop is not None:
+                    stop.wait(wait)
+                else:
+                    time.sleep(wait)
+
+    def __len__(self):
+        return len(self.store)
+
+    def _due(self, now):
+        return {t.tracking_number: t for t in self.store.due(now, self.max_polls)}
+
+    def _changes(self, due, batch, now):
+        changes = []
+        for tracking_number, response in batch:
+            change = self._update(due[tracking_number], response, now)
+            if change is not None:
+                changes.append(change)
+        return changes
+
+    def _update(self, tracked, response, now):
+        """
+        Stores the answer of a poll, reschedules the shipment
+        :return: DHLStatusChange if it has a new event
+        """
+        self.polls += 1
+        tracked.polls += 1
+        previous = tracked.event
+        shipment = None
+        tracked.error = None
+        if response.success:
+            shipment = response.shipments[0]
+            event = last_event(shipment)
+            if event is not None and event != previous:
+                tracked.event = event
+                tracked.event_type = event.get("typeCode")
+                tracked.event_at = event_timestamp(event) or now
+        elif getattr(response, "status", None) != 404:
+            tracked.error = response.error_title or "Tracking failed."
+        interval = self.schedule.interval(tracked, now)
+        if interval is None:
+            self.store.remove(tracked.tracking_number)
+        else:
+            tracked.next_poll_at = now + interval
+            self.store.put(tracked)
+        if tracked.event is previous:
+            return None
+        change = DHLStatusChange(
+            tracked.tracking_number, previous, tracked.event, shipment, interval is None
+        )
+        self.changes += 1
+        if self.on_change is not None:
+            self.on_change(change)
+        return change
+
+
+def last_event(shipment):
+    """
+    :param shipment: shipment of a tracking answer
+    :return: its most recent event, None if it has none
+    """
+    events = shipment.get("events") or []
+    if not events:
+        return None
+    # events are sorted by time, oldest first or newest first depending on the request
+    first, last = events[0], events[-1]
+    if (event_timestamp(first) or 0) > (event_timestamp(last) or 0):
+        return first
+    return last
+
+
+def event_timestamp(event):
+    """
+    :return: timestamp of a tracking event, None if it has no valid date and time
+    """
+    try:
+        return datetime.fromisoformat(
+            "%sT%s%s" % (event["date"], event["time"], event.get("GMTOffset", ""))
+        ).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,283 @@
+import asyncio
+import bisect
+import itertools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import partial
+
+from python_dhl.deadline import DHLDeadline
+from python_dhl.resources.helper import MeasurementUnit
+
+CHEAPEST = "cheapest"
+FASTEST = "fastest"
+
+
+class DHLRateCandidate:
+    """
+    One combination to rate: the package, the planned shipping date and the customs flag.
+    """
+
+    def __init__(
+        self,
+        product,
+        shipment_date,
+        with_customs=False,
+        unit_of_measurement=MeasurementUnit.METRIC.value,
+    ):
+        """
+        :param product: DHLProduct
+        :param shipment_date: Datetime timezone aware
+        :param with_customs: bool or true/false as string
+        :param unit_of_measurement: MeasurementUnit
+        """
+        self.product = product
+        self.shipment_date = shipment_date
+        self.with_customs = with_customs
+        self.unit_of_measurement = unit_of_measurement
+
+    def rates_arguments(self):
+        """
+        :return: dict of the get_rates arguments of the candidate
+        """
+        with_customs = self.with_customs
+        if isinstance(with_customs, bool):
+            with_customs = "true" if with_customs else "false"
+        return {
+            "product": self.product,
+            "shipment_date": self.shipment_date,
+            "with_customs": with_customs,
+            "unit_of_measurement": self.unit_of_measurement,
+        }
+
+
+def rate_candidates(
+    products,
+    shipment_dates,
+    customs=(False,),
+    unit_of_measurement=MeasurementUnit.METRIC.value,
+):
+    """
+    Every combination of packages, shipping dates and customs flags
+    :param products: list of DHLProduct, e.g. the same goods in different boxes
+    :param shipment_dates: list of timezone aware datetimes
+    :param customs: list of customs flags
+    :return: list of DHLRateCandidate
+    """
+    return [
+        DHLRateCandidate(product, shipment_date, with_customs, unit_of_measurement)
+        for product, shipment_date, with_customs in itertools.product(
+            products, shipment_dates, customs
+        )
+    ]
+
+
+class DHLRateQuote:
+    """
+    A product offered by DHL for a candidate, with the fields needed to compare it to the others:
+    price is the total price in currency (None if DHL gives none), delivery the estimated delivery datetime.
+    rate is the DHLRate of the product.
+    """
+
+    def __init__(self, candidate, rate, currency=None):
+        """
+        :param candidate: DHLRateCandidate rated
+        :param rate: DHLRate of DHLRatesResponse.rates
+        :param currency: currency of the price, defaults to the billing currency
+        """
+        total_price = rate.total_price(currency)
+        self.candidate = candidate
+        self.rate = rate
+        self.product_code = rate.product_code
+        self.product_name = rate.product_name
+        self.price = total_price.price if total_price is not None else None
+        self.currency = total_price.currency if total_price is not None else currency
+        self.delivery = rate.delivery
+        self.transit_days = rate.transit_days
+
+    def rank(self, by=CHEAPEST):
+        """
+        Sort key: price then delivery for CHEAPEST, delivery then price for FASTEST, missing values last
+        """
+        price = (self.price is None, self.price or 0)
+        delivery = (self.delivery is None, self.delivery or datetime.max)
+        return price + delivery if by == CHEAPEST else delivery + price
+
+    def __str__(self):
+        return "%s %s %s, delivery %s" % (
+            self.product_code,
+            self.price,
+            self.currency,
+            self.delivery,
+        )
+
+
+class DHLRateShopping:
+    """
+    Outcome of a rate shopping: quotes ranked by price or delivery, the candidates whose rating failed
+    and, with a policy, the quote selected (None if no quote satisfies it).
+    cancelled is the number of candidates not rated because a quote was selected first.
+    """
+
+    def __init__(self, by=CHEAPEST):
+        self.by = by
+        self.quotes = []
+        self.failures = []
+        self.selected = None
+        self.cancelled = 0
+
+    def add(self, candidate, response, currency=None):
+        """
+        :return: list of the DHLRateQuote of the response
+        """
+        if not response.success:
+            self.failures.append((candidate, response))
+            return []
+        quotes = [DHLRateQuote(candidate, rate, currency) for rate in response.rates]
+        for quote in quotes:
+            bisect.insort(self.quotes, quote, key=lambda q: q.rank(self.by))
+        return quotes
+
+    def select(self, quotes, policy):
+        """
+        Selects the best of quotes satisfying policy
+        :return: True if one was selected
+        """
+        accepted = sorted(
+            (quote for quote in quotes if policy(quote)),
+            key=lambda quote: quote.rank(self.by),
+        )
+        if accepted:
+            self.selected = accepted[0]
+        return bool(accepted)
+
+    @property
+    def best(self):
+        """
+        The selected quote if any, otherwise the first of the ranking
+        """
+        if self.selected is not None:
+            return self.selected
+        return self.quotes[0] if self.quotes else None
+
+    @property
+    def cheapest(self):
+        return min(self.quotes, key=lambda q: q.rank(CHEAPEST), default=None)
+
+    @property
+    def fastest(self):
+        return min(self.quotes, key=lambda q: q.rank(FASTEST), default=None)
+
+
+class DHLRateShopper:
+    """
+    Rates many candidates for the same route in parallel and ranks the products offered.
+    With a policy the shopping stops at the first answer offering a quote that satisfies it,
+    the candidates not rated yet are cancelled:
+
+    shopper = DHLRateShopper(service, currency="EUR")
+    shopping = shopper.shop(sender, receiver, rate_candidates(boxes, dates))
+    shopping.cheapest, shopping.fastest
+    shopping = shopper.shop(sender, receiver, candidates, policy=lambda q: q.price is not None and q.price < 40)
+    shopping.selected
+    """
+
+    def __init__(
+        self, service, max_concurrency=8, currency=None, timeout=None, deadline=None
+    ):
+        """
+        :param service: DHLService or AsyncDHLService
+        :param max_concurrency: number of get_rates calls in flight
+        :param currency: currency of the prices compared, defaults to the billing currency of each product
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole shopping, shared by every get_rates call
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.currency = currency
+        self.timeout = timeout
+        self.deadline = deadline
+
+    def _rates_call(self, sender, receiver, candidate, deadline):
+        return partial(
+            self.service.get_rates,
+            sender,
+            receiver,
+            timeout=self.timeout,
+            deadline=deadline,
+            **candidate.rates_arguments(),
+        )
+
+    def shop(self, sender, receiver, candidates, policy=None, by=CHEAPEST):
+        """
+        Rates the candidates with a DHLService
+        :param sender: DHLPostalAddress
+        :param receiver: DHLPostalAddress
+        :param candidates: iterable of DHLRateCandidate
+        :param policy: callable receiving a DHLRateQuote, True if it is good enough to stop shopping
+        :param by: CHEAPEST or FASTEST, order of the quotes
+        :return: DHLRateShopping
+        """
+        candidates = list(candidates)
+        shopping = DHLRateShopping(by)
+        if not candidates:
+            return shopping
+        deadline = DHLDeadline.start(self.deadline)
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(candidates))
+        )
+        pending = {
+            executor.submit(
+                self._rates_call(sender, receiver, candidate, deadline)
+            ): candidate
+            for candidate in candidates
+        }
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                quotes = []
+                for future in done:
+                    candidate = pending.pop(future)
+                    quotes += shopping.add(candidate, future.result(), self.currency)
+                if policy is not None and shopping.select(quotes, policy):
+                    shopping.cancelled = sum(f.cancel() for f in pending)
+                    return shopping
+            return shopping
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def shop_async(self, sender, receiver, candidates, policy=None, by=CHEAPEST):
+        """
+        shop() with an AsyncDHLService: the calls in flight are cancelled too when a quote is selected
+        """
+        candidates = list(candidates)
+        shopping = DHLRateShopping(by)
+        deadline = DHLDeadline.start(self.deadline)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def rate(candidate):
+            async with semaphore:
+                return await self._rates_call(sender, receiver, candidate, deadline)()
+
+        pending = {
+            asyncio.ensure_future(rate(candidate)): candidate
+            for candidate in candidates
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                quotes = []
+                for task in done:
+                    candidate = pending.pop(task)
+                    quotes += shopping.add(candidate, task.result(), self.currency)
+                if policy is not None and shopping.select(quotes, policy):
+                    shopping.cancelled = len(pending)
+                    return shopping
+            return shopping
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,389 @@
+"""
+Immutable versions of the resource models, with the same names and constructors.
+They use __slots__ instead of a __dict__, compute to_dict() once and are hashable, so they can be shared
+by many shipments (e.g. one sender for a whole manifest) and used as cache keys:
+
+from python_dhl.resources import frozen
+
+sender_address = frozen.DHLPostalAddress(street_line1="Via Roma 1", city_name="Thiene", postal_code="36016", country_code="IT")
+
+The dict returned by to_dict() is shared by every caller and must not be modified.
+"""
+
+import json
+
+from python_dhl.resources import address, shipment
+
+
+class DHLFrozenModel:
+    __slots__ = ("_dict", "_hash")
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def _cached(self, slot, build):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            value = build(self)
+            object.__setattr__(self, slot, value)
+            return value
+
+    def _fields(self):
+        return [
+            name
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if not name.startswith("_")
+        ]
+
+    def _key(self):
+        return tuple(_hashable(getattr(self, name)) for name in self._fields())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable." % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable." % type(self).__name__)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return self._cached("_hash", lambda model: hash(model._key()))
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            type(self).__name__,
+            ", ".join("%s=%r" % (name, getattr(self, name)) for name in self._fields()),
+        )
+
+    def __reduce__(self):
+        return _restore, (type(self), {n: getattr(self, n) for n in self._fields()})
+
+
+class DHLPostalAddress(DHLFrozenModel):
+    __slots__ = (
+        "street_line1",
+        "city",
+        "postal_code",
+        "country_code",
+        "province_code",
+        "county_name",
+        "street_line2",
+        "street_line3",
+    )
+
+    def __init__(
+        self,
+        street_line1,
+        city_name,
+        postal_code,
+        country_code,
+        province_code=None,
+        county_name=None,
+        street_line2=None,
+        street_line3=None,
+    ):
+        self._set(
+            street_line1=street_line1,
+            city=city_name,
+            postal_code=postal_code,
+            country_code=country_code,
+            province_code=province_code,
+            county_name=county_name,
+            street_line2=street_line2,
+            street_line3=street_line3,
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", address.DHLPostalAddress.to_dict)
+
+
+class DHLContactInformation(DHLFrozenModel):
+    __slots__ = (
+        "full_name",
+        "phone",
+        "contact_type",
+        "company_name",
+        "mobile_phone",
+        "email",
+    )
+
+    def __init__(
+        self,
+        full_name,
+        phone,
+        contact_type,
+        company_name=None,
+        mobile_phone=None,
+        email=None,
+    ):
+        self._set(
+            full_name=full_name,
+            phone=phone,
+            contact_type=contact_type,
+            company_name=company_name,
+            mobile_phone=mobile_phone,
+            email=email,
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", address.DHLContactInformation.to_dict)
+
+
+class DHLRegistrationNumber(DHLFrozenModel):
+    __slots__ = ("type_code", "number", "issuer_country_code")
+
+    def __init__(self, type_code, number, issuer_country_code):
+        self._set(
+            type_code=type_code,
+            number=number,
+            issuer_country_code=issuer_country_code,
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", address.DHLRegistrationNumber.to_dict)
+
+
+class DHLProduct(DHLFrozenModel):
+    __slots__ = ("weight", "length", "width", "height")
+
+    def __init__(self, weight, length, width, height):
+        self._set(weight=weight, length=length, width=width, height=height)
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLProduct.to_dict)
+
+
+class DHLAccountType(DHLFrozenModel):
+    __slots__ = ("type_code", "number")
+
+    def __init__(self, type_code, number):
+        self._set(type_code=type_code, number=number)
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLAccountType.to_dict)
+
+
+class DHLAddedService(DHLFrozenModel):
+    __slots__ = ("service_code", "value", "currency", "method", "dangerous_goods")
+
+    def __init__(
+        self, service_code, value=None, currency=None, method=None, dangerous_goods=None
+    ):
+        self._set(
+            service_code=service_code,
+            value=value,
+            currency=currency,
+            method=method,
+            dangerous_goods=_tuple(dangerous_goods),
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLAddedService.to_dict)
+
+
+class DHLShipmentContent(DHLFrozenModel):
+    __slots__ = (
+        "packages",
+        "is_custom_declarable",
+        "description",
+        "incoterm_code",
+        "unit_of_measurement",
+        "declared_value",
+        "declared_value_currency",
+        "export_declaration",
+        "product_code",
+        "_pickup_dict",
+    )
+
+    def __init__(
+        self,
+        packages,
+        is_custom_declarable,
+        description,
+        incoterm_code,
+        unit_of_measurement,
+        declared_value=None,
+        declared_value_currency=None,
+        export_declaration=None,
+        product_code=None,
+    ):
+        self._set(
+            packages=tuple(packages),
+            is_custom_declarable=is_custom_declarable,
+            description=description,
+            incoterm_code=incoterm_code,
+            unit_of_measurement=unit_of_measurement,
+            declared_value=declared_value,
+            declared_value_currency=declared_value_currency,
+            export_declaration=export_declaration,
+            product_code=product_code,
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLShipmentContent.to_dict)
+
+    def to_dict_pickup(self):
+        return self._cached("_pickup_dict", shipment.DHLShipmentContent.to_dict_pickup)
+
+
+class DHLShipmentOutput(DHLFrozenModel):
+    __slots__ = (
+        "dpi",
+        "logo_file_format",
+        "logo_file_base64",
+        "encoding_format",
+        "split_transport_and_waybill_doc_labels",
+        "all_documents_in_one_image",
+        "split_documents_by_pages",
+        "split_invoice_and_receipt",
+    )
+
+    def __init__(
+        self,
+        dpi,
+        logo_file_format,
+        logo_file_base64,
+        encoding_format="pdf",
+        split_transport_and_waybill_doc_labels=True,
+        all_documents_in_one_image=True,
+        split_documents_by_pages=True,
+        split_invoice_and_receipt=True,
+    ):
+        self._set(
+            dpi=dpi,
+            logo_file_format=logo_file_format,
+            logo_file_base64=logo_file_base64,
+            encoding_format=encoding_format,
+            split_transport_and_waybill_doc_labels=split_transport_and_waybill_doc_labels,
+            all_documents_in_one_image=all_documents_in_one_image,
+            split_documents_by_pages=split_documents_by_pages,
+            split_invoice_and_receipt=split_invoice_and_receipt,
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLShipmentOutput.to_dict)
+
+
+class DHLDocumentImage(DHLFrozenModel):
+    __slots__ = ("type_code", "image_format", "content")
+
+    def __init__(self, type_code, image_format, content):
+        self._set(type_code=type_code, image_format=image_format, content=content)
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLDocumentImage.to_dict)
+
+
+class DHLLineItem(DHLFrozenModel):
+    __slots__ = (
+        "number",
+        "description",
+        "price",
+        "quantity_value",
+        "quantity_unit",
+        "manufacturer_country",
+        "net_weight",
+        "gross_weight",
+        "commodity_codes",
+    )
+
+    def __init__(
+        self,
+        number,
+        description,
+        price,
+        quantity_value,
+        quantity_unit,
+        manufacturer_country,
+        net_weight,
+        gross_weight,
+        commodity_codes=None,
+    ):
+        self._set(
+            number=number,
+            description=description,
+            price=price,
+            quantity_value=quantity_value,
+            quantity_unit=quantity_unit,
+            manufacturer_country=manufacturer_country,
+            net_weight=net_weight,
+            gross_weight=gross_weight,
+            commodity_codes=_tuple(commodity_codes),
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", _line_item_dict)
+
+
+class DHLAdditionalCharge(DHLFrozenModel):
+    __slots__ = ("type_code", "value")
+
+    def __init__(self, type_code, value):
+        self._set(type_code=type_code, value=value)
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLAdditionalCharge.to_dict)
+
+
+class DHLExportDeclaration(DHLFrozenModel):
+    __slots__ = (
+        "line_items",
+        "invoice_number",
+        "invoice_date",
+        "terms_of_payment",
+        "export_reason_type",
+        "additional_charges",
+    )
+
+    def __init__(
+        self,
+        line_items,
+        invoice_number,
+        invoice_date,
+        terms_of_payment,
+        export_reason_type,
+        additional_charges=None,
+    ):
+        self._set(
+            line_items=tuple(line_items),
+            invoice_number=invoice_number,
+            invoice_date=invoice_date,
+            terms_of_payment=terms_of_payment,
+            export_reason_type=export_reason_type,
+            additional_charges=_tuple(additional_charges),
+        )
+
+    def to_dict(self):
+        return self._cached("_dict", shipment.DHLExportDeclaration.to_dict)
+
+
+def _line_item_dict(line_item):
+    data = shipment.DHLLineItem.to_dict(line_item)
+    if line_item.commodity_codes:
+        data["commodityCodes"] = list(line_item.commodity_codes)
+    return data
+
+
+def _tuple(values):
+    return tuple(values) if values is not None else None
+
+
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        # e.g. commodity codes given as dicts
+        return json.dumps(value, sort_keys=True, default=str)
+
+
+def _restore(cls, values):
+    model = cls.__new__(cls)
+    model._set(**values)
+    return model
@@ -12,6 +12,28 @@ class ShipmentType(Enum):
     PICKUP = 'pickup'
 
 
+class Endpoint(Enum):
+    """
+    MyDHL API endpoints, used to configure per endpoint policies such as rate limits.
+    """
+    SHIPMENTS = '/shipments'
+    RATES = '/rates'
+    PICKUPS = '/pickups'
+    ADDRESS_VALIDATE = '/address-validate'
+    TRACKING = '/tracking'
+    PROOF_OF_DELIVERY = '/proof-of-delivery'
+    UPLOAD_IMAGE = '/upload-image'
+
+
+class ResponseStatus(Enum):
+    """
+    Statuses set by the library in DHLResponse.status when a call fails before DHL answers.
+    """
+    DEADLINE_EXCEEDED = 'deadline-exceeded'
+    CIRCUIT_OPEN = 'circuit-open'
+    INVALID_PAYLOAD = 'invalid-payload'
+
+
 class AccountType(Enum):
     """
     shipper: your account code, who is requesting the shipment
@@ -99,4 +121,19 @@ class IncotermCode(Enum):
 def next_business_day():
     date_today = datetime.today()
     shift = 1 + ((date_today.weekday() // 4) * (6 - date_today.weekday()))
-    return date_today + timedelta(shift)
\ No newline at end of file
+    return date_today + timedelta(shift)
+
+
+def dhl_datetime(value):
+    """
+    Formats a timezone aware datetime as DHL expects it, e.g. 2024-05-02T10:00:00 GMT+02:00
+    """
+    formatted = datetime.strftime(value, '%Y-%m-%dT%H:%M:%S GMT%z')
+    return '{0}:{1}'.format(formatted[:-2], formatted[-2:])
+
+
+def parse_dhl_datetime(value):
+    """
+    Parses a datetime formatted by dhl_datetime, e.g. 2024-05-02T10:00:00 GMT+02:00
+    """
+    return datetime.strptime(value.replace(' GMT', ''), '%Y-%m-%dT%H:%M:%S%z')
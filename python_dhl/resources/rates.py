@@ -0,0 +1,285 @@
+"""
+Parsed rates answers: DHLRates indexes the products of a get_rates answer by product code,
+with the prices per currency and the cheapest and fastest product computed once.
+The models are slotted and immutable, so many quotes can be kept in memory (e.g. in a cache) and shared:
+
+rates = service.get_rates(sender, receiver, package, shipment_date).rates
+rates["P"].price("EUR"), rates.cheapest.product_code, rates.fastest.delivery
+"""
+
+import sys
+from datetime import datetime
+
+from python_dhl.resources.frozen import DHLFrozenModel
+
+BILLING_CURRENCY = "BILLC"
+
+
+class DHLRateCharge(DHLFrozenModel):
+    """
+    A line of a price breakdown: the service (e.g. FF fuel surcharge) or type (e.g. SPRQT) and its price.
+    """
+
+    __slots__ = ("name", "service_code", "type_code", "price")
+
+    def __init__(self, name, service_code, type_code, price):
+        self._set(
+            name=name, service_code=service_code, type_code=type_code, price=price
+        )
+
+
+class DHLRatePrice(DHLFrozenModel):
+    """
+    The total price of a product in a currency. currency_type is BILLC (billing), PULCL (published)
+    or BASEC (base), breakdown a tuple of DHLRateCharge.
+    """
+
+    __slots__ = ("currency_type", "currency", "price", "breakdown")
+
+    def __init__(self, currency_type, currency, price, breakdown=()):
+        self._set(
+            currency_type=_intern(currency_type),
+            currency=_intern(currency),
+            price=price,
+            breakdown=tuple(breakdown),
+        )
+
+
+class DHLRate(DHLFrozenModel):
+    """
+    A product offered by DHL: delivery is the estimated delivery datetime (local to the receiver),
+    prices a tuple of DHLRatePrice.
+    """
+
+    __slots__ = (
+        "product_code",
+        "local_product_code",
+        "product_name",
+        "network_type_code",
+        "is_customer_agreement",
+        "delivery",
+        "transit_days",
+        "prices",
+    )
+
+    def __init__(
+        self,
+        product_code,
+        local_product_code,
+        product_name,
+        network_type_code,
+        is_customer_agreement,
+        delivery,
+        transit_days,
+        prices,
+    ):
+        self._set(
+            product_code=_intern(product_code),
+            local_product_code=_intern(local_product_code),
+            product_name=_intern(product_name),
+            network_type_code=_intern(network_type_code),
+            is_customer_agreement=is_customer_agreement,
+            delivery=delivery,
+            transit_days=transit_days,
+            prices=tuple(prices),
+        )
+
+    @classmethod
+    def from_product(cls, product):
+        """
+        :param product: a product of the DHL rates answer
+        """
+        capabilities = product.get("deliveryCapabilities") or {}
+        delivery = capabilities.get("estimatedDeliveryDateAndTime")
+        breakdowns = _breakdowns(product)
+        return cls(
+            product.get("productCode"),
+            product.get("localProductCode"),
+            product.get("productName"),
+            product.get("networkTypeCode"),
+            product.get("isCustomerAgreement"),
+            datetime.fromisoformat(delivery) if delivery else None,
+            _transit_days(capabilities.get("totalTransitDays")),
+            [
+                DHLRatePrice(
+                    total.get("currencyType"),
+                    total.get("priceCurrency"),
+                    total.get("price"),
+                    breakdowns.get(
+                        (total.get("currencyType"), total.get("priceCurrency")), ()
+                    ),
+                )
+                for total in product.get("totalPrice") or []
+            ],
+        )
+
+    def total_price(self, currency=None):
+        """
+        :param currency: e.g. EUR, defaults to the billing currency
+        :return: DHLRatePrice in currency, the billing one if DHL gives more than one, None if there is none
+        """
+        found = None
+        for price in self.prices:
+            if currency is not None and price.currency != currency:
+                continue
+            if price.currency_type == BILLING_CURRENCY:
+                return price
+            if found is None:
+                found = price
+        return found
+
+    def price(self, currency=None):
+        """
+        :return: total price in currency (defaults to the billing currency), None if DHL gives none
+        """
+        total = self.total_price(currency)
+        return total.price if total is not None else None
+
+    @property
+    def currency(self):
+        """
+        The billing currency
+        """
+        total = self.total_price()
+        return total.currency if total is not None else None
+
+    @property
+    def currencies(self):
+        return tuple(dict.fromkeys(price.currency for price in self.prices))
+
+    def breakdown(self, currency=None):
+        """
+        :return: tuple of DHLRateCharge of the total price in currency
+        """
+        total = self.total_price(currency)
+        return total.breakdown if total is not None else ()
+
+    def cheapest_key(self, currency=None):
+        price = self.price(currency)
+        return (price is None, price or 0) + self.fastest_key()[:2]
+
+    def fastest_key(self, currency=None):
+        price = self.price(currency)
+        return (
+            self.delivery is None,
+            self.delivery or datetime.max,
+            price is None,
+            price or 0,
+        )
+
+
+class DHLRates(DHLFrozenModel):
+    """
+    The products of a rates answer in DHL order, indexed by product code (and local product code).
+    cheapest and fastest are computed in the billing currency when the rates are built,
+    cheapest_in(currency) for another one.
+    """
+
+    __slots__ = ("products", "cheapest", "fastest", "_index")
+
+    def __init__(self, products):
+        """
+        :param products: list of DHLRate
+        """
+        products = tuple(products)
+        index = {}
+        for rate in products:
+            if rate.product_code is not None:
+                index.setdefault(rate.product_code, rate)
+        for rate in products:
+            if rate.local_product_code is not None:
+                index.setdefault(rate.local_product_code, rate)
+        self._set(
+            products=products,
+            cheapest=min(products, key=DHLRate.cheapest_key, default=None),
+            fastest=min(products, key=DHLRate.fastest_key, default=None),
+            _index=index,
+        )
+
+    @classmethod
+    def from_products(cls, products):
+        """
+        :param products: the products list of a DHL rates answer, may be None
+        """
+        return cls(DHLRate.from_product(product) for product in products or [])
+
+    def _fields(self):
+        return ["products"]
+
+    def __reduce__(self):
+        return DHLRates, (self.products,)
+
+    def __getitem__(self, product_code):
+        return self._index[product_code]
+
+    def get(self, product_code, default=None):
+        return self._index.get(product_code, default)
+
+    def __contains__(self, product_code):
+        return product_code in self._index
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __len__(self):
+        return len(self.products)
+
+    @property
+    def product_codes(self):
+        return tuple(rate.product_code for rate in self.products)
+
+    def cheapest_in(self, currency):
+        """
+        :return: DHLRate with the lowest price in currency, None if there are no products
+        """
+        return min(
+            self.products, key=lambda rate: rate.cheapest_key(currency), default=None
+        )
+
+    def price(self, product_code, currency=None):
+        """
+        :return: total price of a product in currency, None if the product or the price is missing
+        """
+        rate = self._index.get(product_code)
+        return rate.price(currency) if rate is not None else None
+
+
+def _breakdowns(product):
+    """
+    Charges of each (currency type, currency): the detailed breakdown if DHL gives it, otherwise the total one
+    """
+    breakdowns = {}
+    for total in product.get("totalPriceBreakdown") or []:
+        breakdowns[(total.get("currencyType"), total.get("priceCurrency"))] = tuple(
+            DHLRateCharge(
+                None, None, _intern(charge.get("typeCode")), charge.get("price")
+            )
+            for charge in total.get("priceBreakdown") or []
+        )
+    for detailed in product.get("detailedPriceBreakdown") or []:
+        breakdowns[(detailed.get("currencyType"), detailed.get("priceCurrency"))] = (
+            tuple(
+                DHLRateCharge(
+                    _intern(charge.get("name")),
+                    _intern(charge.get("serviceCode")),
+                    _intern(charge.get("typeCode")),
+                    charge.get("price"),
+                )
+                for charge in detailed.get("breakdown") or []
+            )
+        )
+    return breakdowns
+
+
+def _transit_days(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intern(value):
+    """
+    Codes and names repeat in every answer: interned, the cached quotes share one copy of each
+    """
+    return sys.intern(value) if isinstance(value, str) else value
@@ -1,3 +1,30 @@
+import binascii
+import os
+
+from python_dhl.resources.rates import DHLRates
+
+
+class LazyField:
+    """
+    Response attribute read from the parsed DHL answer (response.data) the first time it is accessed,
+    so large fields such as label documents are not copied or walked unless they are used.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        data = instance.data
+        value = data.get(self.key) if data is not None else None
+        instance.__dict__[self.name] = value
+        return value
+
+
 class DHLResponse:
     def __init__(
         self,
@@ -12,12 +39,18 @@ class DHLResponse:
         self.error_detail = error_detail
         self.additional_error_details = additional_error_details
         self.status = status
+        self.remaining_time = None  # seconds left of the deadline of the call, if any
+        self.data = None  # parsed DHL answer, if any
+        self.remembered = (
+            False  # True once kept by an idempotency store, which hands it out again
+        )
 
     def __str__(self):
         return "%s" % ("Success" if self.success else "Fail: " + str(self.error_title))
 
 
 class DHLShipmentResponse(DHLResponse):
+    documents_bytes = LazyField("documents")
 
     def __init__(
         self,
@@ -39,9 +72,85 @@ class DHLShipmentResponse(DHLResponse):
         self.tracking_number = tracking_number
         self.identification_number = identification_number
         self.dispatch_confirmation_number = dispatch_confirmation_number
-        self.documents_bytes = documents_bytes
+        if documents_bytes is not None:
+            self.documents_bytes = documents_bytes
         self.message = message
         self.status = status
+        self._decoded = {}  # decoded content of the documents by index
+
+    def document_content(self, index=0, release=False):
+        """
+        Decoded content of a document, decoded on the first call: the calls after it return
+        views of the same buffer
+        :param index: position of the document in documents_bytes
+        :param release: if True the base64 content is dropped from the response once decoded,
+                        unless the response is remembered by an idempotency store
+        :return: read-only memoryview
+        """
+        content = self._decoded.get(index)
+        if content is None:
+            document = self.documents_bytes[index]
+            content = binascii.a2b_base64(_base64_content(document, index))
+            self._decoded[index] = content
+        if release:
+            self._release(index)
+        return memoryview(content)
+
+    def save_document(self, index, destination, chunk_size=1024 * 1024, release=True):
+        """
+        Decodes a document chunk by chunk into a file, without holding its decoded content in memory
+        :param index: position of the document in documents_bytes
+        :param destination: path or binary file object
+        :param chunk_size: bytes decoded at once
+        :param release: if True the base64 content is dropped from the response once written,
+                        unless the response is remembered by an idempotency store
+        :return: number of bytes written
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, "wb") as file:
+                written = self._write_document(index, file, chunk_size)
+        else:
+            written = self._write_document(index, destination, chunk_size)
+        if release:
+            self._release(index)
+            self._decoded.pop(index, None)
+        return written
+
+    def _write_document(self, index, file, chunk_size):
+        decoded = self._decoded.get(index)
+        if decoded is not None:
+            return file.write(decoded)
+        document = self.documents_bytes[index]
+        return write_base64(_base64_content(document, index), file, chunk_size)
+
+    def _release(self, index):
+        """
+        Drops the base64 content of a document. The documents of a response remembered by an
+        idempotency store are kept, as the store returns the same response to the next ship.
+        """
+        if not self.remembered:
+            self.documents_bytes[index].pop("content", None)
+
+    def save_documents(self, directory, release=True):
+        """
+        Saves every document in directory as <tracking number>-<index>-<type>.<format>
+        :return: list of paths
+        """
+        paths = []
+        for index, document in enumerate(self.documents_bytes or []):
+            path = os.path.join(
+                directory,
+                "%s-%d-%s.%s"
+                % (
+                    self.tracking_number,
+                    index,
+                    document.get("typeCode", "document"),
+                    document.get("imageFormat", "pdf").lower(),
+                ),
+            )
+            self.save_document(index, path, release=release)
+            paths.append(path)
+        return paths
 
 
 class DHLPickupResponse(DHLResponse):
@@ -69,6 +178,8 @@ class DHLPickupResponse(DHLResponse):
 
 
 class DHLUploadResponse(DHLResponse):
+    documents = LazyField("documents")
+
     def __init__(
         self,
         success,
@@ -81,10 +192,13 @@ class DHLUploadResponse(DHLResponse):
             self, success, error_title, error_detail, additional_error_details
         )
 
-        self.documents = documents
+        if documents is not None:
+            self.documents = documents
 
 
 class DHLTrackingResponse(DHLResponse):
+    shipments = LazyField("shipments")
+
     def __init__(
         self,
         success,
@@ -97,10 +211,13 @@ class DHLTrackingResponse(DHLResponse):
             self, success, error_title, error_detail, additional_error_details
         )
 
-        self.shipments = shipments
+        if shipments is not None:
+            self.shipments = shipments
 
 
 class DHLRatesResponse(DHLResponse):
+    products = LazyField("products")
+
     def __init__(
         self,
         success,
@@ -113,7 +230,22 @@ class DHLRatesResponse(DHLResponse):
             self, success, error_title, error_detail, additional_error_details
         )
 
-        self.products = products
+        if products is not None:
+            self.products = products
+
+    @property
+    def rates(self):
+        """
+        DHLRates of the products, indexed by product code, built the first time it is accessed
+        """
+        rates = self.__dict__.get("_rates")
+        if rates is None:
+            rates = self.__dict__["_rates"] = DHLRates.from_products(self.products)
+        return rates
+
+    @rates.setter
+    def rates(self, rates):
+        self.__dict__["_rates"] = rates
 
 
 class DHLValidateAddressResponse(DHLResponse):
@@ -132,3 +264,21 @@ class DHLValidateAddressResponse(DHLResponse):
 
         self.warnings = warnings
         self.address = address
+
+
+def _base64_content(document, index):
+    if document.get("content") is None:
+        raise ValueError("Document %d was already released." % index)
+    return document["content"]
+
+
+def write_base64(content, file, chunk_size=1024 * 1024):
+    """
+    Decodes base64 content into a binary file, chunk_size bytes at a time
+    :return: number of bytes written
+    """
+    step = max(4, chunk_size // 3 * 4)
+    written = 0
+    for start in range(0, len(content), step):
+        written += file.write(binascii.a2b_base64(content[start : start + step]))
+    return written
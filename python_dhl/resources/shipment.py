@@ -223,6 +223,14 @@ class DHLShipment:
         self.output_format = output_format
         self.customer_references = customer_references
 
+    def to_payload(self, create):
+        """
+        Body of POST /shipments. Shipments building their own body (e.g. from a template) override it.
+        :param create: function building the body from the fields of a shipment
+        :return: dict or JSON bytes
+        """
+        return create(self)
+
 
 class DHLPickup:
     def __init__(
@@ -245,6 +253,14 @@ class DHLPickup:
         self.content = content
         self.accounts = accounts
 
+    def to_payload(self, create):
+        """
+        Body of POST /pickups
+        :param create: function building the body from the fields of a pickup
+        :return: dict
+        """
+        return create(self)
+
 
 class DHLDocumentImage:
     def __init__(self, type_code, image_format, content):
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
+RETRY = "retry"
+VERIFY_AND_RETRY = "verify"
+
+
+class DHLRetryPolicy:
+    """
+    How a call to an endpoint is retried after a transient failure (network error or retryable status).
+    The wait before attempt n is a random value between 0 and backoff_factor * 2 ** n, capped to max_backoff
+    ("full jitter"), so many clients failing together do not retry together.
+
+    Calls that create something on DHL (POST /shipments and /pickups) are retried only when the request
+    surely did not reach DHL, or when the service can verify that nothing was created (see DHLService.ship).
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        backoff_factor=0.5,
+        max_backoff=30.0,
+        jitter=True,
+        retry_statuses=(500, 502, 503, 504),
+    ):
+        """
+        :param max_attempts: total number of attempts, 1 disables the retries
+        :param backoff_factor: base of the exponential backoff in seconds
+        :param max_backoff: maximum wait between two attempts in seconds
+        :param jitter: if False the full backoff is always waited
+        :param retry_statuses: HTTP statuses considered transient
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def backoff(self, attempt):
+        """
+        Seconds to wait before the given attempt (1 is the first retry)
+        """
+        delay = min(self.max_backoff, self.backoff_factor * 2**attempt)
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def action(self, attempt, idempotent, status=None, error=None, not_sent=False):
+        """
+        Decides what to do after a failed attempt
+        :param attempt: number of the failed attempt, starting from 0
+        :param idempotent: True if the call can be repeated without side effects
+        :param status: HTTP status of the answer
+        :param error: network error raised by the attempt, already known to be transient
+        :param not_sent: True if the error happened before the request reached DHL
+        :return: None (give up), RETRY or VERIFY_AND_RETRY
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if error is None and status not in self.retry_statuses:
+            return None
+        if idempotent or not_sent:
+            return RETRY
+        return VERIFY_AND_RETRY
+
+
+class DHLIdempotencyStore:
+    """
+    Remembers the successful responses of ship and pickup by idempotency key, so submitting
+    the same shipment or pickup again returns the first response instead of creating a duplicate.
+    It is kept in memory, shared by all the threads using the service.
+    """
+
+    def __init__(self, ttl=24 * 3600, max_size=100000):
+        """
+        :param ttl: seconds a response is remembered
+        :param max_size: maximum number of responses kept, the oldest are dropped first
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.responses.get(key)
+            if item is None:
+                return None
+            expires_at, response = item
+            if expires_at < time.monotonic():
+                del self.responses[key]
+                return None
+            return response
+
+    def set(self, key, response):
+        with self.lock:
+            self.responses[key] = (time.monotonic() + self.ttl, response)
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.max_size:
+                self.responses.popitem(last=False)
+
+
+def shipment_idempotency_key(dhl_shipment, account_number):
+    """
+    Key of a shipment built from its customer references, None if it has none
+    """
+    if not dhl_shipment.customer_references:
+        return None
+    return "shipment:%s:%s" % (
+        account_number,
+        "|".join(str(r) for r in dhl_shipment.customer_references),
+    )
+
+
+def payload_idempotency_key(prefix, payload):
+    """
+    Key built from the content of a request, identical requests have the same key
+    """
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return "%s:%s" % (prefix, digest)
@@ -1,11 +1,29 @@
+import copy
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from functools import partial
 from zoneinfo import ZoneInfo
 
 import requests
-from requests.auth import HTTPBasicAuth
+from urllib3.exceptions import NewConnectionError
 
-from python_dhl.resources.helper import MeasurementUnit
+from python_dhl.batch import DHLBatch
+from python_dhl.cache import cache_key
+from python_dhl.codec import get_json_codec
+from python_dhl.deadline import DHLDeadline, reports_remaining_time
+from python_dhl.exceptions import (
+    DHLDeadlineExceededError,
+    DHLShipmentExistsError,
+    DHLThrottledError,
+)
+from python_dhl.resources.helper import (
+    AccountType,
+    Endpoint,
+    MeasurementUnit,
+    dhl_datetime,
+)
+from python_dhl.resources.rates import DHLRates
 from python_dhl.resources.response import (
     DHLShipmentResponse,
     DHLPickupResponse,
@@ -15,59 +33,831 @@ from python_dhl.resources.response import (
     DHLRatesResponse,
     DHLValidateAddressResponse,
 )
+from python_dhl.retry import (
+    VERIFY_AND_RETRY,
+    payload_idempotency_key,
+    shipment_idempotency_key,
+)
+from python_dhl.stream import parse_documents, require_ijson
+from python_dhl.template import DHLShipmentTemplate
+from python_dhl.throttle import parse_retry_after
+from python_dhl.tracking import (
+    TRACKING_GROUP_SIZE,
+    DHLTrackingBatch,
+    DHLTrackingResults,
+    tracking_groups,
+)
+from python_dhl.transport import DHLRequestsTransport
+from python_dhl.validation import DOCUMENT, PICKUP, SHIPMENT
 
 logger = logging.getLogger(__name__)
 
+# days around the ship date searched when checking if a shipment was already created
+LOOKUP_WINDOW = timedelta(days=1)
+
+
+def is_timezone_aware(value):
+    return value.tzinfo is not None and value.tzinfo.utcoffset(value) is not None
 
-class DHLService:
+
+class BaseDHLService:
     """
-    Main class with static data and the main methods.
+    Static data, payload builders and response parsers shared by the sync and async services.
     """
 
     dhl_endpoint = "https://express.api.dhl.com/mydhlapi"
     dhl_endpoint_test = "https://express.api.dhl.com/mydhlapi/test"
 
-    def __init__(self, api_key, api_secret, account_number, test_mode=False):
+    default_retry_after = 1.0
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        account_number,
+        test_mode=False,
+        rate_limiter=None,
+        max_throttle_retries=3,
+        retry_policy=None,
+        retry_policies=None,
+        idempotency_store=None,
+        connect_timeout=10.0,
+        read_timeout=60.0,
+        circuit_breakers=None,
+        rates_cache=None,
+        address_cache=None,
+        single_flight=None,
+        json_codec=None,
+        validator=None,
+    ):
         self.api_key = api_key
         self.api_secret = api_secret
         self.account_number = account_number
         self.test_mode = test_mode
         self.endpoint_url = self.dhl_endpoint_test if test_mode else self.dhl_endpoint
+        self.rate_limiter = rate_limiter
+        self.max_throttle_retries = max_throttle_retries
+        self.retry_policy = retry_policy
+        self.retry_policies = dict(retry_policies or {})
+        self.idempotency_store = idempotency_store
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breakers = dict(circuit_breakers or {})
+        self.rates_cache = rates_cache
+        self.address_cache = address_cache
+        self.single_flight = single_flight
+        self.json_codec = get_json_codec(json_codec)
+        self.validator = validator
+
+    def _call_timeout(self, timeout, deadline):
+        """
+        (connect, read) timeout of one request: timeout of the call or of the service, shortened to the deadline
+        """
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        return timeout
+
+    def _limiter_wait(self, deadline):
+        return None if deadline is None else deadline.remaining()
+
+    def _retry_policy(self, endpoint):
+        return self.retry_policies.get(endpoint.value, self.retry_policy)
+
+    def _retry_action(self, policy, attempt, method, can_verify, deadline, **kwargs):
+        """
+        :return: (action, seconds to wait before retrying), action is None to give up
+        """
+        if policy is None:
+            return None, 0.0
+        action = policy.action(attempt, method != "POST", **kwargs)
+        if action == VERIFY_AND_RETRY and not can_verify:
+            return None, 0.0
+        if action is None:
+            return None, 0.0
+        delay = policy.backoff(attempt + 1)
+        if deadline is not None and not deadline.allows(delay):
+            return None, 0.0
+        return action, delay
+
+    def _remembered(self, key):
+        if key is None or self.idempotency_store is None:
+            return None
+        return self.idempotency_store.get(key)
+
+    def _remember(self, key, response):
+        if key is not None and self.idempotency_store is not None and response.success:
+            response.remembered = True
+            self.idempotency_store.set(key, response)
+
+    def _loads(self, dhl_response):
+        """
+        Parses the body of a DHL answer
+        """
+        return self.json_codec.loads(dhl_response.content)
+
+    def _cached_answer(self, cache, prefix, params):
+        """
+        The cached answer, None if it is not cached or the cache fails: DHL is then asked
+        """
+        if cache is None:
+            return None
+        try:
+            return cache.get(prefix, params)
+        except Exception as err:
+            logger.warning("DHL %s cache read failed: %s", prefix, err)
+            return None
+
+    def _cache_answer(self, cache, prefix, params, data, negative=False):
+        """
+        Caches an answer, a cache failing to store it does not fail the call
+        """
+        if cache is not None:
+            try:
+                cache.set(prefix, params, data, negative)
+            except Exception as err:
+                logger.warning("DHL %s cache write failed: %s", prefix, err)
+
+    def _cached_rates(self, params):
+        """
+        The cached rates answer and its DHLRates, built once per cached answer,
+        None if it is not cached or the cache fails
+        """
+        if self.rates_cache is None:
+            return None
+        try:
+            return self.rates_cache.get_model(
+                "rates", params, lambda data: DHLRates.from_products(data["products"])
+            )
+        except Exception as err:
+            logger.warning("DHL rates cache read failed: %s", err)
+            return None
+
+    def _shipment_lookup_params(self, dhl_shipment):
+        """
+        Search by first customer reference, in a window of a day around the ship date
+        """
+        account_number = self.account_number
+        for a in dhl_shipment.accounts:
+            if a.type_code == AccountType.SHIPPER:
+                account_number = a.number
+        ship_date = dhl_shipment.ship_datetime.date()
+        return {
+            "shipmentReference": dhl_shipment.customer_references[0],
+            "shipperAccountNumber": account_number,
+            "dateRangeFrom": (ship_date - LOOKUP_WINDOW).isoformat(),
+            "dateRangeTo": (ship_date + LOOKUP_WINDOW).isoformat(),
+            "trackingView": "shipment-details-only",
+            "levelOfDetail": "shipment",
+        }
+
+    def _found_shipment(self, dhl_shipment, status_code, data):
+        """
+        Tracking number of the shipment found by the lookup by reference: a shipment with all the customer
+        references and the receiver postal code and country of dhl_shipment, None if there is none.
+        Any answer other than found or not found raises, because it is not safe to create the shipment again.
+        """
+        if status_code == 404:
+            return None
+        shipments = data.get("shipments") if status_code == 200 else None
+        if shipments is None:
+            raise Exception(
+                "Unable to verify if the shipment was created: %s" % status_code
+            )
+        for shipment in shipments:
+            if _same_shipment(dhl_shipment, shipment):
+                return shipment["shipmentTrackingNumber"]
+        return None
+
+    def _existing_shipment_response(self, tracking_number):
+        return DHLShipmentResponse(
+            success=True,
+            tracking_number=tracking_number,
+            message="Shipment already created, the documents are not returned again.",
+        )
+
+    def _throttle_delay(self, endpoint, headers, attempt, deadline):
+        """
+        Handles a 429 answer: returns the seconds to wait before trying again,
+        or raises DHLThrottledError when there are no retries left
+        """
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = self.default_retry_after
+        logger.warning(
+            "DHL throttled %s, retry after %.1fs", endpoint.value, retry_after
+        )
+        if self.rate_limiter is not None:
+            self.rate_limiter.throttled(endpoint.value, retry_after)
+        if attempt >= self.max_throttle_retries or (
+            deadline is not None and not deadline.allows(retry_after)
+        ):
+            raise DHLThrottledError(endpoint.value, retry_after)
+        if (
+            self.rate_limiter is not None
+            and self.rate_limiter.bucket(endpoint.value) is not None
+        ):
+            # the bucket is paused, so the next acquire waits for every caller
+            return 0.0
+        return retry_after
+
+    def _failure(self, response_class, error_title, err):
+        response = response_class(
+            success=False, error_title=error_title, error_detail=str(err)
+        )
+        response.status = getattr(err, "status", None)
+        response.additional_error_details = getattr(err, "details", None)
+        return response
+
+    def _preflight(self, kind, payload):
+        """
+        Raises DHLValidationError if there is a validator and the payload is not valid
+        """
+        if self.validator is None:
+            return
+        if isinstance(payload, bytes):
+            payload = self.json_codec.loads(payload)
+        self.validator.validate(kind, payload)
+
+    def _validate_address_params(self, address, shipment_type):
+        return {
+            "type": shipment_type,
+            "strictValidation": "true",
+            "postalCode": address.postal_code,
+            "cityName": address.city,
+            "countryCode": address.country_code,
+        }
+
+    def _validate_address_response(self, data):
+        return DHLValidateAddressResponse(
+            success=True,
+            address=data.get("address"),
+            warnings=data.get("warnings"),
+        )
+
+    def _rates_params(
+        self,
+        sender,
+        receiver,
+        product,
+        shipment_date,
+        with_customs,
+        unit_of_measurement,
+    ):
+        dhl_ship_date = datetime.strftime(shipment_date, "%Y-%m-%d")
+        return {
+            "accountNumber": self.account_number,
+            "originCountryCode": sender.country_code,
+            "originCityName": sender.city,
+            "destinationCountryCode": receiver.country_code,
+            "destinationCityName": receiver.city,
+            "weight": product.weight,
+            "length": product.length,
+            "width": product.width,
+            "height": product.height,
+            "plannedShippingDate": dhl_ship_date,
+            "isCustomsDeclarable": with_customs,
+            "unitOfMeasurement": unit_of_measurement,
+        }
+
+    def _rates_response(self, data, rates=None):
+        response = self._lazy_response(DHLRatesResponse, data, "products")
+        if rates is not None:
+            response.rates = rates
+        return response
+
+    def _tracking_response(self, data):
+        return self._lazy_response(DHLTrackingResponse, data, "shipments")
+
+    def _tracking_params(self, tracking_numbers):
+        return {
+            "shipmentTrackingNumber": tracking_numbers,
+            "trackingView": "all-checkpoints",
+            "levelOfDetail": "all",
+        }
+
+    def _tracking_results(self, tracking_numbers, data):
+        """
+        Splits the answer of a tracking request by shipment,
+        the tracking numbers missing from it get a failed response
+        """
+        found = {
+            shipment["shipmentTrackingNumber"]: shipment
+            for shipment in data.get("shipments", [])
+        }
+        results = DHLTrackingResults()
+        for tracking_number in tracking_numbers:
+            shipment = found.get(tracking_number)
+            if shipment is not None:
+                results[tracking_number] = self._tracking_response(
+                    {"shipments": [shipment]}
+                )
+                continue
+            response = DHLTrackingResponse(
+                success=False,
+                error_title=data.get("title", "No shipments found."),
+                error_detail=data.get("detail"),
+            )
+            response.status = _status_code(data.get("status"), 404)
+            results[tracking_number] = response
+        return results
+
+    def _tracking_failures(self, tracking_numbers, err):
+        return DHLTrackingResults(
+            (t, self._failure(DHLTrackingResponse, "No shipments found.", err))
+            for t in tracking_numbers
+        )
+
+    def _proof_of_delivery_response(self, data):
+        return self._lazy_response(DHLUploadResponse, data, "documents")
+
+    def _lazy_response(self, response_class, data, *required):
+        """
+        Successful response reading its fields from data when they are accessed
+        :param required: keys that must be in data, a KeyError is raised otherwise
+        """
+        for key in required:
+            if key not in data:
+                raise KeyError(key)
+        response = response_class(success=True)
+        response.data = data
+        return response
+
+    def _error_response(self, data):
+        response = DHLShipmentResponse(
+            success=False,
+            error_title=data.get("title"),
+            error_detail=data.get("detail"),
+            additional_error_details=list(data.get("additionalDetails", [])),
+            message=data.get("message"),
+            status=data.get("status"),
+        )
+        response.data = data
+        return response
+
+    def _shipment_response(self, data):
+        if "detail" in data:
+            return self._error_response(data)
+        response = self._lazy_response(DHLShipmentResponse, data, "documents")
+        response.tracking_number = data["shipmentTrackingNumber"]
+        response.dispatch_confirmation_number = data.get("dispatchConfirmationNumber")
+        return response
+
+    def _pickup_response(self, data):
+        if "detail" in data:
+            return self._error_response(data)
+        response = DHLPickupResponse(
+            success=True,
+            dispatch_confirmation_numbers=data["dispatchConfirmationNumbers"],
+            ready_by_time=data.get("readyByTime"),
+            warnings=data.get("warnings"),
+        )
+        response.data = data
+        return response
+
+    def _upload_response(self, data):
+        response = DHLResponse(
+            success=True,
+            status=data.get("status"),
+        )
+        response.data = data
+        return response
+
+    def _create_shipment(self, dhl_shipment):
+        sender_address = dhl_shipment.sender_address.to_dict()
+        sender_contact = dhl_shipment.sender_contact.to_dict()
+        json_data = {
+            "plannedShippingDateAndTime": dhl_datetime(dhl_shipment.ship_datetime),
+            "pickup": {
+                "isRequested": dhl_shipment.request_pickup,
+                "pickupDetails": {
+                    "postalAddress": sender_address,
+                    "contactInformation": sender_contact,
+                    "typeCode": dhl_shipment.sender_contact.contact_type,
+                },
+            },
+            "productCode": dhl_shipment.product_code,
+            "outputImageProperties": dhl_shipment.output_format.to_dict(),
+            "customerDetails": {
+                "shipperDetails": {
+                    "postalAddress": sender_address,
+                    "contactInformation": sender_contact,
+                    "typeCode": dhl_shipment.sender_contact.contact_type,
+                },
+                "receiverDetails": {
+                    "postalAddress": dhl_shipment.receiver_address.to_dict(),
+                    "contactInformation": dhl_shipment.receiver_contact.to_dict(),
+                    "typeCode": dhl_shipment.receiver_contact.contact_type,
+                },
+            },
+            "content": dhl_shipment.content.to_dict(),
+            "accounts": [a.to_dict() for a in dhl_shipment.accounts],
+        }
+
+        if dhl_shipment.pickup_close_time:
+            json_data["pickup"]["closeTime"] = dhl_shipment.pickup_close_time
+        if dhl_shipment.pickup_location:
+            json_data["pickup"]["location"] = dhl_shipment.pickup_location
+        if dhl_shipment.sender_registration_numbers:
+            registration_numbers = [
+                r.to_dict() for r in dhl_shipment.sender_registration_numbers
+            ]
+            json_data["pickup"]["pickupDetails"][
+                "registrationNumbers"
+            ] = registration_numbers
+            json_data["customerDetails"]["shipperDetails"][
+                "registrationNumbers"
+            ] = registration_numbers
+        if dhl_shipment.added_services:
+            json_data["valueAddedServices"] = [
+                a.to_dict() for a in dhl_shipment.added_services
+            ]
+        if dhl_shipment.customer_references:
+            json_data["customerReferences"] = [
+                {"value": cr} for cr in dhl_shipment.customer_references
+            ]
+
+        return json_data
+
+    def _shipment_payload(self, dhl_shipment):
+        """
+        Body of POST /shipments: JSON bytes for shipments of a DHLShipmentTemplate or a DHLOutbox, a dict otherwise
+        """
+        return dhl_shipment.to_payload(self._create_shipment)
+
+    def shipment_template(self, prototype):
+        """
+        Template building quickly the payload of shipments sharing the sender, product, services,
+        output format and accounts of prototype
+        :param prototype: DHLShipment
+        :return: DHLShipmentTemplate
+        """
+        return DHLShipmentTemplate(
+            prototype, self._create_shipment(prototype), self.json_codec
+        )
+
+    def _pickup_payload(self, dhl_pickup):
+        """
+        Body of POST /pickups, with the shipment details of every shipment of a DHLPickupGroup
+        """
+        return dhl_pickup.to_payload(self._create_pickup)
+
+    def _create_pickup(self, dhl_pickup):
+        json_data = {
+            "plannedPickupDateAndTime": dhl_datetime(dhl_pickup.pickup_datetime),
+            "customerDetails": {
+                "shipperDetails": {
+                    "postalAddress": dhl_pickup.sender_address.to_dict(),
+                    "contactInformation": dhl_pickup.sender_contact.to_dict(),
+                },
+            },
+            "shipmentDetails": [dhl_pickup.content.to_dict_pickup()],
+        }
+
+        accounts = []
+        for a in dhl_pickup.accounts:
+            accounts.append(a.to_dict())
+        json_data["accounts"] = accounts
+
+        return json_data
+
+    def _create_document(self, dhl_document):
+        original_planned_shipping_date = datetime.strftime(
+            dhl_document.original_planned_shipping_date, "%Y-%m-%d"
+        )
+        document_data = {
+            "shipmentTrackingNumber": dhl_document.tracking_number,
+            "originalPlannedShippingDate": original_planned_shipping_date,
+            "productCode": dhl_document.product_code,
+        }
+
+        accounts = []
+        for a in dhl_document.accounts:
+            accounts.append(a.to_dict())
+        document_data["accounts"] = accounts
+
+        if dhl_document.document_images:
+            document_images = []
+            for d in dhl_document.document_images:
+                document_images.append(d.to_dict())
+            document_data["documentImages"] = document_images
+        return document_data
+
+
+class DHLService(BaseDHLService):
+    """
+    Main class with static data and the main methods.
+    """
 
-    def validate_address(self, address, shipment_type):
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        account_number,
+        test_mode=False,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+        rate_limiter=None,
+        max_throttle_retries=3,
+        retry_policy=None,
+        retry_policies=None,
+        idempotency_store=None,
+        connect_timeout=10.0,
+        read_timeout=60.0,
+        circuit_breakers=None,
+        rates_cache=None,
+        address_cache=None,
+        single_flight=None,
+        json_codec=None,
+        validator=None,
+        transport=None,
+    ):
+        """
+        The service owns a pooled HTTP session that is reused by every call, so the
+        TCP and TLS handshakes with DHL are paid once per connection instead of once per request.
+        The session can be shared between threads; close it with close() or use the service as a context manager.
+        :param pool_connections: number of host pools to cache
+        :param pool_maxsize: maximum number of connections kept open per host, set it to the number of worker threads
+        :param pool_block: if True, calls wait for a free connection instead of opening a throwaway one
+        :param keep_alive: if False, every connection is closed after its response
+        :param rate_limiter: DHLRateLimiter pacing the calls per endpoint
+        :param max_throttle_retries: times a call answered with 429 is retried, honouring Retry-After
+        :param retry_policy: DHLRetryPolicy used for transient failures of every endpoint, None disables retries
+        :param retry_policies: dict endpoint -> DHLRetryPolicy overriding retry_policy
+        :param idempotency_store: DHLIdempotencyStore remembering created shipments and pickups
+        :param connect_timeout: seconds to wait for a connection to DHL, None waits forever
+        :param read_timeout: seconds to wait for DHL to answer, None waits forever
+        :param circuit_breakers: dict endpoint -> DHLCircuitBreaker, open breakers fail the calls immediately
+        :param rates_cache: DHLResponseCache reusing the answers of get_rates
+        :param address_cache: DHLResponseCache reusing the answers of validate_address
+        :param single_flight: DHLSingleFlight sharing one request between identical concurrent get_rates and validate_address
+        :param json_codec: DHLJSONCodec or name ("json", "orjson", "ujson", "auto") encoding payloads and decoding answers
+        :param validator: DHLPayloadValidator checking the shipment, pickup and document payloads before sending them
+        :param transport: DHLTransport sending the requests instead of the pooled session, e.g. a DHLFakeTransport
+        """
+        BaseDHLService.__init__(
+            self,
+            api_key,
+            api_secret,
+            account_number,
+            test_mode,
+            rate_limiter,
+            max_throttle_retries,
+            retry_policy,
+            retry_policies,
+            idempotency_store,
+            connect_timeout,
+            read_timeout,
+            circuit_breakers,
+            rates_cache,
+            address_cache,
+            single_flight,
+            json_codec,
+            validator,
+        )
+        if transport is None:
+            transport = DHLRequestsTransport(
+                api_key,
+                api_secret,
+                pool_connections,
+                pool_maxsize,
+                pool_block,
+                keep_alive,
+            )
+        self.transport = transport
+
+    def close(self):
+        """
+        Closes the pooled connections. The service must not be used afterwards.
+        """
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _request(
+        self,
+        method,
+        path,
+        endpoint,
+        before_resend=None,
+        timeout=None,
+        deadline=None,
+        stream=False,
+        **kwargs,
+    ):
+        """
+        Sends a request, waiting for the rate limiter and retrying 429 and transient failures.
+        With stream=True the body of the returned response is not read, the caller must close it.
+        before_resend is called before sending again a POST that may have reached DHL, it must raise
+        if the request was already processed.
+        """
+        policy = self._retry_policy(endpoint)
+        breaker = self.circuit_breakers.get(endpoint.value)
+        attempt = 0
+        throttled = 0
+        while True:
+            if breaker is not None:
+                breaker.check(endpoint.value)
+            if self.rate_limiter is not None:
+                waited = self.rate_limiter.acquire(
+                    endpoint.value, self._limiter_wait(deadline)
+                )
+                if waited is None:
+                    raise DHLDeadlineExceededError(deadline.seconds)
+            call_timeout = self._call_timeout(timeout, deadline)
+            if breaker is not None:
+                breaker.before_call(endpoint.value)
+            started = time.monotonic()
+            try:
+                response = self.transport.request(
+                    method,
+                    self.endpoint_url + path,
+                    timeout=call_timeout,
+                    stream=stream,
+                    **kwargs,
+                )
+            except (requests.ConnectionError, requests.Timeout) as err:
+                _record_call(breaker, True, started)
+                if deadline is not None and deadline.remaining() <= 0:
+                    raise DHLDeadlineExceededError(deadline.seconds) from err
+                action, delay = self._retry_action(
+                    policy,
+                    attempt,
+                    method,
+                    before_resend is not None,
+                    deadline,
+                    error=err,
+                    not_sent=_not_sent(err),
+                )
+                if action is None:
+                    raise
+                logger.info("DHL %s %s failed, retrying: %s", method, path, err)
+            except Exception:
+                _record_call(breaker, True, started)
+                raise
+            else:
+                _record_call(breaker, response.status_code >= 500, started)
+                if response.status_code == 429:
+                    delay = self._throttle_delay(
+                        endpoint, response.headers, throttled, deadline
+                    )
+                    throttled += 1
+                    response.close()
+                    if delay:
+                        time.sleep(delay)
+                    continue
+                action, delay = self._retry_action(
+                    policy,
+                    attempt,
+                    method,
+                    before_resend is not None,
+                    deadline,
+                    status=response.status_code,
+                )
+                if action is None:
+                    return response
+                response.close()
+                logger.info(
+                    "DHL %s %s answered %s, retrying",
+                    method,
+                    path,
+                    response.status_code,
+                )
+            attempt += 1
+            time.sleep(delay)
+            if action == VERIFY_AND_RETRY:
+                before_resend(timeout, deadline)
+
+    def _json_body(self, payload):
+        """
+        Request arguments sending payload, a dict or already encoded JSON bytes
+        """
+        if not isinstance(payload, bytes):
+            payload = self.json_codec.dumps(payload)
+        return {"data": payload, "headers": {"Content-Type": "application/json"}}
+
+    def _read_answer(self, dhl_response, document_sink):
+        """
+        Parses an answer, passing its documents to document_sink if given (the response is then streamed)
+        """
+        if document_sink is None:
+            return self._loads(dhl_response)
+        try:
+            if dhl_response.status_code >= 300:
+                return self._loads(dhl_response)
+            dhl_response.raw.decode_content = True
+            return parse_documents(dhl_response.raw, document_sink)
+        finally:
+            dhl_response.close()
+
+    def _coalesced(self, prefix, params, deadline, call):
+        """
+        Runs call() through the single flight. Each caller gets its own shallow copy of the shared response,
+        so setting its remaining_time does not change the response of the others
+        """
+        if self.single_flight is None:
+            return call()
+        return copy.copy(
+            self.single_flight.do(cache_key(prefix, params), call, deadline)
+        )
+
+    def _fetch_address_validation(self, params, timeout, deadline):
+        dhl_response = self._request(
+            "GET",
+            "/address-validate",
+            Endpoint.ADDRESS_VALIDATE,
+            timeout=timeout,
+            deadline=deadline,
+            params=params,
+        )
+        data = self._loads(dhl_response)
+        response = self._validate_address_response(data)
+        if dhl_response.status_code == 200:
+            self._cache_answer(self.address_cache, "address", params, data)
+        elif dhl_response.status_code in (400, 404):
+            self._cache_answer(
+                self.address_cache, "address", params, data, negative=True
+            )
+        return response
+
+    def _fetch_rates(self, params, timeout, deadline):
+        dhl_response = self._request(
+            "GET",
+            "/rates",
+            Endpoint.RATES,
+            timeout=timeout,
+            deadline=deadline,
+            params=params,
+        )
+        data = self._loads(dhl_response)
+        response = self._rates_response(data)
+        if dhl_response.status_code == 200:
+            self._cache_answer(self.rates_cache, "rates", params, data)
+        return response
+
+    def find_shipment(self, dhl_shipment, timeout=None, deadline=None):
+        """
+        Searches DHL for a shipment already created: one with all the customer references and the receiver
+        of dhl_shipment, shipped within a day of its ship date
+        :param dhl_shipment: DHLShipment with customer references
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries
+        :return: tracking number of the shipment, None if DHL has none
+        Raises ValueError if the shipment has no customer references and any other error if DHL cannot tell,
+        in both cases it is unknown whether the shipment exists.
+        """
+        if not dhl_shipment.customer_references:
+            raise ValueError("A shipment without customer references cannot be found.")
+        dhl_response = self._request(
+            "GET",
+            "/tracking",
+            Endpoint.TRACKING,
+            timeout=timeout,
+            deadline=DHLDeadline.start(deadline),
+            params=self._shipment_lookup_params(dhl_shipment),
+        )
+        return self._found_shipment(
+            dhl_shipment, dhl_response.status_code, self._loads(dhl_response)
+        )
+
+    def _check_not_shipped(self, dhl_shipment, timeout, deadline):
+        tracking_number = self.find_shipment(dhl_shipment, timeout, deadline)
+        if tracking_number is not None:
+            raise DHLShipmentExistsError(tracking_number)
+
+    @reports_remaining_time
+    def validate_address(self, address, shipment_type, timeout=None, deadline=None):
         """
         Checks if an address is valid for a shipment
         :param address: DHLAddress
         :param shipment_type: ShipmentType
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         :return: DHLValidateAddressResponse
         """
         try:
-            params = {
-                "type": shipment_type,
-                "strictValidation": "true",
-                "postalCode": address.postal_code,
-                "cityName": address.city,
-                "countryCode": address.country_code,
-            }
-            dhl_response = requests.get(
-                self.endpoint_url + "/address-validate",
+            params = self._validate_address_params(address, shipment_type)
+            cached = self._cached_answer(self.address_cache, "address", params)
+            if cached is not None:
+                return self._validate_address_response(cached)
+            return self._coalesced(
+                "address",
                 params,
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
-            )
-            response = DHLValidateAddressResponse(
-                success=True,
+                deadline,
+                partial(self._fetch_address_validation, params, timeout, deadline),
             )
-            for attribute, value in dhl_response.json().items():
-                if attribute == "address":
-                    response.address = value
-                if attribute == "warnings":
-                    response.warnings = value
-            return response
         except Exception as err:
-            return DHLValidateAddressResponse(
-                success=False, error_title="No address found.", error_detail=str(err)
-            )
+            return self._failure(DHLValidateAddressResponse, "No address found.", err)
 
+    @reports_remaining_time
     def get_rates(
         self,
         sender,
@@ -76,6 +866,8 @@ class DHLService:
         shipment_date,
         with_customs="false",
         unit_of_measurement=MeasurementUnit.METRIC.value,
+        timeout=None,
+        deadline=None,
     ):
         """
         Returns DHL's product capabilities and prices (where applicable)
@@ -86,384 +878,326 @@ class DHLService:
         :param shipment_date: Datetime timezone aware
         :param with_customs: true/false as string
         :param unit_of_measurement: MeasurementUnit
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         :return: DHLRatesResponse
         """
         try:
-            if not (
-                shipment_date.tzinfo is not None
-                and shipment_date.tzinfo.utcoffset(shipment_date) is not None
-            ):
+            if not is_timezone_aware(shipment_date):
                 return DHLRatesResponse(
                     success=False, error_title="Ship date is not timezone aware."
                 )
-            dhl_ship_date = datetime.strftime(shipment_date, "%Y-%m-%d")
-            params = {
-                "accountNumber": self.account_number,
-                "originCountryCode": sender.country_code,
-                "originCityName": sender.city,
-                "destinationCountryCode": receiver.country_code,
-                "destinationCityName": receiver.city,
-                "weight": product.weight,
-                "length": product.length,
-                "width": product.width,
-                "height": product.height,
-                "plannedShippingDate": dhl_ship_date,
-                "isCustomsDeclarable": with_customs,
-                "unitOfMeasurement": unit_of_measurement,
-            }
-            dhl_response = requests.get(
-                self.endpoint_url + "/rates",
-                params=params,
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+            params = self._rates_params(
+                sender,
+                receiver,
+                product,
+                shipment_date,
+                with_customs,
+                unit_of_measurement,
             )
-            response = DHLRatesResponse(
-                success=True,
-                products=dhl_response.json()["products"],
+            cached = self._cached_rates(params)
+            if cached is not None:
+                return self._rates_response(*cached)
+            return self._coalesced(
+                "rates",
+                params,
+                deadline,
+                partial(self._fetch_rates, params, timeout, deadline),
             )
-            return response
         except Exception as err:
-            return DHLRatesResponse(
-                success=False, error_title="No rates found.", error_detail=str(err)
-            )
+            return self._failure(DHLRatesResponse, "No rates found.", err)
 
-    def get_shipment_status(self, tracking_number):
+    @reports_remaining_time
+    def get_shipment_status(self, tracking_number, timeout=None, deadline=None):
         """
         Returns all statuses given a tracking number
         :param tracking_number: string
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         """
         try:
-            dhl_response = requests.get(
-                self.endpoint_url + "/shipments" + str(tracking_number) + "/tracking",
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+            dhl_response = self._request(
+                "GET",
+                "/shipments/" + str(tracking_number) + "/tracking",
+                Endpoint.TRACKING,
+                timeout=timeout,
+                deadline=deadline,
             )
-            response = DHLTrackingResponse(
-                success=True,
-                shipments=dhl_response.json()["shipments"],
+            return self._tracking_response(self._loads(dhl_response))
+        except Exception as err:
+            return self._failure(DHLTrackingResponse, "No shipments found.", err)
+
+    def track_group(self, tracking_numbers, timeout=None, deadline=None):
+        """
+        Returns the statuses of several shipments with one request
+        :param tracking_numbers: list of strings
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries
+        :return: DHLTrackingResults, a dict of DHLTrackingResponse by tracking number
+        """
+        tracking_numbers = [str(t) for t in tracking_numbers]
+        try:
+            dhl_response = self._request(
+                "GET",
+                "/tracking",
+                Endpoint.TRACKING,
+                timeout=timeout,
+                deadline=DHLDeadline.start(deadline),
+                params=self._tracking_params(tracking_numbers),
             )
-            return response
+            return self._tracking_results(tracking_numbers, self._loads(dhl_response))
         except Exception as err:
-            return DHLTrackingResponse(
-                success=False, error_title="No shipments found.", error_detail=str(err)
+            return self._tracking_failures(tracking_numbers, err)
+
+    def track_many(
+        self,
+        tracking_numbers,
+        group_size=TRACKING_GROUP_SIZE,
+        max_concurrency=8,
+        timeout=None,
+        deadline=None,
+    ):
+        """
+        Tracks many shipments, taking group_size tracking numbers at a time from the iterable
+        and sending one request per group, with at most max_concurrency requests in flight.
+        :param tracking_numbers: iterable of strings
+        :param group_size: tracking numbers per request
+        :param max_concurrency: number of requests in flight
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for each group including retries
+        :return: DHLTrackingBatch yielding (tracking number, DHLTrackingResponse) as the groups complete
+        """
+        return DHLTrackingBatch(
+            DHLBatch(
+                partial(self.track_group, timeout=timeout, deadline=deadline),
+                tracking_groups(tracking_numbers, group_size),
+                max_concurrency,
+                ordered=False,
             )
+        )
 
-    def check_shipment(self, tracking_number):
+    @reports_remaining_time
+    def check_shipment(
+        self, tracking_number, timeout=None, deadline=None, document_sink=None
+    ):
         """
         Returns all documents available given a tracking number
         :param tracking_number: string
+        :param document_sink: callable receiving each document as it is read, see ship
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         """
         try:
-            dhl_response = requests.get(
-                self.endpoint_url
-                + "/shipments"
-                + str(tracking_number)
-                + "/proof-of-delivery",
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+            if document_sink is not None:
+                require_ijson()
+            dhl_response = self._request(
+                "GET",
+                "/shipments/" + str(tracking_number) + "/proof-of-delivery",
+                Endpoint.PROOF_OF_DELIVERY,
+                timeout=timeout,
+                deadline=deadline,
+                stream=document_sink is not None,
             )
-            response = DHLUploadResponse(
-                success=True,
-                documents=dhl_response.json()["documents"],
+            return self._proof_of_delivery_response(
+                self._read_answer(dhl_response, document_sink)
             )
-            return response
         except Exception as err:
-            return DHLUploadResponse(
-                success=False,
-                error_title="No electronic proof of delivery found.",
-                error_detail=str(err),
+            return self._failure(
+                DHLUploadResponse, "No electronic proof of delivery found.", err
             )
 
-    def ship(self, dhl_shipment):
+    @reports_remaining_time
+    def ship(
+        self,
+        dhl_shipment,
+        idempotency_key=None,
+        timeout=None,
+        deadline=None,
+        document_sink=None,
+    ):
         """
         Generates a shipping label and transmit shipment detail to DHL
+        With an idempotency_store, a shipment with the same customer references (or idempotency_key)
+        already created returns the first response. If a retry policy is set and the creation fails
+        ambiguously, the shipment is searched by its customer references and receiver before being sent again.
         :param dhl_shipment: DHLShipment
+        :param idempotency_key: string, defaults to the account and the customer references
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
+        :param document_sink: callable receiving each label document as it is read from the answer (requires ijson),
+                              e.g. a DHLDocumentWriter. The documents are not kept in response.documents_bytes.
         :return: DHLShipmentResponse
         """
         try:
-            if not (
-                dhl_shipment.ship_datetime.tzinfo is not None
-                and dhl_shipment.ship_datetime.tzinfo.utcoffset(
-                    dhl_shipment.ship_datetime
-                )
-                is not None
-            ):
+            if document_sink is not None:
+                require_ijson()
+            if not is_timezone_aware(dhl_shipment.ship_datetime):
                 return DHLShipmentResponse(
                     success=False, error_title="Ship date is not timezone aware."
                 )
-            shipment = self._create_shipment(dhl_shipment)
-            dhl_response = requests.post(
-                self.endpoint_url + "/shipments",
-                json=shipment,
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+            key = idempotency_key or shipment_idempotency_key(
+                dhl_shipment, self.account_number
             )
-            if "detail" in dhl_response.json():
-                error_title = None
-                error_detail = None
-                additional_error_details = []
-                message = None
-                status = None
-                for attribute, value in dhl_response.json().items():
-                    if attribute == "title":
-                        error_title = value
-                    if attribute == "detail":
-                        error_detail = value
-                    if attribute == "additionalDetails":
-                        for e in value:
-                            additional_error_details.append(e)
-                    if attribute == "message":
-                        message = value
-                    if attribute == "status":
-                        status = value
-                response = DHLShipmentResponse(
-                    success=False,
-                    error_title=error_title,
-                    error_detail=error_detail,
-                    additional_error_details=additional_error_details,
-                    message=message,
-                    status=status,
+            response = self._remembered(key)
+            if response is not None:
+                return response
+            shipment = self._shipment_payload(dhl_shipment)
+            self._preflight(SHIPMENT, shipment)
+            before_resend = None
+            if dhl_shipment.customer_references:
+                before_resend = partial(self._check_not_shipped, dhl_shipment)
+            try:
+                dhl_response = self._request(
+                    "POST",
+                    "/shipments",
+                    Endpoint.SHIPMENTS,
+                    timeout=timeout,
+                    deadline=deadline,
+                    before_resend=before_resend,
+                    stream=document_sink is not None,
+                    **self._json_body(shipment),
                 )
-            else:
-                if "dispatchConfirmationNumber" in dhl_response.json():
-                    response = DHLShipmentResponse(
-                        success=True,
-                        tracking_number=dhl_response.json()["shipmentTrackingNumber"],
-                        documents_bytes=dhl_response.json()["documents"],
-                        dispatch_confirmation_number=dhl_response.json()[
-                            "dispatchConfirmationNumber"
-                        ],
-                    )
-                else:
-                    response = DHLShipmentResponse(
-                        success=True,
-                        tracking_number=dhl_response.json()["shipmentTrackingNumber"],
-                        documents_bytes=dhl_response.json()["documents"],
-                    )
+                response = self._shipment_response(
+                    self._read_answer(dhl_response, document_sink)
+                )
+            except DHLShipmentExistsError as err:
+                response = self._existing_shipment_response(err.tracking_number)
+            self._remember(key, response)
             return response
         except Exception as err:
-            return DHLShipmentResponse(
-                success=False,
-                error_title="Shipment error. No label.",
-                error_detail=str(err),
-            )
-
-    def _create_shipment(self, dhl_shipment):
-        dhl_ship_date = datetime.strftime(
-            dhl_shipment.ship_datetime, "%Y-%m-%dT%H:%M:%S GMT%z"
-        )
-        dhl_ship_date = "{0}:{1}".format(dhl_ship_date[:-2], dhl_ship_date[-2:])
-
-        json_data = {
-            "plannedShippingDateAndTime": dhl_ship_date,
-            "pickup": {
-                "isRequested": dhl_shipment.request_pickup,
-                "pickupDetails": {
-                    "postalAddress": dhl_shipment.sender_address.to_dict(),
-                    "contactInformation": dhl_shipment.sender_contact.to_dict(),
-                    "typeCode": dhl_shipment.sender_contact.contact_type,
-                },
-            },
-            "productCode": dhl_shipment.product_code,
-            "outputImageProperties": dhl_shipment.output_format.to_dict(),
-            "customerDetails": {
-                "shipperDetails": {
-                    "postalAddress": dhl_shipment.sender_address.to_dict(),
-                    "contactInformation": dhl_shipment.sender_contact.to_dict(),
-                    "typeCode": dhl_shipment.sender_contact.contact_type,
-                },
-                "receiverDetails": {
-                    "postalAddress": dhl_shipment.receiver_address.to_dict(),
-                    "contactInformation": dhl_shipment.receiver_contact.to_dict(),
-                    "typeCode": dhl_shipment.receiver_contact.contact_type,
-                },
-            },
-            "content": dhl_shipment.content.to_dict(),
-        }
-
-        accounts = []
-        for a in dhl_shipment.accounts:
-            accounts.append(a.to_dict())
-        json_data["accounts"] = accounts
-
-        if dhl_shipment.pickup_close_time:
-            json_data["pickup"]["closeTime"] = dhl_shipment.pickup_close_time
-        if dhl_shipment.pickup_location:
-            json_data["pickup"]["location"] = dhl_shipment.pickup_location
-        if dhl_shipment.sender_registration_numbers:
-            registration_numbers = []
-            for r in dhl_shipment.sender_registration_numbers:
-                registration_numbers.append(r.to_dict())
-            json_data["pickup"]["pickupDetails"][
-                "registrationNumbers"
-            ] = registration_numbers
-            json_data["customerDetails"]["shipperDetails"][
-                "registrationNumbers"
-            ] = registration_numbers
-        if dhl_shipment.added_services:
-            added_services = []
-            for a in dhl_shipment.added_services:
-                added_services.append(a.to_dict())
-            json_data["valueAddedServices"] = added_services
-        if dhl_shipment.sender_address.street_line2:
-            json_data["pickup"]["pickupDetails"]["postalAddress"][
-                "addressLine2"
-            ] = dhl_shipment.sender.street_line2
-        if dhl_shipment.sender_address.street_line3:
-            json_data["pickup"]["pickupDetails"]["postalAddress"][
-                "addressLine3"
-            ] = dhl_shipment.sender.street_line3
-        if dhl_shipment.sender_address.county_name:
-            json_data["pickup"]["pickupDetails"]["postalAddress"][
-                "countyName"
-            ] = dhl_shipment.sender.county_name
-        if dhl_shipment.customer_references:
-            references = []
-            for cr in dhl_shipment.customer_references:
-                references.append({"value": cr})
-            json_data["customerReferences"] = references
+            return self._failure(DHLShipmentResponse, "Shipment error. No label.", err)
 
-        return json_data
+    def ship_many(self, dhl_shipments, max_concurrency=8, ordered=True):
+        """
+        Ships many shipments concurrently, taking at most max_concurrency of them from the iterable at once.
+        Keep max_concurrency within the pool_maxsize of the service so every call reuses a connection.
+        :param dhl_shipments: iterable of DHLShipment
+        :param max_concurrency: number of shipments in flight
+        :param ordered: if True results are returned in input order, otherwise as they complete
+        :return: DHLBatch yielding DHLBatchResult with a DHLShipmentResponse, timing in DHLBatch.stats
+        """
+        return DHLBatch(self.ship, dhl_shipments, max_concurrency, ordered)
 
-    def pickup(self, dhl_pickup):
+    @reports_remaining_time
+    def pickup(self, dhl_pickup, idempotency_key=None, timeout=None, deadline=None):
         """
         Creates a DHL Express pickup booking request
+        With an idempotency_store, booking again the same pickup returns the first response.
+        Pickups cannot be searched, so they are retried only when the request did not reach DHL.
         :param dhl_pickup: DHLPickup
+        :param idempotency_key: string, defaults to a hash of the pickup request
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         :return: DHLShipmentResponse
         """
         try:
-            if not (
-                dhl_pickup.pickup_datetime.tzinfo is not None
-                and dhl_pickup.pickup_datetime.tzinfo.utcoffset(
-                    dhl_pickup.pickup_datetime
-                )
-                is not None
-            ):
+            if not is_timezone_aware(dhl_pickup.pickup_datetime):
                 return DHLPickupResponse(
                     success=False, error_title="Pickup date is not timezone aware."
                 )
-            pickup = self._create_pickup(dhl_pickup)
-            dhl_response = requests.post(
-                self.endpoint_url + "/pickups",
-                json=pickup,
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
+            pickup = self._pickup_payload(dhl_pickup)
+            self._preflight(PICKUP, pickup)
+            key = idempotency_key or payload_idempotency_key("pickup", pickup)
+            response = self._remembered(key)
+            if response is not None:
+                return response
+            dhl_response = self._request(
+                "POST",
+                "/pickups",
+                Endpoint.PICKUPS,
+                timeout=timeout,
+                deadline=deadline,
+                **self._json_body(pickup),
             )
-            if "detail" in dhl_response.json():
-                error_title = None
-                error_detail = None
-                additional_error_details = []
-                message = None
-                status = None
-                for attribute, value in dhl_response.json().items():
-                    if attribute == "title":
-                        error_title = value
-                    if attribute == "detail":
-                        error_detail = value
-                    if attribute == "additionalDetails":
-                        for e in value:
-                            additional_error_details.append(e)
-                    if attribute == "message":
-                        message = value
-                    if attribute == "status":
-                        status = value
-                response = DHLShipmentResponse(
-                    success=False,
-                    error_title=error_title,
-                    error_detail=error_detail,
-                    additional_error_details=additional_error_details,
-                    message=message,
-                    status=status,
-                )
-            else:
-                response = DHLPickupResponse(
-                    success=True,
-                    dispatch_confirmation_numbers=dhl_response.json()[
-                        "dispatchConfirmationNumbers"
-                    ],
-                )
-                for attribute, value in dhl_response.json().items():
-                    if attribute == "readyByTime":
-                        response.ready_by_time = value
-                    if attribute == "warnings":
-                        response.warnings = value
+            response = self._pickup_response(self._loads(dhl_response))
+            self._remember(key, response)
             return response
         except Exception as err:
-            return DHLPickupResponse(
-                success=False,
-                error_title="Pickup error. No label.",
-                error_detail=str(err),
-            )
+            return self._failure(DHLPickupResponse, "Pickup error. No label.", err)
 
-    def _create_pickup(self, dhl_pickup):
-        dhl_pickup_date = datetime.strftime(
-            dhl_pickup.pickup_datetime, "%Y-%m-%dT%H:%M:%S GMT%z"
-        )
-        dhl_pickup_date = "{0}:{1}".format(dhl_pickup_date[:-2], dhl_pickup_date[-2:])
-
-        json_data = {
-            "plannedPickupDateAndTime": dhl_pickup_date,
-            "customerDetails": {
-                "shipperDetails": {
-                    "postalAddress": dhl_pickup.sender_address.to_dict(),
-                    "contactInformation": dhl_pickup.sender_contact.to_dict(),
-                },
-            },
-            "shipmentDetails": [dhl_pickup.content.to_dict_pickup()],
-        }
-
-        accounts = []
-        for a in dhl_pickup.accounts:
-            accounts.append(a.to_dict())
-        json_data["accounts"] = accounts
-
-        return json_data
-
-    def upload_document(self, dhl_document):
+    @reports_remaining_time
+    def upload_document(self, dhl_document, timeout=None, deadline=None):
         """
         Uploads updated customs documentation for your DHL Express shipment that has not been picked up yet
         :param dhl_document: DHLDocument
+        :param timeout: seconds or (connect, read) tuple of each request, overrides the service timeouts
+        :param deadline: seconds for the whole call including retries, the time left is in response.remaining_time
         :return: DHLResponse
         """
         try:
-            if not (
-                dhl_document.original_planned_shipping_date.tzinfo is not None
-                and dhl_document.original_planned_shipping_date.tzinfo.utcoffset(
-                    dhl_document.original_planned_shipping_date
-                )
-                is not None
-            ):
+            if not is_timezone_aware(dhl_document.original_planned_shipping_date):
                 return DHLResponse(
                     success=False, error_title="Ship date is not timezone aware."
                 )
-            original_planned_shipping_date = datetime.strftime(
-                dhl_document.original_planned_shipping_date, "%Y-%m-%d"
-            )
-            document_data = {
-                "shipmentTrackingNumber": dhl_document.tracking_number,
-                "originalPlannedShippingDate": original_planned_shipping_date,
-                "productCode": dhl_document.product_code,
-            }
-
-            accounts = []
-            for a in dhl_document.accounts:
-                accounts.append(a.to_dict())
-            document_data["accounts"] = accounts
-
-            if dhl_document.document_images:
-                document_images = []
-                for d in dhl_document.document_images:
-                    document_images.append(d.to_dict())
-                document_data["documentImages"] = document_images
-            dhl_response = requests.patch(
-                self.endpoint_url
-                + "/shipments/"
-                + dhl_document.tracking_number
-                + "/upload-image",
-                json=document_data,
-                auth=HTTPBasicAuth(self.api_key, self.api_secret),
-            )
-            response = DHLResponse(
-                success=True,
+            document_data = self._create_document(dhl_document)
+            self._preflight(DOCUMENT, document_data)
+            dhl_response = self._request(
+                "PATCH",
+                "/shipments/" + dhl_document.tracking_number + "/upload-image",
+                Endpoint.UPLOAD_IMAGE,
+                timeout=timeout,
+                deadline=deadline,
+                **self._json_body(document_data),
             )
-            for attribute, value in dhl_response.json().items():
-                if attribute == "status":
-                    response.status = value
-            return response
+            return self._upload_response(self._loads(dhl_response))
         except Exception as err:
-            return DHLResponse(success=False, error_title=str(err))
+            return DHLResponse(
+                success=False, error_title=str(err), status=getattr(err, "status", None)
+            )
+
+    def upload_document_many(self, dhl_documents, max_concurrency=8, ordered=True):
+        """
+        Uploads many documents concurrently, see ship_many
+        :param dhl_documents: iterable of DHLDocument
+        :param max_concurrency: number of uploads in flight
+        :param ordered: if True results are returned in input order, otherwise as they complete
+        :return: DHLBatch yielding DHLBatchResult with a DHLResponse
+        """
+        return DHLBatch(self.upload_document, dhl_documents, max_concurrency, ordered)
+
+
+def _not_sent(err):
+    """
+    True if the request surely did not reach DHL, so it can be sent again even if it creates something
+    """
+    if isinstance(err, requests.ConnectTimeout):
+        return True
+    reason = getattr(err.args[0], "reason", None) if err.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _record_call(breaker, failed, started):
+    if breaker is not None:
+        breaker.record(failed, time.monotonic() - started)
+
+
+def _same_shipment(dhl_shipment, shipment):
+    """
+    True if a shipment of a tracking answer has every customer reference and the receiver of dhl_shipment
+    """
+    references = {
+        reference.get("value") for reference in shipment.get("shipperReferences") or []
+    }
+    if not references.issuperset(dhl_shipment.customer_references):
+        return False
+    address = (shipment.get("receiverDetails") or {}).get("postalAddress") or {}
+    receiver = dhl_shipment.receiver_address
+    return _normalized(address.get("postalCode")) == _normalized(
+        receiver.postal_code
+    ) and _normalized(address.get("countryCode")) == _normalized(receiver.country_code)
+
+
+def _normalized(value):
+    return str(value or "").replace(" ", "").upper()
+
+
+def _status_code(value, default):
+    """
+    DHL gives the status of an error answer as a string, e.g. "404": returned as int when it is a number
+    """
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
@@ -0,0 +1,95 @@
+import os
+
+from python_dhl.resources.response import write_base64
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
+
+def require_ijson():
+    if ijson is None:
+        raise ImportError(
+            "Streaming documents requires ijson: pip install python-dhl-api[stream]"
+        )
+
+
+def parse_documents(file, sink, key="documents"):
+    """
+    Parses a JSON object read incrementally from file. Every item of its key list is passed
+    to sink as soon as it is parsed and is not kept, so only one document is in memory at a time.
+    :param file: binary file object
+    :param sink: callable receiving each document dict
+    :return: dict with the other fields of the object, key is an empty list
+    """
+    require_ijson()
+    splitter = _DocumentSplitter(sink, key)
+    for prefix, event, value in ijson.parse(file):
+        splitter.event(prefix, event, value)
+    return splitter.data()
+
+
+async def parse_documents_async(file, sink, key="documents"):
+    """
+    asyncio version of parse_documents, file has a coroutine read(size)
+    """
+    require_ijson()
+    splitter = _DocumentSplitter(sink, key)
+    async for prefix, event, value in ijson.parse_async(file):
+        splitter.event(prefix, event, value)
+    return splitter.data()
+
+
+class DHLDocumentWriter:
+    """
+    Document sink writing every document to directory as <prefix>-<index>-<type>.<format>,
+    decoding its base64 content in chunks.
+    """
+
+    def __init__(self, directory, prefix="document", chunk_size=1024 * 1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.paths = []
+
+    def __call__(self, document):
+        path = os.path.join(
+            self.directory,
+            "%s-%d-%s.%s"
+            % (
+                self.prefix,
+                len(self.paths),
+                document.get("typeCode", "document"),
+                document.get("imageFormat", "pdf").lower(),
+            ),
+        )
+        with open(path, "wb") as file:
+            write_base64(document["content"], file, self.chunk_size)
+        self.paths.append(path)
+
+
+# events ending an item of the list: the end of a map or list, or a scalar item
+_ITEM_END_EVENTS = ("end_map", "end_array", "string", "number", "boolean", "null")
+
+
+class _DocumentSplitter:
+    def __init__(self, sink, key):
+        self.sink = sink
+        self.items_prefix = key + ".item"
+        self.builder = ijson.ObjectBuilder()
+        self.item = None
+
+    def event(self, prefix, event, value):
+        if prefix == self.items_prefix or prefix.startswith(self.items_prefix + "."):
+            if self.item is None:
+                self.item = ijson.ObjectBuilder()
+            self.item.event(event, value)
+            if prefix == self.items_prefix and event in _ITEM_END_EVENTS:
+                self.sink(self.item.value)
+                self.item = None
+            return
+        self.builder.event(event, value)
+
+    def data(self):
+        return self.builder.value
@@ -0,0 +1,136 @@
+from python_dhl.codec import DHLJSONCodec
+from python_dhl.resources.helper import dhl_datetime
+from python_dhl.resources.shipment import DHLShipment
+
+# parts of the shipment payload filled in for every shipment, the others come from the prototype
+VARIABLE_FIELDS = (
+    "plannedShippingDateAndTime",
+    "customerDetails",
+    "content",
+    "customerReferences",
+)
+
+
+class DHLShipmentTemplate:
+    """
+    Payload of shipments sharing the sender, pickup, product, added services, output format (logo included)
+    and accounts of a prototype DHLShipment. These parts are encoded to JSON once, so building the payload
+    of a shipment only encodes its receiver, content, references and date.
+    Create it with service.shipment_template(prototype).
+
+    template = service.shipment_template(prototype)
+    for order in orders:
+        service.ship(template.shipment(order.contact, order.address, order.content, [order.reference]))
+    """
+
+    def __init__(self, prototype, payload, codec=None):
+        """
+        :param prototype: DHLShipment
+        :param payload: payload of the prototype
+        :param codec: DHLJSONCodec encoding the payloads
+        """
+        self.prototype = prototype
+        self.codec = codec if codec is not None else DHLJSONCodec()
+        self.static = b",".join(
+            self._field(name, value)
+            for name, value in payload.items()
+            if name not in VARIABLE_FIELDS
+        )
+        self.shipper = b'"customerDetails":{"shipperDetails":%s,"receiverDetails":' % (
+            self.codec.dumps(payload["customerDetails"]["shipperDetails"])
+        )
+
+    def shipment(
+        self,
+        receiver_contact,
+        receiver_address,
+        content,
+        customer_references=None,
+        ship_datetime=None,
+    ):
+        """
+        :param receiver_contact: DHLContact
+        :param receiver_address: DHLPostalAddress
+        :param content: DHLShipmentContent
+        :param customer_references: list of strings
+        :param ship_datetime: datetime timezone aware, defaults to the one of the prototype
+        :return: DHLTemplateShipment
+        """
+        return DHLTemplateShipment(
+            self,
+            receiver_contact,
+            receiver_address,
+            content,
+            customer_references,
+            ship_datetime or self.prototype.ship_datetime,
+        )
+
+    def encode(self, dhl_shipment):
+        """
+        JSON payload of a shipment created by this template
+        :return: bytes
+        """
+        receiver = {
+            "postalAddress": dhl_shipment.receiver_address.to_dict(),
+            "contactInformation": dhl_shipment.receiver_contact.to_dict(),
+            "typeCode": dhl_shipment.receiver_contact.contact_type,
+        }
+        parts = [
+            self._field(
+                "plannedShippingDateAndTime", dhl_datetime(dhl_shipment.ship_datetime)
+            ),
+            self.static,
+            self.shipper + self.codec.dumps(receiver) + b"}",
+            self._field("content", dhl_shipment.content.to_dict()),
+        ]
+        if dhl_shipment.customer_references:
+            parts.append(
+                self._field(
+                    "customerReferences",
+                    [{"value": cr} for cr in dhl_shipment.customer_references],
+                )
+            )
+        return b"{" + b",".join(parts) + b"}"
+
+    def _field(self, name, value):
+        return self.codec.dumps(name) + b":" + self.codec.dumps(value)
+
+
+class DHLTemplateShipment(DHLShipment):
+    """
+    Shipment created by a DHLShipmentTemplate, it has all the attributes of the prototype
+    but its receiver, content, references and date.
+    """
+
+    def __init__(
+        self,
+        template,
+        receiver_contact,
+        receiver_address,
+        content,
+        customer_references,
+        ship_datetime,
+    ):
+        prototype = template.prototype
+        DHLShipment.__init__(
+            self,
+            prototype.sender_contact,
+            prototype.sender_address,
+            receiver_contact,
+            receiver_address,
+            ship_datetime,
+            prototype.product_code,
+            prototype.added_services,
+            content,
+            prototype.output_format,
+            prototype.accounts,
+            customer_references,
+            prototype.sender_registration_numbers,
+            prototype.request_pickup,
+            prototype.pickup_close_time,
+            prototype.pickup_location,
+        )
+        self.template = template
+
+    def to_payload(self, create):
+        return self.template.encode(self)
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds to wait from a Retry-After header, given either as seconds or as an HTTP date
+    :param value: header value or None
+    :return: float or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class DHLTokenBucket:
+    """
+    Paces calls to rate per second, allowing bursts of up to burst calls.
+    Callers reserve a token and wait the returned delay, so the order of the calls is kept.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: calls per second
+        :param burst: calls that can be made at once after an idle period, defaults to rate (at least 1)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Takes a token and returns the seconds to wait before using it.
+        If the wait would be longer than max_wait no token is taken and None is returned.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            delay = max(0.0, (1 - self.tokens) / self.rate, self.blocked_until - now)
+            if max_wait is not None and delay > max_wait:
+                return None
+            self.tokens -= 1
+            self.calls += 1
+            self.total_wait += delay
+            self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for the next seconds, used when DHL answers 429
+        """
+        with self.lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queue_depth": self.waiting,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "mean_wait": self.total_wait / self.calls if self.calls else 0.0,
+            }
+
+
+class DHLRateLimiter:
+    """
+    Client side rate limiter with one DHLTokenBucket per endpoint (see helper.Endpoint).
+    Endpoints without a bucket use the default one, or are not limited if there is no default.
+
+    limiter = DHLRateLimiter({Endpoint.SHIPMENTS.value: DHLTokenBucket(5, burst=10)}, default=DHLTokenBucket(20))
+    """
+
+    def __init__(self, limits=None, default=None):
+        """
+        :param limits: dict endpoint -> DHLTokenBucket
+        :param default: DHLTokenBucket shared by the endpoints not in limits
+        """
+        self.limits = dict(limits or {})
+        self.default = default
+
+    def bucket(self, endpoint):
+        return self.limits.get(endpoint, self.default)
+
+    def acquire(self, endpoint, max_wait=None):
+        """
+        Blocks until a call to endpoint is allowed
+        :param max_wait: seconds, if the call would have to wait longer it returns None immediately
+        :return: seconds waited or None
+        """
+        bucket = self.bucket(endpoint)
+        if bucket is None:
+            return 0.0
+        delay = bucket.reserve(max_wait)
+        if delay:
+            with _Waiting(bucket):
+                time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, endpoint, max_wait=None):
+        """
+        asyncio version of acquire
+        """
+        bucket = self.bucket(endpoint)
+        if bucket is None:
+            return 0.0
+        delay = bucket.reserve(max_wait)
+        if delay:
+            with _Waiting(bucket):
+                await asyncio.sleep(delay)
+        return delay
+
+    def throttled(self, endpoint, retry_after):
+        """
+        Records a 429 from endpoint: its bucket stops handing out tokens for retry_after seconds
+        """
+        bucket = self.bucket(endpoint)
+        if bucket is not None:
+            bucket.pause(retry_after)
+
+    def queue_depth(self, endpoint):
+        bucket = self.bucket(endpoint)
+        return bucket.waiting if bucket is not None else 0
+
+    def stats(self):
+        """
+        Queue depth and wait times of every bucket
+        :return: dict endpoint -> stats, the default bucket is under "default"
+        """
+        stats = {endpoint: bucket.stats() for endpoint, bucket in self.limits.items()}
+        if self.default is not None:
+            stats["default"] = self.default.stats()
+        return stats
+
+
+class _Waiting:
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def __enter__(self):
+        with self.bucket.lock:
+            self.bucket.waiting += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.bucket.lock:
+            self.bucket.waiting -= 1
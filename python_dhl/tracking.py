@@ -0,0 +1,61 @@
+from itertools import islice
+
+# tracking numbers sent in one GET /tracking request: a failed request fails all of them,
+# so groups are kept small, raise it if the account is allowed more
+TRACKING_GROUP_SIZE = 20
+
+
+def tracking_groups(tracking_numbers, group_size=TRACKING_GROUP_SIZE):
+    """
+    Splits an iterable of tracking numbers in lists of at most group_size, consuming it lazily
+    """
+    if group_size < 1:
+        raise ValueError("group_size must be at least 1.")
+    tracking_numbers = iter(tracking_numbers)
+    while True:
+        group = [str(t) for t in islice(tracking_numbers, group_size)]
+        if not group:
+            return
+        yield group
+
+
+class DHLTrackingResults(dict):
+    """
+    DHLTrackingResponse by tracking number, the outcome of one tracking request.
+    """
+
+    @property
+    def success(self):
+        return all(response.success for response in self.values())
+
+
+class DHLTrackingBatch:
+    """
+    Tracks many shipments with one request per group of tracking numbers, running the groups concurrently.
+    Iterating yields (tracking_number, DHLTrackingResponse) pairs as the groups complete.
+    stats is the DHLBatchStats of the requests, tracked and not_tracked count the shipments.
+    """
+
+    def __init__(self, batch):
+        """
+        :param batch: DHLBatch of tracking groups, each call returning DHLTrackingResults
+        """
+        self.batch = batch
+        self.stats = batch.stats
+        self.tracked = 0
+        self.not_tracked = 0
+
+    def __iter__(self):
+        for result in self.batch:
+            for tracking_number, response in result.response.items():
+                if response.success:
+                    self.tracked += 1
+                else:
+                    self.not_tracked += 1
+                yield tracking_number, response
+
+    def results(self):
+        """
+        Runs the whole batch and returns a dict of DHLTrackingResponse by tracking number.
+        """
+        return dict(self)
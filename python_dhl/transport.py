@@ -0,0 +1,85 @@
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+
+class DHLTransport:
+    """
+    Sends the HTTP requests of a DHLService. request() receives the absolute URL and returns a requests.Response;
+    network failures must raise requests.ConnectionError or requests.Timeout, so they are retried like real ones.
+    Implement it to send the requests elsewhere than DHL, e.g. DHLFakeTransport.
+    """
+
+    def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        headers=None,
+        timeout=None,
+        stream=False,
+    ):
+        """
+        :param params: dict of the query string, values can be lists
+        :param data: body bytes
+        :param headers: dict of the request headers
+        :param timeout: (connect, read) seconds, None waits forever
+        :param stream: if True the body is read by the caller from response.raw
+        :return: requests.Response
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class DHLRequestsTransport(DHLTransport):
+    """
+    The default transport: a pooled keep-alive requests session authenticated with the API key and secret.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        api_secret,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+    ):
+        session = requests.Session()
+        session.auth = HTTPBasicAuth(api_key, api_secret)
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        self.session = session
+
+    def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        headers=None,
+        timeout=None,
+        stream=False,
+    ):
+        return self.session.request(
+            method,
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=timeout,
+            stream=stream,
+        )
+
+    def close(self):
+        self.session.close()
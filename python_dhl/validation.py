@@ -0,0 +1,459 @@
+import re
+
+from python_dhl.exceptions import DHLValidationError
+from python_dhl.resources.helper import (
+    AccountType,
+    DocumentType,
+    IncotermCode,
+    MeasurementUnit,
+    ProductCode,
+    ShipperType,
+    TypeCode,
+)
+
+SHIPMENT = "shipment"
+PICKUP = "pickup"
+DOCUMENT = "document"
+
+
+class DHLPayloadValidator:
+    """
+    Checks the shipment, pickup and document upload payloads before they are sent, so a malformed one
+    fails immediately instead of after a round trip to DHL: required fields, lengths, formats, codes
+    (products, incoterms, accounts...) and the consistency of the package and line item weights.
+    The rules are compiled once when the validator is created.
+
+    service = DHLService(api_key, api_secret, account_number, validator=DHLPayloadValidator())
+    """
+
+    def __init__(self, product_codes=None):
+        """
+        :param product_codes: product codes allowed, defaults to the ProductCode values
+        """
+        product_codes = frozenset(
+            product_codes
+            if product_codes is not None
+            else (p.value for p in ProductCode)
+        )
+        self.checks = {
+            SHIPMENT: (_shipment_check(product_codes), _check_shipment_content),
+            PICKUP: (_pickup_check(product_codes), None),
+            DOCUMENT: (_document_check(product_codes), None),
+        }
+
+    def errors(self, kind, payload):
+        """
+        :param kind: SHIPMENT, PICKUP or DOCUMENT
+        :param payload: dict built by the service
+        :return: list of errors as "<path>: <message>", empty if the payload is valid
+        """
+        errors = []
+        check, consistency_check = self.checks[kind]
+        check(payload, "", errors)
+        if consistency_check is not None and not errors:
+            consistency_check(payload, errors)
+        return errors
+
+    def validate(self, kind, payload):
+        """
+        Raises DHLValidationError if the payload is not valid
+        """
+        errors = self.errors(kind, payload)
+        if errors:
+            raise DHLValidationError(kind, errors)
+
+
+def _text(min_length=1, max_length=None, pattern=None, choices=None):
+    regex = re.compile(pattern) if pattern else None
+
+    def check(value, path, errors):
+        if not isinstance(value, str):
+            errors.append("%s: must be a string" % path)
+        elif len(value) < min_length:
+            errors.append("%s: must have at least %d characters" % (path, min_length))
+        elif max_length is not None and len(value) > max_length:
+            errors.append("%s: must have at most %d characters" % (path, max_length))
+        elif regex is not None and not regex.fullmatch(value):
+            errors.append("%s: has an invalid format" % path)
+        elif choices is not None and value not in choices:
+            errors.append("%s: must be one of %s" % (path, ", ".join(sorted(choices))))
+
+    return check
+
+
+def _number(minimum=0, exclusive=True, integer=False):
+    def check(value, path, errors):
+        if isinstance(value, bool) or not isinstance(
+            value, int if integer else (int, float)
+        ):
+            errors.append(
+                "%s: must be %s" % (path, "an integer" if integer else "a number")
+            )
+        elif value < minimum or (exclusive and value == minimum):
+            errors.append(
+                "%s: must be %s %s"
+                % (path, "greater than" if exclusive else "at least", minimum)
+            )
+
+    return check
+
+
+def _boolean(value, path, errors):
+    if not isinstance(value, bool):
+        errors.append("%s: must be true or false" % path)
+
+
+def _choice(choices):
+    def check(value, path, errors):
+        if value not in choices:
+            errors.append(
+                "%s: must be one of %s"
+                % (path, ", ".join(str(c) for c in sorted(choices)))
+            )
+
+    return check
+
+
+def _object(fields, required=()):
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append("%s: must be an object" % (path or "/"))
+            return
+        for name in required:
+            if value.get(name) in (None, "", []):
+                errors.append("%s/%s: is required" % (path, name))
+        for name, field_check in fields.items():
+            field = value.get(name)
+            if field is not None and field not in ("", []):
+                field_check(field, "%s/%s" % (path, name), errors)
+
+    return check
+
+
+def _list(item_check, min_items=1, max_items=None):
+    def check(value, path, errors):
+        if not isinstance(value, (list, tuple)):
+            errors.append("%s: must be a list" % path)
+            return
+        if len(value) < min_items:
+            errors.append("%s: must have at least %d items" % (path, min_items))
+        if max_items is not None and len(value) > max_items:
+            errors.append("%s: must have at most %d items" % (path, max_items))
+        for index, item in enumerate(value):
+            item_check(item, "%s/%d" % (path, index), errors)
+
+    return check
+
+
+_DATE = r"\d{4}-\d{2}-\d{2}"
+_DATETIME = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2} GMT[+-]\d{2}:\d{2}"
+_COUNTRY = _text(2, 2, r"[A-Z]{2}")
+_CURRENCY = _text(3, 3, r"[A-Z]{3}")
+
+_ADDRESS = _object(
+    {
+        "addressLine1": _text(1, 45),
+        "addressLine2": _text(1, 45),
+        "addressLine3": _text(1, 45),
+        "cityName": _text(1, 45),
+        "postalCode": _text(1, 12),
+        "countryCode": _COUNTRY,
+        "provinceCode": _text(1, 35),
+        "countyName": _text(1, 45),
+    },
+    required=("addressLine1", "cityName", "countryCode"),
+)
+
+_CONTACT = _object(
+    {
+        "fullName": _text(1, 255),
+        "companyName": _text(1, 100),
+        "phone": _text(1, 70),
+        "mobilePhone": _text(1, 70),
+        "email": _text(3, 70, r"[^@\s]+@[^@\s]+"),
+    },
+    required=("fullName", "companyName", "phone"),
+)
+
+_REGISTRATION_NUMBERS = _list(
+    _object(
+        {
+            "typeCode": _text(choices=frozenset(t.name for t in TypeCode)),
+            "number": _text(1, 35),
+            "issuerCountryCode": _COUNTRY,
+        },
+        required=("typeCode", "number", "issuerCountryCode"),
+    )
+)
+
+_DETAILS = _object(
+    {
+        "postalAddress": _ADDRESS,
+        "contactInformation": _CONTACT,
+        "typeCode": _text(choices=frozenset(s.value for s in ShipperType)),
+        "registrationNumbers": _REGISTRATION_NUMBERS,
+    },
+    required=("postalAddress", "contactInformation"),
+)
+
+_ACCOUNTS = _list(
+    _object(
+        {
+            "typeCode": _text(choices=frozenset(a.value for a in AccountType)),
+            "number": _text(1, 12),
+        },
+        required=("typeCode", "number"),
+    )
+)
+
+_PACKAGES = _list(
+    _object(
+        {
+            "weight": _number(),
+            "dimensions": _object(
+                {"length": _number(), "width": _number(), "height": _number()},
+                required=("length", "width", "height"),
+            ),
+        },
+        required=("weight",),
+    ),
+    max_items=999,
+)
+
+_UNIT = _text(choices=frozenset(m.value for m in MeasurementUnit))
+
+_LINE_ITEMS = _list(
+    _object(
+        {
+            "number": _number(1, exclusive=False, integer=True),
+            "description": _text(1, 512),
+            "price": _number(exclusive=False),
+            "quantity": _object(
+                {"value": _number(), "unitOfMeasurement": _text(1, 20)},
+                required=("value", "unitOfMeasurement"),
+            ),
+            "manufacturerCountry": _COUNTRY,
+            "weight": _object(
+                {"netValue": _number(), "grossValue": _number()},
+                required=("netValue", "grossValue"),
+            ),
+            "commodityCodes": _list(
+                _object(
+                    {"typeCode": _text(1, 20), "value": _text(1, 20)},
+                    required=("typeCode", "value"),
+                )
+            ),
+        },
+        required=(
+            "number",
+            "description",
+            "price",
+            "quantity",
+            "manufacturerCountry",
+            "weight",
+        ),
+    ),
+    max_items=999,
+)
+
+_EXPORT_DECLARATION = _object(
+    {
+        "lineItems": _LINE_ITEMS,
+        "invoice": _object(
+            {"number": _text(1, 35), "date": _text(10, 10, _DATE)},
+            required=("number", "date"),
+        ),
+        "exportReasonType": _text(1, 50),
+        "additionalCharges": _list(
+            _object(
+                {"typeCode": _text(1, 20), "value": _number(exclusive=False)},
+                required=("typeCode", "value"),
+            )
+        ),
+    },
+    required=("lineItems", "invoice"),
+)
+
+_CONTENT = _object(
+    {
+        "packages": _PACKAGES,
+        "isCustomsDeclarable": _boolean,
+        "description": _text(1, 70),
+        "incoterm": _text(choices=frozenset(i.name for i in IncotermCode)),
+        "unitOfMeasurement": _UNIT,
+        "declaredValue": _number(exclusive=False),
+        "declaredValueCurrency": _CURRENCY,
+        "exportDeclaration": _EXPORT_DECLARATION,
+    },
+    required=(
+        "packages",
+        "isCustomsDeclarable",
+        "description",
+        "incoterm",
+        "unitOfMeasurement",
+    ),
+)
+
+_OUTPUT = _object(
+    {
+        "printerDPI": _choice(frozenset((200, 300))),
+        "encodingFormat": _text(choices=frozenset(("pdf", "zpl", "lp2", "epl"))),
+        "customerLogos": _list(
+            _object(
+                {
+                    "fileFormat": _text(
+                        choices=frozenset(("PNG", "GIF", "JPEG", "JPG"))
+                    ),
+                    "content": _text(1),
+                },
+                required=("fileFormat", "content"),
+            ),
+            min_items=0,
+        ),
+    }
+)
+
+_ADDED_SERVICES = _list(
+    _object(
+        {
+            "serviceCode": _text(1, 3, r"[A-Z0-9]+"),
+            "value": _number(exclusive=False),
+            "currency": _CURRENCY,
+        },
+        required=("serviceCode",),
+    )
+)
+
+
+def _shipment_check(product_codes):
+    return _object(
+        {
+            "plannedShippingDateAndTime": _text(pattern=_DATETIME),
+            "pickup": _object(
+                {
+                    "isRequested": _boolean,
+                    "closeTime": _text(5, 5, r"\d{2}:\d{2}"),
+                    "location": _text(1, 80),
+                    "pickupDetails": _DETAILS,
+                },
+                required=("isRequested",),
+            ),
+            "productCode": _text(choices=product_codes),
+            "outputImageProperties": _OUTPUT,
+            "customerDetails": _object(
+                {"shipperDetails": _DETAILS, "receiverDetails": _DETAILS},
+                required=("shipperDetails", "receiverDetails"),
+            ),
+            "content": _CONTENT,
+            "accounts": _ACCOUNTS,
+            "valueAddedServices": _ADDED_SERVICES,
+            "customerReferences": _list(
+                _object({"value": _text(1, 35)}, required=("value",)),
+                max_items=10,
+            ),
+        },
+        required=(
+            "plannedShippingDateAndTime",
+            "productCode",
+            "customerDetails",
+            "content",
+            "accounts",
+        ),
+    )
+
+
+def _pickup_check(product_codes):
+    return _object(
+        {
+            "plannedPickupDateAndTime": _text(pattern=_DATETIME),
+            "closeTime": _text(5, 5, r"\d{2}:\d{2}"),
+            "location": _text(1, 80),
+            "customerDetails": _object(
+                {"shipperDetails": _DETAILS}, required=("shipperDetails",)
+            ),
+            "shipmentDetails": _list(
+                _object(
+                    {
+                        "productCode": _text(choices=product_codes),
+                        "packages": _PACKAGES,
+                        "isCustomsDeclarable": _boolean,
+                        "unitOfMeasurement": _UNIT,
+                        "declaredValue": _number(exclusive=False),
+                        "declaredValueCurrency": _CURRENCY,
+                    },
+                    required=("productCode", "packages", "unitOfMeasurement"),
+                )
+            ),
+            "accounts": _ACCOUNTS,
+        },
+        required=(
+            "plannedPickupDateAndTime",
+            "customerDetails",
+            "shipmentDetails",
+            "accounts",
+        ),
+    )
+
+
+def _document_check(product_codes):
+    return _object(
+        {
+            "shipmentTrackingNumber": _text(1, 35),
+            "originalPlannedShippingDate": _text(10, 10, _DATE),
+            "productCode": _text(choices=product_codes),
+            "accounts": _ACCOUNTS,
+            "documentImages": _list(
+                _object(
+                    {
+                        "typeCode": _text(
+                            choices=frozenset(d.name for d in DocumentType)
+                        ),
+                        "imageFormat": _text(
+                            choices=frozenset(
+                                ("PDF", "PNG", "TIFF", "GIF", "JPEG", "JPG")
+                            )
+                        ),
+                        "content": _text(1),
+                    },
+                    required=("typeCode", "imageFormat", "content"),
+                )
+            ),
+        },
+        required=(
+            "shipmentTrackingNumber",
+            "originalPlannedShippingDate",
+            "productCode",
+            "accounts",
+        ),
+    )
+
+
+def _check_shipment_content(payload, errors):
+    """
+    Rules across fields, run only when every field is well formed
+    """
+    content = payload["content"]
+    if content["isCustomsDeclarable"]:
+        for name in ("declaredValue", "declaredValueCurrency"):
+            if content.get(name) is None:
+                errors.append(
+                    "/content/%s: is required for customs declarable shipments" % name
+                )
+    declaration = content.get("exportDeclaration")
+    if not declaration:
+        return
+    packages_weight = sum(p["weight"] for p in content["packages"])
+    net_weight = 0
+    for index, item in enumerate(declaration["lineItems"]):
+        weight = item["weight"]
+        net_weight += weight["netValue"]
+        if weight["netValue"] > weight["grossValue"]:
+            errors.append(
+                "/content/exportDeclaration/lineItems/%d/weight: net weight is greater than the gross weight"
+                % index
+            )
+    if net_weight > packages_weight:
+        errors.append(
+            "/content/exportDeclaration/lineItems: net weight of the line items (%s) is greater than the weight of the packages (%s)"
+            % (net_weight, packages_weight)
+        )
@@ -0,0 +1,95 @@
+"""
+Fixtures shared by the tests: a clock moved by hand, a transport answering scripted responses
+and a manifest row of a shipment
+"""
+
+import json
+
+import requests
+
+from python_dhl.transport import DHLTransport
+
+# a manifest row, see python_dhl.manifest.shipment_from_row
+ROW = {
+    "sender_name": "Name and surname",
+    "sender_phone": "+39000000000",
+    "sender_street1": "Via Roma 1",
+    "sender_city": "Thiene",
+    "sender_postal_code": "36016",
+    "sender_country": "IT",
+    "receiver_name": "Anna",
+    "receiver_phone": "+39111",
+    "receiver_street1": "Rue 1",
+    "receiver_city": "Paris",
+    "receiver_postal_code": "75017",
+    "receiver_country": "FR",
+    "ship_datetime": "2024-05-02T10:00:00+02:00",
+    "product_code": "P",
+    "description": "Shipment test",
+    "weight": "2",
+    "length": "30",
+    "width": "20",
+    "height": "10",
+    "reference": "ORDER-1",
+}
+
+
+class Clock:
+    """
+    Replaces time.monotonic: the time only moves when now is changed
+    """
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedTransport(DHLTransport):
+    """
+    Answers the requests with the scripted answers in order, the last one for the requests after them.
+    An answer is a status, a (status, body) or (status, body, headers) tuple, or an exception raised instead.
+    The body defaults to {}.
+    """
+
+    def __init__(self, *answers, clock=None, elapsed=0):
+        """
+        :param clock: Clock moved forward by elapsed seconds at every request
+        """
+        self.answers = list(answers)
+        self.clock = clock
+        self.elapsed = elapsed
+        self.methods = []
+        self.timeouts = []
+
+    @property
+    def calls(self):
+        return len(self.methods)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.methods.append(method)
+        self.timeouts.append(timeout)
+        if self.clock is not None:
+            self.clock.now += self.elapsed
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return scripted_response(url, *_answer(answer))
+
+
+def scripted_response(url, status, body=None, headers=None):
+    """
+    requests.Response of status with the JSON body, already read
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers.update(headers or {})
+    response._content = json.dumps({} if body is None else body).encode()
+    response._content_consumed = True
+    return response
+
+
+def _answer(answer):
+    return answer if isinstance(answer, tuple) else (answer,)
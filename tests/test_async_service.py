@@ -0,0 +1,149 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import unittest
+from datetime import datetime
+
+from python_dhl.async_service import AsyncDHLService
+from python_dhl.fake import UNKNOWN_POSTAL_CODE, DHLFakeServer
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.resources.helper import AccountType
+from python_dhl.service import DHLService
+from tests.helpers import ROW
+
+OUTPUT_FORMAT = shipment.DHLShipmentOutput(
+    dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+)
+
+
+def answered(response):
+    """
+    Attributes of a response, without the time left of its deadline
+    """
+    return {
+        name: value
+        for name, value in vars(response).items()
+        if name != "remaining_time"
+    }
+
+
+class TestAsyncParity(unittest.TestCase):
+    """
+    The AsyncDHLService answers as DHLService, each against its own fake server
+    """
+
+    def setUp(self):
+        self.fake = DHLFakeServer()
+        self.async_fake = DHLFakeServer()
+        self.service = DHLService(
+            "key", "secret", "123", transport=self.fake.transport()
+        )
+        self.async_service = AsyncDHLService(
+            "key", "secret", "123", transport=self.async_fake.async_transport()
+        )
+        self.shipment = shipment_from_row(ROW, "123", OUTPUT_FORMAT)
+
+    def tearDown(self):
+        self.service.close()
+        asyncio.run(self.async_service.close())
+
+    def call(self, name, *args):
+        """
+        Calls name on both services
+        :return: (response of DHLService, response of AsyncDHLService)
+        """
+        response = getattr(self.service, name)(*args)
+        async_response = asyncio.run(getattr(self.async_service, name)(*args))
+        self.assertIs(type(response), type(async_response))
+        self.assertEqual(answered(response), answered(async_response))
+        self.assertEqual(self.fake.stats(), self.async_fake.stats())
+        return response, async_response
+
+    def ship(self):
+        tracking_number = self.service.ship(self.shipment).tracking_number
+        async_response = asyncio.run(self.async_service.ship(self.shipment))
+        self.assertEqual(tracking_number, async_response.tracking_number)
+        return tracking_number
+
+    def pickup(self, pickup_datetime):
+        return shipment.DHLPickup(
+            sender_contact=self.shipment.sender_contact,
+            sender_address=self.shipment.sender_address,
+            receiver_contact=self.shipment.receiver_contact,
+            receiver_address=self.shipment.receiver_address,
+            pickup_datetime=pickup_datetime,
+            content=self.shipment.content,
+            accounts=self.shipment.accounts,
+        )
+
+    def document(self, tracking_number, ship_datetime):
+        return shipment.DHLDocument(
+            tracking_number=tracking_number,
+            original_planned_shipping_date=ship_datetime,
+            product_code="P",
+            document_images=[shipment.DHLDocumentImage("INV", "pdf", "aW52b2ljZQ==")],
+            accounts=[
+                shipment.DHLAccountType(type_code=AccountType.SHIPPER, number="123")
+            ],
+        )
+
+    def test_pickup(self):
+        response, _ = self.call("pickup", self.pickup(self.shipment.ship_datetime))
+        self.assertTrue(response.success)
+        self.assertEqual(["PRG000000001"], response.dispatch_confirmation_numbers)
+        response, _ = self.call("pickup", self.pickup(datetime(2024, 5, 2, 10)))
+        self.assertFalse(response.success)
+
+    def test_get_rates(self):
+        args = (
+            self.shipment.sender_address,
+            self.shipment.receiver_address,
+            self.shipment.content.packages[0],
+        )
+        response, async_response = self.call(
+            "get_rates", *args, self.shipment.ship_datetime
+        )
+        self.assertTrue(response.success)
+        self.assertEqual(response.products, async_response.products)
+        self.assertEqual(
+            response.rates.product_codes, async_response.rates.product_codes
+        )
+        response, _ = self.call("get_rates", *args, datetime(2024, 5, 2, 10))
+        self.assertFalse(response.success)
+
+    def test_validate_address(self):
+        response, _ = self.call(
+            "validate_address", self.shipment.receiver_address, "delivery"
+        )
+        self.assertEqual("PARIS", response.address[0]["cityName"])
+        self.shipment.receiver_address.postal_code = UNKNOWN_POSTAL_CODE
+        response, _ = self.call(
+            "validate_address", self.shipment.receiver_address, "delivery"
+        )
+        self.assertIsNone(response.address)
+
+    def test_upload_document(self):
+        tracking_number = self.ship()
+        response, _ = self.call(
+            "upload_document",
+            self.document(tracking_number, self.shipment.ship_datetime),
+        )
+        self.assertTrue(response.success)
+        response, _ = self.call(
+            "upload_document", self.document(tracking_number, datetime(2024, 5, 2, 10))
+        )
+        self.assertFalse(response.success)
+        self.assertEqual(1, self.async_fake.shipments[tracking_number]["documents"])
+
+    def test_check_shipment(self):
+        tracking_number = self.ship()
+        response, async_response = self.call("check_shipment", tracking_number)
+        self.assertTrue(response.success)
+        self.assertEqual(response.documents, async_response.documents)
+        response, _ = self.call("check_shipment", "1")
+        self.assertFalse(response.success)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+# to run tests: python -m unittest discover -s tests
+
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from python_dhl.batch import DHLBatch, DHLBatchResult, DHLBatchStats
+from python_dhl.fake import DHLFakeServer
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.resources.helper import AccountType
+from python_dhl.resources.response import DHLResponse
+from python_dhl.service import DHLService
+from tests.helpers import ROW
+
+OUTPUT_FORMAT = shipment.DHLShipmentOutput(
+    dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+)
+
+
+class Calls:
+    """
+    Answers item after item / 100 seconds, counting the calls running at once
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(abs(item) / 100.0)
+        with self.lock:
+            self.running -= 1
+        if item < 0:
+            raise ValueError("negative item")
+        return DHLResponse(success=item != 0)
+
+
+class TestBatch(unittest.TestCase):
+    def test_ordered_results(self):
+        batch = DHLBatch(Calls(), [5, 1, 3, 2], max_concurrency=4)
+        results = batch.results()
+        self.assertEqual([0, 1, 2, 3], [result.index for result in results])
+        self.assertEqual([5, 1, 3, 2], [result.item for result in results])
+
+    def test_results_as_completed(self):
+        batch = DHLBatch(Calls(), [8, 1, 4], max_concurrency=3, ordered=False)
+        self.assertEqual([1, 4, 8], [result.item for result in batch])
+
+    def test_backpressure(self):
+        calls = Calls()
+        taken = []
+
+        def items():
+            for item in range(20):
+                taken.append(item)
+                yield 1
+
+        batch = DHLBatch(calls, items(), max_concurrency=3)
+        for consumed, result in enumerate(batch, 1):
+            # the input is read only as results are consumed
+            self.assertLessEqual(len(taken) - consumed, 3)
+        self.assertEqual(20, len(taken))
+        self.assertEqual(3, calls.max_running)
+
+    def test_errors_are_isolated(self):
+        results = DHLBatch(Calls(), [1, -1, 0, 1], max_concurrency=2).results()
+        self.assertEqual(
+            [True, False, False, True], [result.response.success for result in results]
+        )
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual("negative item", results[1].response.error_detail)
+        self.assertIsNone(results[2].error)
+
+    def test_stats(self):
+        batch = DHLBatch(Calls(), [1, 0, 2, 1], max_concurrency=2)
+        batch.results()
+        stats = batch.stats
+        self.assertEqual((4, 3, 1), (stats.count, stats.succeeded, stats.failed))
+        self.assertGreater(stats.elapsed, 0)
+        self.assertGreater(stats.throughput, 0)
+        self.assertLessEqual(stats.min_latency, stats.mean_latency)
+        self.assertLessEqual(stats.mean_latency, stats.max_latency)
+
+    def test_percentiles(self):
+        stats = DHLBatchStats()
+        self.assertIsNone(stats.percentile(50))
+        for millisecond in range(1, 1001):
+            stats.record(
+                DHLBatchResult(
+                    millisecond, None, DHLResponse(success=True), millisecond / 1000.0
+                )
+            )
+        self.assertEqual(1000, stats.count)
+        self.assertAlmostEqual(0.5005, stats.mean_latency)
+        self.assertAlmostEqual(0.5, stats.percentile(50), delta=0.5 * 0.05)
+        self.assertAlmostEqual(0.95, stats.percentile(95), delta=0.95 * 0.05)
+        # never above the slowest call
+        self.assertEqual(1.0, stats.percentile(100))
+
+    def test_max_concurrency(self):
+        with self.assertRaises(ValueError):
+            DHLBatch(Calls(), [], max_concurrency=0)
+
+
+class TestServiceBatches(unittest.TestCase):
+    def setUp(self):
+        self.fake = DHLFakeServer(latency=0.01)
+        self.service = DHLService(
+            "key", "secret", "123", transport=self.fake.transport()
+        )
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_ship_many(self):
+        shipments = [
+            shipment_from_row(dict(ROW, reference="R%d" % i), "123", OUTPUT_FORMAT)
+            for i in range(6)
+        ]
+        # a shipment the service refuses fails alone
+        shipments[2].ship_datetime = datetime(2024, 5, 2, 10)
+        results = self.service.ship_many(shipments, max_concurrency=3).results()
+        self.assertEqual(list(range(6)), [result.index for result in results])
+        self.assertEqual(
+            [True, True, False, True, True, True],
+            [result.response.success for result in results],
+        )
+        self.assertEqual(5, self.fake.stats()["requests"]["POST /shipments"])
+        tracking_numbers = [result.response.tracking_number for result in results]
+        self.assertEqual(5, len(set(filter(None, tracking_numbers))))
+
+    def test_upload_document_many(self):
+        dhl_shipment = shipment_from_row(ROW, "123", OUTPUT_FORMAT)
+        tracking_number = self.service.ship(dhl_shipment).tracking_number
+        documents = [
+            shipment.DHLDocument(
+                tracking_number=tracking_number,
+                original_planned_shipping_date=ship_datetime,
+                product_code="P",
+                document_images=[
+                    shipment.DHLDocumentImage("INV", "pdf", "aW52b2ljZQ==")
+                ],
+                accounts=[
+                    shipment.DHLAccountType(type_code=AccountType.SHIPPER, number="123")
+                ],
+            )
+            # the service refuses a date without time zone
+            for ship_datetime in (
+                dhl_shipment.ship_datetime,
+                datetime(2024, 5, 2, 10),
+                dhl_shipment.ship_datetime,
+            )
+        ]
+        batch = self.service.upload_document_many(
+            documents, max_concurrency=2, ordered=False
+        )
+        results = sorted(batch, key=lambda result: result.index)
+        self.assertEqual(
+            [True, False, True], [result.response.success for result in results]
+        )
+        self.assertEqual(
+            (3, 2, 1), (batch.stats.count, batch.stats.succeeded, batch.stats.failed)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from python_dhl.async_service import AsyncDHLService
+from python_dhl.cache import (
+    DHLMemoryCacheBackend,
+    DHLResponseCache,
+    DHLSQLiteCacheBackend,
+    cache_key,
+)
+from python_dhl.fake import DHLFakeServer
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.service import DHLService
+from tests.helpers import ROW
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key(self):
+        params = {"originCityName": "Prague", "weight": 1, "length": None}
+        self.assertEqual(
+            cache_key("rates", params),
+            cache_key("rates", {"originCityName": " PRAGUE", "weight": 1.0}),
+        )
+        self.assertNotEqual(cache_key("rates", params), cache_key("other", params))
+        self.assertNotEqual(
+            cache_key("rates", params),
+            cache_key("rates", {"originCityName": "Prague", "weight": 2}),
+        )
+
+    def test_lru(self):
+        backend = DHLMemoryCacheBackend(max_size=2)
+        backend.set("a", 1, 60)
+        backend.set("b", 2, 60)
+        backend.get("a")
+        backend.set("c", 3, 60)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.evictions, 1)
+
+    def test_ttl_and_stats(self):
+        cache = DHLResponseCache(ttl=0.05)
+        params = {"weight": 1}
+        self.assertIsNone(cache.get("rates", params))
+        cache.set("rates", params, {"products": []})
+        self.assertEqual(cache.get("rates", params), {"products": []})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("rates", params))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_model_is_built_once_per_answer(self):
+        cache = DHLResponseCache(ttl=60)
+        params = {"weight": 1}
+        built = []
+
+        def build(value):
+            built.append(value)
+            return tuple(value["products"])
+
+        self.assertIsNone(cache.get_model("rates", params, build))
+        cache.set("rates", params, {"products": [1]})
+        answer, model = cache.get_model("rates", params, build)
+        self.assertEqual(({"products": [1]}, (1,)), (answer, model))
+        self.assertIs(model, cache.get_model("rates", params, build)[1])
+        self.assertEqual(1, len(built))
+        # a new answer gets a new model
+        cache.set("rates", params, {"products": [2]})
+        self.assertEqual((2,), cache.get_model("rates", params, build)[1])
+        self.assertEqual(2, len(built))
+        self.assertEqual(3, cache.stats()["hits"])
+
+    def test_negative_ttl(self):
+        cache = DHLResponseCache(ttl=60)
+        cache.set("address", {"postalCode": "1"}, {"title": "Not found"}, negative=True)
+        self.assertIsNone(cache.get("address", {"postalCode": "1"}))
+
+        cache = DHLResponseCache(ttl=60, negative_ttl=0.05)
+        cache.set("address", {"postalCode": "1"}, {"title": "Not found"}, negative=True)
+        self.assertEqual(
+            cache.get("address", {"postalCode": "1"}), {"title": "Not found"}
+        )
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("address", {"postalCode": "1"}))
+
+
+class TestSQLiteCacheBackend(unittest.TestCase):
+    def test_shared_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            backend = DHLSQLiteCacheBackend(path)
+            backend.set("a", {"address": [{"cityName": "Prague"}]}, 60)
+            backend.set("b", {"address": []}, -1)
+
+            other = DHLSQLiteCacheBackend(path)
+            self.assertEqual(other.get("a"), {"address": [{"cityName": "Prague"}]})
+            self.assertIsNone(other.get("b"))
+            other.purge()
+            other.delete("a")
+            self.assertIsNone(backend.get("a"))
+            backend.close()
+            other.close()
+
+
+class LockedBackend(DHLMemoryCacheBackend):
+    """
+    Backend failing as a SQLite file locked by another process, on reads or on writes
+    """
+
+    def __init__(self, reads=True, writes=True):
+        super().__init__()
+        self.reads = reads
+        self.writes = writes
+
+    def get(self, key):
+        if self.reads:
+            raise sqlite3.OperationalError("database is locked")
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        if self.writes:
+            raise sqlite3.OperationalError("database is locked")
+        super().set(key, value, ttl)
+
+
+class TestCacheErrors(unittest.TestCase):
+    def setUp(self):
+        self.fake = DHLFakeServer()
+        self.shipment = shipment_from_row(
+            ROW,
+            "123",
+            shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+        )
+
+    def service(self, backend):
+        cache = DHLResponseCache(backend=backend)
+        return DHLService(
+            "key",
+            "secret",
+            "123",
+            rates_cache=cache,
+            address_cache=cache,
+            transport=self.fake.transport(),
+        )
+
+    def calls(self, service):
+        with self.assertLogs("python_dhl.service", "WARNING"):
+            rates = service.get_rates(
+                self.shipment.sender_address,
+                self.shipment.receiver_address,
+                self.shipment.content.packages[0],
+                self.shipment.ship_datetime,
+            )
+        with self.assertLogs("python_dhl.service", "WARNING"):
+            address = service.validate_address(
+                self.shipment.receiver_address, "delivery"
+            )
+        return rates, address
+
+    def test_read_error_asks_dhl(self):
+        service = self.service(LockedBackend(writes=False))
+        for _ in range(2):
+            rates, address = self.calls(service)
+            self.assertEqual(("P", "T", "H"), rates.rates.product_codes)
+            self.assertEqual("PARIS", address.address[0]["cityName"])
+        requests = self.fake.stats()["requests"]
+        self.assertEqual(
+            (2, 2), (requests["GET /rates"], requests["GET /address-validate"])
+        )
+
+    def test_write_error_returns_the_answer(self):
+        service = self.service(LockedBackend(reads=False))
+        rates, address = self.calls(service)
+        self.assertTrue(rates.success)
+        self.assertEqual("PARIS", address.address[0]["cityName"])
+
+    def test_async_service(self):
+        service = AsyncDHLService(
+            "key",
+            "secret",
+            "123",
+            rates_cache=DHLResponseCache(backend=LockedBackend()),
+            transport=self.fake.async_transport(),
+        )
+
+        async def get_rates():
+            response = await service.get_rates(
+                self.shipment.sender_address,
+                self.shipment.receiver_address,
+                self.shipment.content.packages[0],
+                self.shipment.ship_datetime,
+            )
+            await service.close()
+            return response
+
+        with self.assertLogs("python_dhl.service", "WARNING") as logs:
+            response = asyncio.run(get_rates())
+        self.assertTrue(response.success)
+        self.assertEqual(2, len(logs.records))
+
+
+if __name__ == "__main__":
+    unittest.main()
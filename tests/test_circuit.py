@@ -0,0 +1,129 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+
+from python_dhl.circuit import CLOSED, HALF_OPEN, OPEN, DHLCircuitBreaker
+from python_dhl.exceptions import DHLCircuitOpenError
+from python_dhl.resources.helper import Endpoint, ResponseStatus
+from python_dhl.service import DHLService
+from tests.helpers import Clock, ScriptedTransport
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = DHLCircuitBreaker(
+            failure_rate_threshold=0.5,
+            window_size=4,
+            min_calls=4,
+            open_seconds=30,
+            clock=self.clock,
+        )
+
+    def call(self, failed=False, elapsed=0.1):
+        self.breaker.before_call("/tracking")
+        self.breaker.record(failed, elapsed)
+
+    def trip(self):
+        for failed in (False, True, False, True):
+            self.call(failed)
+
+    def test_opens_at_failure_rate(self):
+        for failed in (True, True, True):
+            self.call(failed)
+        # fewer than min_calls calls: still closed
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.call(False)
+        self.assertEqual(OPEN, self.breaker.state)
+
+    def test_stays_closed_below_threshold(self):
+        for failed in (False, True, False, False, False, True, False, False):
+            self.call(failed)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_open_rejects_until_cool_down(self):
+        self.trip()
+        with self.assertRaises(DHLCircuitOpenError) as raised:
+            self.breaker.before_call("/tracking")
+        self.assertEqual(ResponseStatus.CIRCUIT_OPEN.value, raised.exception.status)
+        self.clock.now += 29
+        self.assertAlmostEqual(1.0, self.breaker.retry_in())
+        with self.assertRaises(DHLCircuitOpenError):
+            self.breaker.check("/tracking")
+        self.assertEqual(2, self.breaker.stats()["rejected"])
+
+    def test_half_open_success_closes(self):
+        self.trip()
+        self.clock.now += 30
+        self.breaker.check("/tracking")
+        self.breaker.before_call("/tracking")
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+        # a single trial call at a time
+        with self.assertRaises(DHLCircuitOpenError):
+            self.breaker.before_call("/tracking")
+        self.breaker.record(False, 0.1)
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.assertEqual(0, self.breaker.stats()["calls"])
+
+    def test_half_open_failure_opens_again(self):
+        self.trip()
+        self.clock.now += 30
+        self.call(True)
+        self.assertEqual(OPEN, self.breaker.state)
+        self.assertEqual(30, self.breaker.retry_in())
+
+    def test_slow_calls(self):
+        breaker = DHLCircuitBreaker(
+            slow_call_seconds=1.0,
+            slow_call_rate_threshold=0.5,
+            window_size=2,
+            min_calls=2,
+            clock=self.clock,
+        )
+        breaker.record(False, 2.0)
+        breaker.record(False, 0.5)
+        self.assertEqual(OPEN, breaker.state)
+
+
+class TestServiceCircuitBreaker(unittest.TestCase):
+    def service(self, status, clock):
+        return DHLService(
+            "key",
+            "secret",
+            "123",
+            circuit_breakers={
+                Endpoint.TRACKING.value: DHLCircuitBreaker(
+                    window_size=2, min_calls=2, clock=clock
+                )
+            },
+            transport=ScriptedTransport((status, {"shipments": []})),
+        )
+
+    def test_server_errors_open_the_circuit(self):
+        clock = Clock()
+        service = self.service(503, clock)
+        service.track_group(["1"])
+        service.track_group(["1"])
+        self.assertEqual(2, service.transport.calls)
+        with self.assertRaises(DHLCircuitOpenError):
+            service._request("GET", "/tracking", Endpoint.TRACKING)
+        response = service.get_shipment_status("1")
+        self.assertEqual(ResponseStatus.CIRCUIT_OPEN.value, response.status)
+        self.assertEqual(2, service.transport.calls)
+        # other endpoints are not affected
+        service.check_shipment("1")
+        self.assertEqual(3, service.transport.calls)
+
+    def test_client_errors_and_throttling_are_not_failures(self):
+        for status in (400, 404, 429):
+            service = self.service(status, Clock())
+            service.max_throttle_retries = 0
+            for _ in range(3):
+                service.track_group(["1"])
+            self.assertEqual(3, service.transport.calls, status)
+            breaker = service.circuit_breakers[Endpoint.TRACKING.value]
+            self.assertEqual(CLOSED, breaker.state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# to run tests: python -m unittest discover -s tests
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from python_dhl.cli import main
+from python_dhl.fake import DHLFakeServer
+from python_dhl.manifest import DHLManifestShipper
+
+DEFAULTS = {
+    "sender_name": "Name and surname",
+    "sender_phone": "+39000000000",
+    "sender_street1": "Via Roma 1",
+    "sender_city": "Thiene",
+    "sender_postal_code": "36016",
+    "sender_country": "IT",
+    "ship_datetime": "2024-05-02T10:00:00+02:00",
+    "product_code": "P",
+    "description": "Shipment test",
+}
+
+ROWS = [
+    "reference,receiver_name,receiver_phone,receiver_street1,receiver_city,receiver_postal_code,receiver_country,weight,length,width,height",
+    "R1,Anna,+39111,Rue 1,Paris,75017,FR,1,30,20,10",
+    "R2,Paul,+39222,Rue 2,Paris,75017,FR,2,30,20,10",
+    "R3,Marie,+39333,Rue 3,Paris,75017,FR,3,30,20,10",
+]
+
+
+class TestShipCommand(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.fake = DHLFakeServer()
+        self.addCleanup(self.fake.close)
+        self.url = self.fake.serve()
+        with open(self.path("orders.csv"), "w", encoding="utf-8") as file:
+            file.write("\n".join(ROWS) + "\n")
+        with open(self.path("defaults.json"), "w", encoding="utf-8") as file:
+            json.dump(DEFAULTS, file)
+        with open(self.path("logo.png"), "wb") as file:
+            file.write(b"logo")
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def ship(self, *options):
+        argv = [
+            "ship",
+            self.path("orders.csv"),
+            "--output",
+            self.path("results.jsonl"),
+            "--labels-dir",
+            self.path("labels"),
+            "--defaults",
+            self.path("defaults.json"),
+            "--logo",
+            self.path("logo.png"),
+            "--api-key",
+            "key",
+            "--api-secret",
+            "secret",
+            "--account",
+            "123",
+            "--endpoint-url",
+            self.url,
+            "--concurrency",
+            "1",
+            "--checkpoint-every",
+            "1",
+        ]
+        output, errors = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+            code = main(argv + list(options))
+        return code, output.getvalue(), errors.getvalue()
+
+    def results(self):
+        with open(self.path("results.jsonl"), encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_interrupt_and_resume(self):
+        save_checkpoint = DHLManifestShipper._save_checkpoint
+        calls = []
+
+        def interrupted(shipper, manifest_path, row, verify_until=0):
+            calls.append(row)
+            if calls == [0, 1]:
+                raise KeyboardInterrupt
+            save_checkpoint(shipper, manifest_path, row, verify_until)
+
+        with mock.patch.object(DHLManifestShipper, "_save_checkpoint", interrupted):
+            code, output, errors = self.ship()
+        self.assertEqual(0, code)
+        self.assertIn("--resume", errors)
+        self.assertTrue(output.startswith("1 rows: 1 labels, 0 failed"))
+        self.assertEqual([1], [line["row"] for line in self.results()])
+
+        code, output, errors = self.ship("--resume")
+        self.assertEqual(0, code)
+        self.assertEqual("", errors)
+        self.assertEqual([1, 2, 3], [line["row"] for line in self.results()])
+        self.assertTrue(all(line["success"] for line in self.results()))
+        # each row is shipped once: R2, the first row after the checkpoint, is looked up first
+        self.assertEqual(3, self.fake.stats()["requests"]["POST /shipments"])
+
+    def test_interrupt_before_the_first_row(self):
+        with mock.patch.object(
+            DHLManifestShipper, "_resume_point", side_effect=KeyboardInterrupt
+        ):
+            code, output, errors = self.ship("--resume")
+        self.assertEqual(0, code)
+        self.assertIn("--resume", errors)
+        self.assertTrue(output.startswith("0 rows: 0 labels, 0 failed"))
+        self.assertEqual(0, self.fake.stats()["requests"].get("POST /shipments", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
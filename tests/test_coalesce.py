@@ -0,0 +1,129 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from python_dhl.async_service import AsyncDHLService, httpx
+from python_dhl.coalesce import DHLSingleFlight
+from python_dhl.fake import DHLFakeServer
+from python_dhl.resources import address, shipment
+from python_dhl.service import DHLService
+
+SENDER = address.DHLPostalAddress(
+    street_line1="Via Roma 1",
+    postal_code="36016",
+    country_code="IT",
+    city_name="Thiene",
+)
+RECEIVER = address.DHLPostalAddress(
+    street_line1="Rue 1", postal_code="75017", country_code="FR", city_name="Paris"
+)
+PACKAGE = shipment.DHLProduct(weight=1, length=35, width=28, height=8)
+SHIPMENT_DATE = datetime.fromisoformat("2024-05-02T10:00:00+02:00")
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_identical_calls_share_the_result(self):
+        single_flight = DHLSingleFlight()
+        results = []
+
+        def call():
+            time.sleep(0.1)
+            return object()
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(single_flight.do("rates", call))
+            )
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(id(result) for result in results)), 1)
+        self.assertEqual(single_flight.stats()["calls"], 1)
+        self.assertEqual(single_flight.stats()["coalesced"], 4)
+        self.assertEqual(single_flight.stats()["in_flight"], 0)
+
+    def test_errors_are_not_kept(self):
+        single_flight = DHLSingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        self.assertRaises(ValueError, single_flight.do, "rates", fail)
+        self.assertEqual(single_flight.do("rates", lambda: 1), 1)
+
+
+class TestServiceSingleFlight(unittest.TestCase):
+    def test_callers_get_their_own_remaining_time(self):
+        fake = DHLFakeServer(latency=0.2)
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            single_flight=DHLSingleFlight(),
+            transport=fake.transport(),
+        )
+        responses = {}
+
+        def get_rates(deadline):
+            responses[deadline] = service.get_rates(
+                SENDER, RECEIVER, PACKAGE, SHIPMENT_DATE, deadline=deadline
+            )
+
+        threads = [
+            threading.Thread(target=get_rates, args=(deadline,))
+            for deadline in (10, 20)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, fake.stats()["requests"]["GET /rates"])
+        first, second = responses[10], responses[20]
+        self.assertIsNot(first, second)
+        self.assertIs(first.data, second.data)
+        self.assertLess(first.remaining_time, 10)
+        self.assertGreater(second.remaining_time, 10)
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_callers_get_their_own_remaining_time(self):
+        fake = DHLFakeServer(latency=0.1)
+        service = AsyncDHLService(
+            "key",
+            "secret",
+            "123",
+            single_flight=DHLSingleFlight(),
+            transport=fake.async_transport(),
+        )
+
+        async def get_rates():
+            try:
+                return await asyncio.gather(
+                    service.get_rates(
+                        SENDER, RECEIVER, PACKAGE, SHIPMENT_DATE, deadline=10
+                    ),
+                    service.get_rates(
+                        SENDER, RECEIVER, PACKAGE, SHIPMENT_DATE, deadline=20
+                    ),
+                )
+            finally:
+                await service.close()
+
+        first, second = asyncio.run(get_rates())
+        self.assertEqual(1, fake.stats()["requests"]["GET /rates"])
+        self.assertIsNot(first, second)
+        self.assertLess(first.remaining_time, 10)
+        self.assertGreater(second.remaining_time, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
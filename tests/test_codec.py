@@ -0,0 +1,106 @@
+# to run tests: python -m unittest discover -s tests
+
+import json
+import unittest
+from unittest import mock
+
+from python_dhl import codec
+from python_dhl.codec import (
+    DHLJSONCodec,
+    DHLOrjsonCodec,
+    DHLUjsonCodec,
+    get_json_codec,
+)
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.service import DHLService
+from tests.helpers import ROW
+
+# text that JSON libraries escape differently
+UNICODE_ROW = dict(
+    ROW,
+    sender_name="Jürgen Müller",
+    receiver_name="山田太郎",
+    receiver_phone="+81111",
+    receiver_street1="1-1 Chiyoda",
+    receiver_city="東京",
+    receiver_postal_code="100-0001",
+    receiver_country="JP",
+    description='Café "grains"\n',
+    weight="1.25",
+)
+
+VALUES = {
+    "text": 'Müller 東京 "quoted" \\ \n',
+    "numbers": [0, -1, 1.5, 2**40],
+    "flags": [True, False, None],
+    "nested": {"empty": {}, "list": []},
+}
+
+
+class TestJSONCodec(unittest.TestCase):
+    def shipment_payload(self, json_codec):
+        service = DHLService("key", "secret", "123", json_codec=json_codec)
+        dhl_shipment = shipment_from_row(
+            UNICODE_ROW,
+            "123",
+            shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+        )
+        return service._json_body(service._shipment_payload(dhl_shipment))["data"]
+
+    def test_standard_library(self):
+        json_codec = DHLJSONCodec()
+        data = json_codec.dumps(VALUES)
+        self.assertIsInstance(data, bytes)
+        # compact, without spaces after the separators
+        self.assertIn(b'"numbers":[0,-1,1.5,', data)
+        self.assertEqual(VALUES, json_codec.loads(data))
+        self.assertEqual(VALUES, json_codec.loads(data.decode()))
+
+    @unittest.skipIf(codec.orjson is None, "orjson is not installed")
+    def test_orjson_is_equivalent(self):
+        fast, standard = DHLOrjsonCodec(), DHLJSONCodec()
+        data = fast.dumps(VALUES)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(VALUES, standard.loads(data))
+        self.assertEqual(VALUES, fast.loads(standard.dumps(VALUES)))
+        self.assertEqual(
+            json.loads(self.shipment_payload("json")),
+            json.loads(self.shipment_payload("orjson")),
+        )
+
+    @unittest.skipIf(codec.ujson is None, "ujson is not installed")
+    def test_ujson_is_equivalent(self):
+        fast, standard = DHLUjsonCodec(), DHLJSONCodec()
+        self.assertEqual(VALUES, standard.loads(fast.dumps(VALUES)))
+        self.assertEqual(
+            json.loads(self.shipment_payload("json")),
+            json.loads(self.shipment_payload("ujson")),
+        )
+
+    def test_selection(self):
+        self.assertIs(DHLJSONCodec, type(get_json_codec()))
+        self.assertIs(DHLJSONCodec, type(get_json_codec("json")))
+        custom = DHLJSONCodec()
+        self.assertIs(custom, get_json_codec(custom))
+        self.assertIs(custom, DHLService("k", "s", "1", json_codec=custom).json_codec)
+        with self.assertRaises(ValueError):
+            get_json_codec("simplejson")
+
+    def test_auto_selection(self):
+        with mock.patch.object(codec, "orjson", object()):
+            self.assertIs(DHLOrjsonCodec, type(get_json_codec("auto")))
+        with mock.patch.object(codec, "orjson", None):
+            with mock.patch.object(codec, "ujson", object()):
+                self.assertIs(DHLUjsonCodec, type(get_json_codec("auto")))
+            with mock.patch.object(codec, "ujson", None):
+                # the fallback when no fast library is installed
+                self.assertIs(DHLJSONCodec, type(get_json_codec("auto")))
+                with self.assertRaises(ImportError):
+                    get_json_codec("orjson")
+
+
+if __name__ == "__main__":
+    unittest.main()
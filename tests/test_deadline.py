@@ -0,0 +1,109 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import unittest
+from unittest import mock
+
+from python_dhl.deadline import DHLDeadline, reports_remaining_time
+from python_dhl.exceptions import DHLDeadlineExceededError
+from python_dhl.resources.helper import ResponseStatus
+from python_dhl.resources.response import DHLResponse
+from python_dhl.retry import DHLRetryPolicy
+from python_dhl.service import DHLService
+from tests.helpers import Clock, ScriptedTransport
+
+
+class Calls:
+    @reports_remaining_time
+    def call(self, deadline=None):
+        self.deadline = deadline
+        return DHLResponse(success=True)
+
+    @reports_remaining_time
+    async def call_async(self, deadline=None):
+        self.deadline = deadline
+        return DHLResponse(success=True)
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("python_dhl.deadline.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_deadline(self):
+        deadline = DHLDeadline(5)
+        self.assertIs(deadline, DHLDeadline.start(deadline))
+        self.assertIsNone(DHLDeadline.start(None))
+        self.clock.now += 3
+        self.assertEqual(2, deadline.remaining())
+        self.assertTrue(deadline.allows(1))
+        self.assertFalse(deadline.allows(2))
+        self.assertEqual((2, 2), deadline.timeout((10, 60)))
+        self.assertEqual((1, 2), deadline.timeout((1, None)))
+        self.clock.now += 3
+        self.assertEqual(0, deadline.remaining())
+        with self.assertRaises(DHLDeadlineExceededError):
+            deadline.check()
+        with self.assertRaises(DHLDeadlineExceededError):
+            deadline.timeout((10, 60))
+
+    def test_remaining_time_is_reported(self):
+        calls = Calls()
+        response = calls.call(deadline=10)
+        self.assertIsInstance(calls.deadline, DHLDeadline)
+        self.assertEqual(10, response.remaining_time)
+        self.assertIsNone(calls.call().remaining_time)
+        response = asyncio.run(calls.call_async(deadline=4))
+        self.assertEqual(4, response.remaining_time)
+
+    def test_deadline_stops_the_retries(self):
+        transport = ScriptedTransport(
+            (503, {"title": "Unavailable"}), clock=self.clock, elapsed=1
+        )
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            retry_policy=DHLRetryPolicy(max_attempts=10, backoff_factor=0),
+            transport=transport,
+        )
+        response = service.get_shipment_status("1", deadline=2.5)
+        # the third answer comes when no time is left: no fourth attempt
+        self.assertEqual(3, len(transport.timeouts))
+        self.assertFalse(response.success)
+        self.assertEqual(0, response.remaining_time)
+        # each request times out within the time left
+        self.assertEqual([(2.5, 2.5), (1.5, 1.5), (0.5, 0.5)], transport.timeouts)
+
+    def test_backoff_longer_than_deadline(self):
+        transport = ScriptedTransport(
+            (503, {"title": "Unavailable"}), clock=self.clock, elapsed=1
+        )
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            retry_policy=DHLRetryPolicy(backoff_factor=5, jitter=False),
+            transport=transport,
+        )
+        response = service.get_shipment_status("1", deadline=8)
+        self.assertEqual(1, len(transport.timeouts))
+        self.assertEqual(7, response.remaining_time)
+
+    def test_expired_deadline(self):
+        transport = ScriptedTransport(
+            (503, {"title": "Unavailable"}), clock=self.clock, elapsed=1
+        )
+        service = DHLService("key", "secret", "123", transport=transport)
+        deadline = DHLDeadline(1)
+        self.clock.now += 2
+        response = service.get_shipment_status("1", deadline=deadline)
+        self.assertEqual([], transport.timeouts)
+        self.assertEqual(ResponseStatus.DEADLINE_EXCEEDED.value, response.status)
+        self.assertEqual(0, response.remaining_time)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from python_dhl.async_service import AsyncDHLService
+from python_dhl.fake import DHLFakeServer
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.retry import DHLRetryPolicy
+from python_dhl.service import DHLService
+from python_dhl.stream import DHLDocumentWriter
+from tests.helpers import ROW
+
+OUTPUT_FORMAT = shipment.DHLShipmentOutput(
+    dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+)
+
+
+def make_shipment(reference):
+    return shipment_from_row(dict(ROW, reference=reference), "123", OUTPUT_FORMAT)
+
+
+class TestFakeServer(unittest.TestCase):
+    def test_in_process_transport(self):
+        fake = DHLFakeServer(label_size=4096)
+        service = DHLService("key", "secret", "123", transport=fake.transport())
+        dhl_shipment = make_shipment("R1")
+        response = service.ship(dhl_shipment)
+        self.assertTrue(response.success)
+        self.assertEqual(4096, len(response.document_content(0)))
+        tracking_number = response.tracking_number
+        self.assertTrue(service.get_shipment_status(tracking_number).success)
+        results = service.track_group([tracking_number, "1"])
+        self.assertTrue(results[tracking_number].success)
+        self.assertFalse(results["1"].success)
+        self.assertTrue(service.check_shipment(tracking_number).success)
+        rates = service.get_rates(
+            dhl_shipment.sender_address,
+            dhl_shipment.receiver_address,
+            dhl_shipment.content.packages[0],
+            dhl_shipment.ship_datetime,
+        ).rates
+        self.assertEqual(("P", "T", "H"), rates.product_codes)
+        self.assertEqual("H", rates.cheapest.product_code)
+        address = service.validate_address(dhl_shipment.receiver_address, "delivery")
+        self.assertEqual("PARIS", address.address[0]["cityName"])
+        dhl_shipment.receiver_address.postal_code = "00000"
+        address = service.validate_address(dhl_shipment.receiver_address, "delivery")
+        self.assertIsNone(address.address)
+        self.assertEqual(
+            1, fake.stats()["requests"]["GET /shipments/{}/proof-of-delivery"]
+        )
+
+    def test_streamed_labels(self):
+        fake = DHLFakeServer(label_size=100000)
+        service = DHLService("key", "secret", "123", transport=fake.transport())
+        with tempfile.TemporaryDirectory() as directory:
+            writer = DHLDocumentWriter(directory)
+            response = service.ship(make_shipment("R1"), document_sink=writer)
+            self.assertTrue(response.success)
+            self.assertEqual(100000, os.path.getsize(writer.paths[0]))
+
+    def test_http_server(self):
+        with DHLFakeServer() as fake:
+            service = DHLService("key", "secret", "123")
+            service.endpoint_url = fake.serve()
+            response = service.ship(make_shipment("R1"))
+            self.assertTrue(response.success)
+            results = service.track_group([response.tracking_number])
+            self.assertTrue(results[response.tracking_number].success)
+            service.close()
+        self.assertIsNone(fake.url)
+
+    def test_async_transport(self):
+        fake = DHLFakeServer(latency=0.01)
+        service = AsyncDHLService(
+            "key", "secret", "123", transport=fake.async_transport()
+        )
+
+        async def ship():
+            responses = await asyncio.gather(
+                *(service.ship(make_shipment("R%d" % i)) for i in range(5))
+            )
+            await service.close()
+            return responses
+
+        responses = asyncio.run(ship())
+        self.assertTrue(all(response.success for response in responses))
+        self.assertEqual(5, len({response.tracking_number for response in responses}))
+
+    def test_throttling(self):
+        fake = DHLFakeServer(throttle_rate=1.0, retry_after=0)
+        service = DHLService(
+            "key", "secret", "123", max_throttle_retries=0, transport=fake.transport()
+        )
+        response = service.get_shipment_status("1")
+        self.assertFalse(response.success)
+        self.assertEqual(429, response.status)
+
+    def test_injected_errors_are_retried(self):
+        fake = DHLFakeServer(error_rate=0.5, seed=3)
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            retry_policy=DHLRetryPolicy(max_attempts=20, backoff_factor=0),
+            transport=fake.transport(),
+        )
+        for reference in ("R1", "R2", "R3"):
+            self.assertTrue(service.ship(make_shipment(reference)).success)
+        self.assertIn(503, fake.stats()["answers"])
+        self.assertEqual(3, len(fake.shipments))
+
+    def test_latency_over_timeout(self):
+        fake = DHLFakeServer(latency=0.2)
+        service = DHLService(
+            "key", "secret", "123", read_timeout=0.05, transport=fake.transport()
+        )
+        self.assertFalse(service.get_shipment_status("1").success)
+        self.assertEqual({}, fake.stats()["requests"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+# to run tests: python -m unittest discover -s tests
+
+import pickle
+import unittest
+
+from python_dhl.resources import address, frozen, shipment
+
+
+class TestFrozenModels(unittest.TestCase):
+    def test_same_payload_as_the_mutable_models(self):
+        content = shipment.DHLShipmentContent(
+            packages=[shipment.DHLProduct(weight=1, length=35, width=28, height=8)],
+            is_custom_declarable=False,
+            description="Shipment test",
+            incoterm_code="DAP",
+            unit_of_measurement="metric",
+            product_code="N",
+        )
+        frozen_content = frozen.DHLShipmentContent(
+            packages=[frozen.DHLProduct(weight=1, length=35, width=28, height=8)],
+            is_custom_declarable=False,
+            description="Shipment test",
+            incoterm_code="DAP",
+            unit_of_measurement="metric",
+            product_code="N",
+        )
+        self.assertEqual(frozen_content.to_dict(), content.to_dict())
+        self.assertEqual(frozen_content.to_dict_pickup(), content.to_dict_pickup())
+        self.assertIs(frozen_content.to_dict(), frozen_content.to_dict())
+
+        contact = address.DHLContactInformation("Name", "+39000", "business")
+        frozen_contact = frozen.DHLContactInformation("Name", "+39000", "business")
+        self.assertEqual(frozen_contact.to_dict(), contact.to_dict())
+
+    def test_immutable_and_hashable(self):
+        sender = frozen.DHLPostalAddress("Via Roma 1", "Thiene", "36016", "IT")
+        same = frozen.DHLPostalAddress("Via Roma 1", "Thiene", "36016", "IT")
+        other = frozen.DHLPostalAddress("Via Roma 2", "Thiene", "36016", "IT")
+
+        self.assertEqual(sender, same)
+        self.assertEqual(len({sender, same, other}), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(sender)), sender)
+        self.assertFalse(hasattr(sender, "__dict__"))
+        with self.assertRaises(AttributeError):
+            sender.city = "Milano"
+
+
+if __name__ == "__main__":
+    unittest.main()
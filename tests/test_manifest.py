@@ -0,0 +1,213 @@
+# to run tests: python -m unittest discover -s tests
+
+import json
+import os
+import tempfile
+import unittest
+
+from python_dhl.batch import DHLLatencyHistogram
+from python_dhl.manifest import DHLManifestShipper, read_manifest, shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.resources.response import DHLShipmentResponse
+from python_dhl.service import DHLService
+
+DEFAULTS = {
+    "sender_name": "Name and surname",
+    "sender_phone": "+39000000000",
+    "sender_street1": "Via Roma 1",
+    "sender_city": "Thiene",
+    "sender_postal_code": "36016",
+    "sender_country": "it",
+    "ship_datetime": "2024-05-02T10:00:00+02:00",
+    "product_code": "N",
+    "description": "Shipment test",
+}
+
+COLUMNS = "reference,receiver_name,receiver_phone,receiver_street1,receiver_city,receiver_postal_code,receiver_country,weight,length,width,height,packages"
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output_format = shipment.DHLShipmentOutput(
+            dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write(self, name, *lines):
+        with open(self.path(name), "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        return self.path(name)
+
+    def test_read_csv_and_jsonl(self):
+        csv_path = self.write(
+            "orders.csv", "reference, weight ,height", "R1, 1.5,", "R2,2,3"
+        )
+        jsonl_path = self.write(
+            "orders.jsonl", '{"reference": "R1", "weight": 1.5}', "", '{"weight": 2}'
+        )
+        self.assertEqual(
+            [
+                (1, {"reference": "R1", "weight": "1.5"}),
+                (2, {"reference": "R2", "weight": "2", "height": "3"}),
+            ],
+            list(read_manifest(csv_path)),
+        )
+        self.assertEqual(
+            [(1, {"reference": "R1", "weight": 1.5}), (2, {"weight": 2})],
+            list(read_manifest(jsonl_path)),
+        )
+
+    def test_shipment_from_row(self):
+        row = dict(
+            zip(
+                COLUMNS.split(","),
+                "R1,Anna,+39111,Via Po 1,Torino,10100,IT,1.5,30,20,10,2".split(","),
+            )
+        )
+        row["services"] = "II PT"
+        dhl_shipment = shipment_from_row(row, "123", self.output_format, DEFAULTS)
+        self.assertEqual("IT", dhl_shipment.sender_address.country_code)
+        self.assertEqual("Via Po 1", dhl_shipment.receiver_address.street_line1)
+        self.assertEqual(["R1"], dhl_shipment.customer_references)
+        self.assertEqual(2, len(dhl_shipment.content.packages))
+        self.assertEqual(1.5, dhl_shipment.content.packages[0].weight)
+        self.assertEqual(30, dhl_shipment.content.packages[0].length)
+        self.assertEqual(
+            ["II", "PT"], [s.service_code for s in dhl_shipment.added_services]
+        )
+        self.assertEqual("123", dhl_shipment.accounts[0].number)
+        self.assertEqual(7200, dhl_shipment.ship_datetime.utcoffset().total_seconds())
+        with self.assertRaisesRegex(ValueError, "weight"):
+            shipment_from_row(
+                dict(row, weight="abc"), "123", self.output_format, DEFAULTS
+            )
+        with self.assertRaisesRegex(ValueError, "receiver_city"):
+            del row["receiver_city"]
+            shipment_from_row(row, "123", self.output_format, DEFAULTS)
+        with self.assertRaisesRegex(ValueError, "UTC offset"):
+            shipment_from_row(
+                dict(row, receiver_city="Torino", ship_datetime="2024-05-02T10:00"),
+                "123",
+                self.output_format,
+                DEFAULTS,
+            )
+
+    def test_run_and_resume(self):
+        lines = [COLUMNS]
+        for number in range(1, 11):
+            lines.append("R%d,Anna,+39111,Via Po,Torino,10100,IT,1,1,1,1," % number)
+        lines.append("R11,Anna,+39111,Via Po,Torino,10100,IT,abc,1,1,1,")
+        manifest = self.write("orders.csv", *lines)
+        shipped = []
+        service = DHLService("key", "secret", "123")
+
+        def ship(dhl_shipment):
+            shipped.append(dhl_shipment.customer_references[0])
+            return DHLShipmentResponse(
+                success=True, tracking_number="T%d" % len(shipped)
+            )
+
+        def find_shipment(dhl_shipment):
+            return "T5" if dhl_shipment.customer_references == ["R5"] else None
+
+        service.ship = ship
+        service.find_shipment = find_shipment
+        shipper = DHLManifestShipper(
+            service,
+            self.output_format,
+            self.path("results.jsonl"),
+            checkpoint_every=3,
+            max_concurrency=2,
+            defaults=DEFAULTS,
+        )
+        stats = shipper.run(manifest)
+        self.assertEqual((11, 10, 1), (stats.count, stats.succeeded, stats.failed))
+        self.assertIsNotNone(stats.percentile(99))
+        with open(self.path("results.jsonl"), encoding="utf-8") as file:
+            results = [json.loads(line) for line in file]
+        self.assertEqual(list(range(1, 12)), [r["row"] for r in results])
+        self.assertEqual("invalid-payload", results[-1]["status"])
+
+        # the run stopped after writing row 4 and part of row 5, the checkpoint is at row 3
+        with open(self.path("results.jsonl"), "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(r) + "\n" for r in results[:4])
+            file.write('{"row": 5, "refer')
+        with open(shipper.checkpoint_path, "w", encoding="utf-8") as file:
+            json.dump({"manifest": os.path.abspath(manifest), "row": 3}, file)
+        shipped.clear()
+        stats = shipper.run(manifest, resume=True)
+        self.assertEqual(4, shipper.skipped)
+        self.assertEqual(["R6", "R7", "R8", "R9", "R10"], shipped)
+        with open(self.path("results.jsonl"), encoding="utf-8") as file:
+            results = [json.loads(line) for line in file]
+        self.assertEqual(list(range(1, 12)), [r["row"] for r in results])
+        self.assertEqual("T5", results[4]["tracking_number"])
+        with open(shipper.checkpoint_path, encoding="utf-8") as file:
+            self.assertEqual(11, json.load(file)["row"])
+        service.close()
+
+    def test_resume_verifies_the_rows_in_flight_of_the_stopped_run(self):
+        lines = [COLUMNS]
+        for number in range(1, 11):
+            lines.append("R%d,Anna,+39111,Via Po,Torino,10100,IT,1,1,1,1," % number)
+        manifest = self.write("orders.csv", *lines)
+        lookups = []
+        service = DHLService("key", "secret", "123")
+        service.ship = lambda dhl_shipment: DHLShipmentResponse(
+            success=True, tracking_number="T"
+        )
+
+        def find_shipment(dhl_shipment):
+            lookups.append(dhl_shipment.customer_references[0])
+            return None
+
+        service.find_shipment = find_shipment
+        shipper = DHLManifestShipper(
+            service,
+            self.output_format,
+            self.path("results.jsonl"),
+            max_concurrency=1,
+            defaults=DEFAULTS,
+        )
+        # the stopped run shipped 4 rows at a time, the new one ships one at a time
+        for checkpoint in (
+            {"row": 2, "concurrency": 4},
+            {"row": 2, "concurrency": 1, "verify_until": 6},
+        ):
+            with open(self.path("results.jsonl"), "w", encoding="utf-8") as file:
+                file.write('{"row": 1}\n{"row": 2}\n')
+            with open(shipper.checkpoint_path, "w", encoding="utf-8") as file:
+                json.dump(dict(checkpoint, manifest=os.path.abspath(manifest)), file)
+            lookups.clear()
+            shipper.run(manifest, resume=True)
+            self.assertEqual(["R3", "R4", "R5", "R6"], lookups)
+
+        # a run stopped before its first checkpoint still verifies its rows in flight
+        with open(self.path("results.jsonl"), "w", encoding="utf-8") as file:
+            file.write("")
+        os.remove(shipper.checkpoint_path)
+        shipper.max_concurrency = 3
+        shipper._save_checkpoint(os.path.abspath(manifest), 0)
+        shipper.max_concurrency = 1
+        lookups.clear()
+        shipper.run(manifest, resume=True)
+        self.assertEqual(["R1", "R2", "R3"], lookups)
+        service.close()
+
+    def test_latency_histogram(self):
+        histogram = DHLLatencyHistogram()
+        for millisecond in range(1, 1001):
+            histogram.record(millisecond / 1000.0)
+        self.assertAlmostEqual(0.5, histogram.percentile(50), delta=0.5 * 0.05)
+        self.assertAlmostEqual(0.99, histogram.percentile(99), delta=0.99 * 0.05)
+        self.assertIsNone(DHLLatencyHistogram().percentile(50))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+# to run tests: python -m unittest discover -s tests
+
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from python_dhl.outbox import (
+    FAILED,
+    PENDING,
+    SHIPPED,
+    UNKNOWN,
+    DHLOutbox,
+    DHLOutboxShipment,
+)
+from python_dhl.resources import address, shipment
+from python_dhl.resources.helper import AccountType, ShipperType
+from python_dhl.resources.response import DHLShipmentResponse
+from python_dhl.service import DHLService
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.service = DHLService("key", "secret", "123456789")
+        self.service.ship = self.ship
+        self.service.find_shipment = self.find_shipment
+        self.outbox = DHLOutbox(
+            self.service, os.path.join(self.directory.name, "outbox.sqlite")
+        )
+        self.answers = {}
+        self.shipped = []
+        self.existing = {}
+        self.lookups = []
+        self.deadlines = []
+
+    def tearDown(self):
+        self.outbox.close()
+        self.service.close()
+        self.directory.cleanup()
+
+    def ship(self, dhl_shipment, deadline=None):
+        self.deadlines.append(deadline)
+        reference = (dhl_shipment.customer_references or [""])[0]
+        self.shipped.append(reference)
+        status = self.answers.get(reference)
+        if status is None:
+            return DHLShipmentResponse(success=True, tracking_number="T" + reference)
+        return DHLShipmentResponse(success=False, error_title="Error", status=status)
+
+    def find_shipment(self, dhl_shipment, deadline=None):
+        self.deadlines.append(deadline)
+        self.lookups.append(dhl_shipment.customer_references[0])
+        return self.existing.get(dhl_shipment.customer_references[0])
+
+    def shipment(self, *references):
+        contact = address.DHLContactInformation(
+            full_name="Name and surname",
+            phone="+39000000000",
+            contact_type=ShipperType.BUSINESS.value,
+        )
+        postal_address = address.DHLPostalAddress(
+            street_line1="Via Roma 1",
+            postal_code="36016",
+            country_code="IT",
+            city_name="Thiene",
+        )
+        return shipment.DHLShipment(
+            accounts=[
+                shipment.DHLAccountType(type_code=AccountType.SHIPPER, number="123")
+            ],
+            sender_contact=contact,
+            sender_address=postal_address,
+            receiver_contact=contact,
+            receiver_address=postal_address,
+            ship_datetime=datetime(2024, 5, 2, 10, tzinfo=ZoneInfo("Europe/Rome")),
+            added_services=[],
+            product_code="N",
+            content=shipment.DHLShipmentContent(
+                packages=[shipment.DHLProduct(weight=1, length=35, width=28, height=8)],
+                is_custom_declarable=False,
+                description="Shipment test",
+                incoterm_code="DAP",
+                unit_of_measurement="metric",
+            ),
+            output_format=shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+            customer_references=list(references),
+        )
+
+    def test_stored_payload_is_sent(self):
+        dhl_shipment = self.shipment("ref1")
+        entry_id = self.outbox.enqueue(dhl_shipment)
+        self.assertEqual(entry_id, self.outbox.enqueue(self.shipment("ref1")))
+        (payload,) = (
+            self.outbox._connection()
+            .execute("SELECT payload FROM dhl_outbox WHERE id = ?", (entry_id,))
+            .fetchone()
+        )
+        stored = DHLOutboxShipment(entry_id, payload)
+        self.assertEqual(payload, self.service._shipment_payload(stored))
+        self.assertEqual(["ref1"], stored.customer_references)
+        self.assertEqual(AccountType.SHIPPER, stored.accounts[0].type_code)
+        self.assertEqual(dhl_shipment.ship_datetime, stored.ship_datetime)
+        self.assertEqual("36016", stored.receiver_address.postal_code)
+        self.assertEqual("IT", stored.receiver_address.country_code)
+
+    def test_drain(self):
+        self.outbox.retry_delay = 0
+        for reference in ("ref1", "ref2", "ref3"):
+            self.outbox.enqueue(self.shipment(reference))
+        self.answers = {"ref2": 400, "ref3": 500}
+        self.outbox.max_attempts = 2
+        self.outbox.drain(workers=2)
+        self.assertEqual({SHIPPED: 1, FAILED: 2}, self.outbox.counts())
+        self.assertEqual("Tref1", self.outbox.entry(1).tracking_number)
+        self.assertEqual(1, self.outbox.entry(2).attempts)
+        self.assertEqual(2, self.outbox.entry(3).attempts)
+        self.assertEqual(4, len(self.shipped))
+
+    def test_transient_failure_is_verified_before_resending(self):
+        self.outbox.enqueue(self.shipment("ref1"))
+        self.answers = {"ref1": 503}
+        self.outbox.drain()
+        self.assertEqual(PENDING, self.outbox.entry(1).state)
+        self.outbox.retry_delay = 0
+        self.outbox._connection().execute("UPDATE dhl_outbox SET next_attempt_at = 0")
+        self.existing = {"ref1": "T999"}
+        self.outbox.drain()
+        entry = self.outbox.entry(1)
+        self.assertEqual((SHIPPED, "T999"), (entry.state, entry.tracking_number))
+        self.assertEqual(["ref1"], self.shipped)
+
+    def test_transient_failure_without_references_is_unknown(self):
+        self.outbox.enqueue(self.shipment())
+        self.answers = {"": 503}
+        self.assertEqual({UNKNOWN: 1}, self.outbox.drain())
+        self.assertEqual([], self.lookups)
+        # it cannot be searched: it stays unknown until checked by hand
+        self.assertTrue(self.outbox.entry(1).verify)
+        self.outbox.retry(1)
+        self.assertEqual({UNKNOWN: 1}, self.outbox.drain())
+        self.assertEqual([""], self.shipped)
+        # checked by hand: retry sends it without looking it up
+        self.answers = {}
+        self.outbox.retry(1, verify=False)
+        self.assertFalse(self.outbox.entry(1).verify)
+        self.assertEqual({SHIPPED: 1}, self.outbox.drain())
+        self.assertEqual(["", ""], self.shipped)
+        self.assertEqual([], self.lookups)
+
+    def test_retry_with_verification(self):
+        self.outbox.retry_delay = 0
+        self.outbox.max_attempts = 1
+        self.outbox.enqueue(self.shipment("ref1"))
+        self.answers = {"ref1": 503}
+        self.assertEqual({FAILED: 1}, self.outbox.drain())
+        self.outbox.retry(1, verify=True)
+        self.assertTrue(self.outbox.entry(1).verify)
+        self.existing = {"ref1": "T999"}
+        self.outbox.drain()
+        self.assertEqual(["ref1"], self.lookups)
+        self.assertEqual("T999", self.outbox.entry(1).tracking_number)
+
+    def test_retry_searches_entries_dhl_may_have_created(self):
+        self.outbox.retry_delay = 0
+        self.outbox.max_attempts = 1
+        self.outbox.enqueue(self.shipment("ref1"))
+        self.outbox.enqueue(self.shipment("ref2"))
+        self.answers = {"ref1": 503, "ref2": 400}
+        self.assertEqual({FAILED: 2}, self.outbox.drain())
+        self.existing = {"ref1": "T999"}
+        self.answers = {}
+        self.outbox.retry(1)
+        self.outbox.retry(2)
+        self.assertEqual({SHIPPED: 2}, self.outbox.drain())
+        # the timed out one is found, the refused one is sent again without searching it
+        self.assertEqual(["ref1"], self.lookups)
+        self.assertEqual(["ref1", "ref2", "ref2"], self.shipped)
+        self.assertEqual("T999", self.outbox.entry(1).tracking_number)
+
+    def test_deadline_is_shorter_than_the_lease(self):
+        self.existing = {}
+        self.outbox.enqueue(self.shipment("ref1"))
+        self.outbox._connection().execute("UPDATE dhl_outbox SET verify = 1")
+        self.outbox.drain()
+        lookup_deadline, ship_deadline = self.deadlines
+        # one deadline for the lookup and the shipment
+        self.assertIs(lookup_deadline, ship_deadline)
+        self.assertEqual(self.outbox.lease / 2, ship_deadline.seconds)
+        with self.assertRaises(ValueError):
+            DHLOutbox(self.service, ":memory:", lease=60, deadline=60)
+
+    def test_restart_after_crash(self):
+        self.outbox.enqueue(self.shipment("ref1"))
+        self.outbox.enqueue(self.shipment("ref2"))
+        self.outbox.enqueue(self.shipment())
+        self.outbox._connection().execute(
+            "UPDATE dhl_outbox SET state = 'sending', leased_until = 0"
+        )
+        self.existing = {"ref1": "T999"}
+        restarted = DHLOutbox(
+            self.service, os.path.join(self.directory.name, "outbox.sqlite")
+        )
+        restarted.drain()
+        self.assertEqual("T999", restarted.entry(1).tracking_number)
+        self.assertEqual(SHIPPED, restarted.entry(2).state)
+        self.assertEqual(UNKNOWN, restarted.entry(3).state)
+        self.assertEqual(["ref2"], self.shipped)
+        restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
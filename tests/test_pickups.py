@@ -0,0 +1,102 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from python_dhl.pickups import DHLPickupConsolidator, pickup_group_key
+from python_dhl.resources import address, shipment
+from python_dhl.resources.helper import AccountType, ShipperType
+from python_dhl.resources.response import DHLPickupResponse
+from python_dhl.service import DHLService
+
+
+class TestPickupConsolidator(unittest.TestCase):
+    def setUp(self):
+        self.service = DHLService("key", "secret", "123456789")
+        self.booked = []
+
+    def tearDown(self):
+        self.service.close()
+
+    def pickup(self, hour=10, day=2, street="Via Roma 1", account="123", weight=1):
+        contact = address.DHLContactInformation(
+            full_name="Name and surname",
+            phone="+39000000000",
+            contact_type=ShipperType.BUSINESS.value,
+        )
+        return shipment.DHLPickup(
+            sender_contact=contact,
+            sender_address=address.DHLPostalAddress(
+                street_line1=street,
+                postal_code="36016",
+                country_code="IT",
+                city_name="Thiene",
+            ),
+            receiver_contact=contact,
+            receiver_address=None,
+            pickup_datetime=datetime(
+                2024, 5, day, hour, tzinfo=ZoneInfo("Europe/Rome")
+            ),
+            content=shipment.DHLShipmentContent(
+                packages=[
+                    shipment.DHLProduct(weight=weight, length=35, width=28, height=8)
+                ],
+                is_custom_declarable=False,
+                description="Shipment test",
+                incoterm_code="DAP",
+                unit_of_measurement="metric",
+                product_code="N",
+            ),
+            accounts=[
+                shipment.DHLAccountType(type_code=AccountType.SHIPPER, number=account)
+            ],
+        )
+
+    def pickup_call(self, group):
+        self.booked.append(self.service._pickup_payload(group))
+        return DHLPickupResponse(
+            success=True, dispatch_confirmation_numbers=["PRG%d" % len(self.booked)]
+        )
+
+    def test_group_key(self):
+        key = pickup_group_key(self.pickup())
+        self.assertEqual(key, pickup_group_key(self.pickup(hour=15)))
+        self.assertEqual(key, pickup_group_key(self.pickup(street=" VIA ROMA 1")))
+        self.assertNotEqual(key, pickup_group_key(self.pickup(day=3)))
+        self.assertNotEqual(key, pickup_group_key(self.pickup(account="456")))
+        self.assertNotEqual(key, pickup_group_key(self.pickup(street="Via Roma 2")))
+
+    def test_one_payload_per_group(self):
+        consolidator = DHLPickupConsolidator()
+        consolidator.add_all(
+            [self.pickup(hour=9, weight=1), self.pickup(hour=11, weight=2)]
+        )
+        [group] = consolidator.groups()
+        payload = self.service._pickup_payload(group)
+        self.assertEqual(
+            [1, 2],
+            [d["packages"][0]["weight"] for d in payload["shipmentDetails"]],
+        )
+        self.assertEqual(
+            "2024-05-02T11:00:00 GMT+02:00", payload["plannedPickupDateAndTime"]
+        )
+
+    def test_book(self):
+        self.service.pickup = self.pickup_call
+        pickups = [self.pickup() for _ in range(5)] + [self.pickup(day=3)]
+        consolidator = DHLPickupConsolidator(max_shipments=3)
+        consolidator.add_all(pickups)
+        bookings = consolidator.book(self.service, max_concurrency=1)
+        self.assertEqual(3, bookings.requests)
+        numbers = bookings.dispatch_confirmation_numbers()
+        self.assertEqual(6, len(numbers))
+        self.assertEqual(numbers[pickups[0]], numbers[pickups[2]])
+        self.assertNotEqual(numbers[pickups[0]], numbers[pickups[3]])
+        self.assertEqual([3, 2, 1], [len(p["shipmentDetails"]) for p in self.booked])
+        self.assertEqual([], bookings.failed())
+        self.assertEqual([], consolidator.groups())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+
+from python_dhl.poller import (
+    DAY,
+    HOUR,
+    DHLPollSchedule,
+    DHLTrackedShipment,
+    DHLTrackingPoller,
+    last_event,
+)
+from python_dhl.resources.response import DHLTrackingResponse
+from python_dhl.service import DHLService
+
+
+def event(type_code, date="2024-05-02", time="10:00:00"):
+    return {"date": date, "time": time, "GMTOffset": "+02:00", "typeCode": type_code}
+
+
+class FakeTracking:
+    """
+    Stands for the service: answers the events set in self.events by tracking number
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.requests = []
+        self.service = DHLService("key", "secret", "123")
+
+    def track_many(self, tracking_numbers, group_size, max_concurrency):
+        self.requests.append(sorted(tracking_numbers))
+        for tracking_number in tracking_numbers:
+            events = self.events.get(tracking_number)
+            if events is None:
+                # DHL answers a shipment not tracked yet with a string status
+                response = self.service._tracking_results(
+                    [tracking_number],
+                    {"title": "Not Found", "detail": "No shipment", "status": "404"},
+                )[tracking_number]
+            else:
+                response = DHLTrackingResponse(
+                    success=True,
+                    shipments=[
+                        {"shipmentTrackingNumber": tracking_number, "events": events}
+                    ],
+                )
+            yield tracking_number, response
+
+
+class TestTrackingPoller(unittest.TestCase):
+    def setUp(self):
+        self.now = 1714636800.0  # 2024-05-02 10:00:00+02:00
+        self.service = FakeTracking()
+        self.changes = []
+        self.poller = DHLTrackingPoller(
+            self.service, on_change=self.changes.append, clock=lambda: self.now
+        )
+
+    def test_only_changes_are_emitted(self):
+        self.poller.add("1")
+        self.service.events["1"] = [event("PU")]
+        changes = self.poller.poll()
+        self.assertEqual(["PU"], [c.event_type for c in changes])
+        self.assertEqual(changes, self.changes)
+
+        self.now += 4 * HOUR
+        self.assertEqual([], self.poller.poll())
+
+        self.now += 4 * HOUR
+        self.service.events["1"].append(event("WC", time="17:00:00"))
+        changes = self.poller.poll()
+        self.assertEqual("PU", changes[0].previous["typeCode"])
+        self.assertEqual("WC", changes[0].event_type)
+        self.assertFalse(changes[0].done)
+
+    def test_schedule_follows_last_event(self):
+        self.poller.add("1")
+        self.poller.add("2")
+        self.poller.add("3")
+        self.service.events["1"] = [event("WC")]
+        self.service.events["2"] = [event("CD")]
+        self.poller.poll()
+        self.assertEqual(self.now + 15 * 60, self.poller.store.get("1").next_poll_at)
+        self.assertEqual(self.now + 12 * HOUR, self.poller.store.get("2").next_poll_at)
+        self.assertEqual(self.now + 6 * HOUR, self.poller.store.get("3").next_poll_at)
+        # not tracked by DHL yet, which is not an error
+        self.assertIsNone(self.poller.store.get("3").error)
+
+        self.now += 15 * 60
+        self.poller.poll()
+        self.assertEqual([["1", "2", "3"], ["1"]], self.service.requests)
+
+    def test_delivered_shipments_are_dropped(self):
+        self.poller.add("1")
+        self.service.events["1"] = [event("OK", time="12:00:00"), event("WC")]
+        changes = self.poller.poll()
+        self.assertEqual("OK", changes[0].event_type)
+        self.assertTrue(changes[0].done)
+        self.assertEqual(0, len(self.poller))
+        self.assertEqual([], list(self.poller.run()))
+
+    def test_dormant_and_expired_shipments(self):
+        schedule = DHLPollSchedule()
+        tracked = DHLTrackedShipment("1", self.now - 10 * DAY, self.now)
+        tracked.event_type = "PU"
+        tracked.event_at = self.now - 5 * DAY
+        self.assertEqual(20 * HOUR, schedule.interval(tracked, self.now))
+        tracked.event_at = self.now - 61 * DAY
+        self.assertIsNone(schedule.interval(tracked, self.now))
+
+    def test_last_event(self):
+        self.assertIsNone(last_event({"events": []}))
+        newest = event("WC", time="18:00:00")
+        self.assertIs(newest, last_event({"events": [newest, event("PU")]}))
+        self.assertIs(newest, last_event({"events": [event("PU"), newest]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
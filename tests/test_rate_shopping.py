@@ -0,0 +1,173 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import threading
+import time
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from python_dhl.rate_shopping import (
+    FASTEST,
+    DHLRateShopper,
+    rate_candidates,
+)
+from python_dhl.resources import address, shipment
+from python_dhl.resources.response import DHLRatesResponse
+
+
+def product(code, price, delivery, currency="EUR"):
+    return {
+        "productCode": code,
+        "productName": "Product " + code,
+        "totalPrice": (
+            [
+                {"currencyType": "BILLC", "priceCurrency": currency, "price": price},
+                {"currencyType": "PULCL", "priceCurrency": "USD", "price": price * 2},
+            ]
+            if price is not None
+            else []
+        ),
+        "deliveryCapabilities": {
+            "estimatedDeliveryDateAndTime": delivery,
+            "totalTransitDays": 1,
+        },
+    }
+
+
+class FakeRatesService:
+    """
+    get_rates answering by package weight: weight 1 is cheap and slow, weight 2 expensive and fast,
+    weight 3 fails, weight 9 answers after a while
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def answer(self, product_arg, with_customs):
+        with self.lock:
+            self.calls.append((product_arg.weight, with_customs))
+        if product_arg.weight == 3:
+            return DHLRatesResponse(success=False, error_title="No rates found.")
+        if product_arg.weight == 1:
+            products = [product("N", 20.0, "2024-05-06T18:00:00")]
+        else:
+            products = [
+                product("P", 50.0, "2024-05-03T12:00:00"),
+                product("U", None, None),
+            ]
+        return DHLRatesResponse(success=True, products=products)
+
+    def get_rates(
+        self,
+        sender,
+        receiver,
+        product,
+        shipment_date,
+        with_customs="false",
+        unit_of_measurement="metric",
+        timeout=None,
+        deadline=None,
+    ):
+        if product.weight == 9:
+            time.sleep(0.5)
+        return self.answer(product, with_customs)
+
+
+class FakeAsyncRatesService(FakeRatesService):
+    async def get_rates(
+        self,
+        sender,
+        receiver,
+        product,
+        shipment_date,
+        with_customs="false",
+        unit_of_measurement="metric",
+        timeout=None,
+        deadline=None,
+    ):
+        if product.weight == 9:
+            await asyncio.sleep(10)
+        return self.answer(product, with_customs)
+
+
+class TestRateShopping(unittest.TestCase):
+    def setUp(self):
+        self.address = address.DHLPostalAddress(
+            street_line1="Via Roma 1",
+            postal_code="36016",
+            country_code="IT",
+            city_name="Thiene",
+        )
+        self.date = datetime(2024, 5, 2, 10, tzinfo=ZoneInfo("Europe/Rome"))
+
+    def packages(self, *weights):
+        return [
+            shipment.DHLProduct(weight=weight, length=10, width=10, height=10)
+            for weight in weights
+        ]
+
+    def test_candidates(self):
+        candidates = rate_candidates(
+            self.packages(1, 2), [self.date, self.date], customs=(False, True)
+        )
+        self.assertEqual(8, len(candidates))
+        self.assertEqual("true", candidates[1].rates_arguments()["with_customs"])
+
+    def test_rank(self):
+        service = FakeRatesService()
+        shopping = DHLRateShopper(service).shop(
+            self.address,
+            self.address,
+            rate_candidates(self.packages(2, 3, 1), [self.date]),
+        )
+        self.assertEqual(3, len(service.calls))
+        self.assertEqual(["N", "P", "U"], [q.product_code for q in shopping.quotes])
+        self.assertEqual(1, len(shopping.failures))
+        self.assertEqual(20.0, shopping.cheapest.price)
+        self.assertEqual("P", shopping.fastest.product_code)
+        self.assertEqual(2, shopping.fastest.candidate.product.weight)
+        self.assertIsNone(shopping.selected)
+
+        shopping = DHLRateShopper(service, currency="USD").shop(
+            self.address,
+            self.address,
+            rate_candidates(self.packages(2, 1), [self.date]),
+            by=FASTEST,
+        )
+        self.assertEqual(["P", "N", "U"], [q.product_code for q in shopping.quotes])
+        self.assertEqual((100.0, "USD"), (shopping.best.price, shopping.best.currency))
+
+    def test_policy_stops_shopping(self):
+        service = FakeRatesService()
+        candidates = rate_candidates(self.packages(1, 9, 9, 9, 9), [self.date])
+        start = time.monotonic()
+        shopping = DHLRateShopper(service, max_concurrency=2).shop(
+            self.address,
+            self.address,
+            candidates,
+            policy=lambda quote: quote.price is not None and quote.price < 30,
+        )
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual("N", shopping.selected.product_code)
+        self.assertGreaterEqual(shopping.cancelled, 2)
+
+    def test_policy_stops_shopping_async(self):
+        service = FakeAsyncRatesService()
+        candidates = rate_candidates(self.packages(9, 2, 9, 1), [self.date])
+        shopping = asyncio.run(
+            DHLRateShopper(service).shop_async(
+                self.address,
+                self.address,
+                candidates,
+                policy=lambda quote: quote.price is not None and quote.price < 30,
+            )
+        )
+        self.assertEqual("N", shopping.selected.product_code)
+        self.assertEqual(2, shopping.cancelled)
+        self.assertEqual(["N", "P", "U"], [q.product_code for q in shopping.quotes])
+
+
+if __name__ == "__main__":
+    unittest.main()
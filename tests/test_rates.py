@@ -0,0 +1,143 @@
+# to run tests: python -m unittest discover -s tests
+
+import pickle
+import unittest
+from datetime import datetime
+
+from python_dhl.cache import DHLResponseCache
+from python_dhl.fake import DHLFakeServer
+from python_dhl.resources import address, shipment
+from python_dhl.resources.rates import DHLRates
+from python_dhl.resources.response import DHLRatesResponse
+from python_dhl.service import DHLService
+
+PRODUCTS = [
+    {
+        "productName": "EXPRESS WORLDWIDE",
+        "productCode": "P",
+        "localProductCode": "S",
+        "networkTypeCode": "TD",
+        "isCustomerAgreement": False,
+        "totalPrice": [
+            {"currencyType": "BILLC", "priceCurrency": "EUR", "price": 80.5},
+            {"currencyType": "PULCL", "priceCurrency": "USD", "price": 90.1},
+            {"currencyType": "BASEC", "priceCurrency": "EUR", "price": 70.0},
+        ],
+        "totalPriceBreakdown": [
+            {
+                "currencyType": "BILLC",
+                "priceCurrency": "EUR",
+                "priceBreakdown": [
+                    {"typeCode": "SPRQT", "price": 70.0},
+                    {"typeCode": "STSCH", "price": 10.5},
+                ],
+            }
+        ],
+        "detailedPriceBreakdown": [
+            {
+                "currencyType": "PULCL",
+                "priceCurrency": "USD",
+                "breakdown": [
+                    {"name": "EXPRESS WORLDWIDE", "price": 78.1},
+                    {"name": "FUEL SURCHARGE", "serviceCode": "FF", "price": 12.0},
+                ],
+            }
+        ],
+        "deliveryCapabilities": {
+            "estimatedDeliveryDateAndTime": "2024-05-03T12:00:00",
+            "totalTransitDays": "1",
+        },
+    },
+    {
+        "productName": "ECONOMY SELECT",
+        "productCode": "H",
+        "localProductCode": "H",
+        "totalPrice": [
+            {"currencyType": "BILLC", "priceCurrency": "EUR", "price": 40.0},
+            {"currencyType": "PULCL", "priceCurrency": "USD", "price": 95.0},
+        ],
+        "deliveryCapabilities": {
+            "estimatedDeliveryDateAndTime": "2024-05-07T23:59:00",
+            "totalTransitDays": "3",
+        },
+    },
+    {"productName": "NO PRICE", "productCode": "U"},
+]
+
+
+class TestRates(unittest.TestCase):
+    def test_index_and_prices(self):
+        rates = DHLRatesResponse(success=True, products=PRODUCTS).rates
+        self.assertEqual(("P", "H", "U"), rates.product_codes)
+        self.assertIs(rates["P"], rates["S"])
+        self.assertNotIn("X", rates)
+        self.assertIsNone(rates.get("X"))
+        self.assertEqual(80.5, rates.price("P"))
+        self.assertEqual(90.1, rates.price("S", "USD"))
+        self.assertIsNone(rates.price("P", "GBP"))
+        self.assertIsNone(rates.price("U"))
+        self.assertEqual(("EUR", "USD"), rates["P"].currencies)
+        self.assertEqual("EUR", rates["P"].currency)
+        self.assertEqual(datetime(2024, 5, 3, 12), rates["P"].delivery)
+        self.assertEqual(1, rates["P"].transit_days)
+        self.assertEqual(
+            ["SPRQT", "STSCH"], [charge.type_code for charge in rates["P"].breakdown()]
+        )
+        self.assertEqual(
+            [None, "FF"],
+            [charge.service_code for charge in rates["P"].breakdown("USD")],
+        )
+
+    def test_cheapest_and_fastest(self):
+        rates = DHLRates.from_products(PRODUCTS)
+        self.assertEqual("H", rates.cheapest.product_code)
+        self.assertEqual("P", rates.fastest.product_code)
+        self.assertEqual("P", rates.cheapest_in("USD").product_code)
+        empty = DHLRates.from_products(None)
+        self.assertEqual(0, len(empty))
+        self.assertIsNone(empty.cheapest)
+
+    def test_immutable_and_picklable(self):
+        rates = DHLRates.from_products(PRODUCTS)
+        with self.assertRaises(AttributeError):
+            rates["P"].product_code = "X"
+        copy = pickle.loads(pickle.dumps(rates))
+        self.assertEqual(rates, copy)
+        self.assertEqual(hash(rates), hash(copy))
+        self.assertIs(copy["S"], copy["P"])
+
+
+class TestCachedRates(unittest.TestCase):
+    def test_cache_hits_share_the_rates(self):
+        fake = DHLFakeServer()
+        cache = DHLResponseCache(ttl=60)
+        service = DHLService(
+            "key", "secret", "123", rates_cache=cache, transport=fake.transport()
+        )
+        sender = address.DHLPostalAddress(
+            street_line1="Via Roma 1",
+            postal_code="36016",
+            country_code="IT",
+            city_name="Thiene",
+        )
+        receiver = address.DHLPostalAddress(
+            street_line1="Rue 1",
+            postal_code="75017",
+            country_code="FR",
+            city_name="Paris",
+        )
+        package = shipment.DHLProduct(weight=1, length=35, width=28, height=8)
+        shipment_date = datetime.fromisoformat("2024-05-02T10:00:00+02:00")
+
+        first = service.get_rates(sender, receiver, package, shipment_date)
+        second = service.get_rates(sender, receiver, package, shipment_date)
+        third = service.get_rates(sender, receiver, package, shipment_date)
+        self.assertEqual(1, fake.stats()["requests"]["GET /rates"])
+        self.assertEqual(first.rates, second.rates)
+        # the hits reuse the DHLRates built from the cached answer
+        self.assertIs(second.rates, third.rates)
+        self.assertIs(second.data, third.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+# to run tests: python -m unittest discover -s tests
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from python_dhl.codec import DHLJSONCodec
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.resources.rates import DHLRates
+from python_dhl.resources.response import (
+    DHLRatesResponse,
+    DHLShipmentResponse,
+    LazyField,
+)
+from python_dhl.retry import DHLIdempotencyStore
+from python_dhl.service import DHLService
+from tests.helpers import ROW, ScriptedTransport
+
+SHIPMENT_ANSWER = {
+    "shipmentTrackingNumber": "123",
+    "documents": [{"imageFormat": "PDF", "content": "bGFiZWw=", "typeCode": "label"}],
+}
+
+RATES_ANSWER = {
+    "products": [
+        {
+            "productCode": "P",
+            "productName": "EXPRESS WORLDWIDE",
+            "totalPrice": [{"price": 44.0, "priceCurrency": "EUR"}],
+            "deliveryCapabilities": {"totalTransitDays": 1},
+        }
+    ]
+}
+
+
+class CountingCodec(DHLJSONCodec):
+    def __init__(self):
+        self.decoded = 0
+
+    def loads(self, data):
+        self.decoded += 1
+        return super().loads(data)
+
+
+class WatchedData(dict):
+    """
+    Parsed answer recording the keys read from it
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.read = []
+
+    def get(self, key, default=None):
+        self.read.append(key)
+        return super().get(key, default)
+
+
+def make_shipment():
+    return shipment_from_row(
+        ROW,
+        "123",
+        shipment.DHLShipmentOutput(
+            dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+        ),
+    )
+
+
+def shipment_response():
+    response = DHLShipmentResponse(success=True, tracking_number="123")
+    response.data = {
+        "documents": [dict(document) for document in SHIPMENT_ANSWER["documents"]]
+    }
+    return response
+
+
+class TestSingleDecode(unittest.TestCase):
+    def test_body_decoded_once(self):
+        json_codec = CountingCodec()
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            json_codec=json_codec,
+            transport=ScriptedTransport((201, SHIPMENT_ANSWER)),
+        )
+        dhl_shipment = make_shipment()
+        with mock.patch.object(
+            requests.Response, "json", side_effect=AssertionError("decoded again")
+        ):
+            response = service.ship(dhl_shipment)
+            self.assertTrue(response.success)
+            self.assertEqual("123", response.tracking_number)
+            self.assertEqual(b"label", bytes(response.document_content(0)))
+            self.assertEqual(SHIPMENT_ANSWER["documents"], response.documents_bytes)
+        self.assertEqual(1, json_codec.decoded)
+
+    def test_tracking_decoded_once(self):
+        json_codec = CountingCodec()
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            json_codec=json_codec,
+            transport=ScriptedTransport((200, {"shipments": [{"status": "ok"}]})),
+        )
+        response = service.get_shipment_status("1")
+        self.assertEqual([{"status": "ok"}], response.shipments)
+        self.assertEqual([{"status": "ok"}], response.shipments)
+        self.assertEqual(1, json_codec.decoded)
+
+
+class TestLazyField(unittest.TestCase):
+    def test_built_on_first_access_and_cached(self):
+        response = DHLShipmentResponse(success=True)
+        response.data = WatchedData(SHIPMENT_ANSWER)
+        self.assertNotIn("documents_bytes", vars(response))
+        self.assertEqual([], response.data.read)
+        documents = response.documents_bytes
+        self.assertIs(SHIPMENT_ANSWER["documents"], documents)
+        self.assertIs(documents, vars(response)["documents_bytes"])
+        self.assertIs(documents, response.documents_bytes)
+        self.assertEqual(["documents"], response.data.read)
+
+    def test_missing_data(self):
+        self.assertIsNone(DHLShipmentResponse(success=False).documents_bytes)
+        response = DHLShipmentResponse(success=True)
+        response.data = {}
+        self.assertIsNone(response.documents_bytes)
+
+    def test_value_set_before_access(self):
+        response = DHLShipmentResponse(success=True, documents_bytes=[])
+        response.data = WatchedData(SHIPMENT_ANSWER)
+        self.assertEqual([], response.documents_bytes)
+        self.assertEqual([], response.data.read)
+
+    def test_descriptor_on_the_class(self):
+        field = DHLShipmentResponse.documents_bytes
+        self.assertIsInstance(field, LazyField)
+        self.assertEqual(("documents", "documents_bytes"), (field.key, field.name))
+
+    def test_rates_built_once(self):
+        response = DHLRatesResponse(success=True)
+        response.data = WatchedData(RATES_ANSWER)
+        with mock.patch.object(
+            DHLRates, "from_products", wraps=DHLRates.from_products
+        ) as from_products:
+            self.assertEqual([], response.data.read)
+            rates = response.rates
+            self.assertIs(rates, response.rates)
+        from_products.assert_called_once_with(RATES_ANSWER["products"])
+        self.assertEqual(["products"], response.data.read)
+
+
+class TestDocuments(unittest.TestCase):
+    def test_content_decoded_once(self):
+        response = shipment_response()
+        content = response.document_content(0)
+        self.assertEqual(b"label", bytes(content))
+        self.assertTrue(content.readonly)
+        self.assertIs(content.obj, response.document_content(0).obj)
+
+    def test_release(self):
+        response = shipment_response()
+        content = response.document_content(0, release=True)
+        self.assertNotIn("content", response.data["documents"][0])
+        self.assertEqual(content, response.document_content(0))
+        file = io.BytesIO()
+        self.assertEqual(5, response.save_document(0, file))
+        self.assertEqual(b"label", file.getvalue())
+        with self.assertRaises(ValueError):
+            response.document_content(0)
+
+    def test_remembered_response_keeps_its_documents(self):
+        transport = ScriptedTransport((201, SHIPMENT_ANSWER))
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            idempotency_store=DHLIdempotencyStore(),
+            transport=transport,
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            paths = service.ship(make_shipment()).save_documents(directory)
+            self.assertEqual(5, os.path.getsize(paths[0]))
+            response = service.ship(make_shipment())
+            self.assertEqual(
+                b"label", bytes(response.document_content(0, release=True))
+            )
+            self.assertEqual(paths, response.save_documents(directory))
+        self.assertEqual(1, transport.calls)
+        self.assertEqual("bGFiZWw=", response.documents_bytes[0]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+# to run tests: python -m unittest discover -s tests
+
+import random
+import unittest
+from unittest import mock
+
+import requests
+
+from python_dhl.fake import DHLFakeServer, DHLFakeTransport
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.resources.helper import Endpoint
+from python_dhl.retry import (
+    RETRY,
+    VERIFY_AND_RETRY,
+    DHLIdempotencyStore,
+    DHLRetryPolicy,
+)
+from python_dhl.service import DHLService
+from tests.helpers import ROW, ScriptedTransport
+
+
+class TimingOutTransport(DHLFakeTransport):
+    """
+    The next shipment creation times out waiting for the answer,
+    after DHL processed it if reached is True, before otherwise
+    """
+
+    reached = None
+
+    def request(self, method, url, **kwargs):
+        if method == "POST" and self.reached is not None:
+            reached, self.reached = self.reached, None
+            if reached:
+                DHLFakeTransport.request(self, method, url, **kwargs)
+            raise requests.ReadTimeout("Read timed out.")
+        return DHLFakeTransport.request(self, method, url, **kwargs)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_action(self):
+        policy = DHLRetryPolicy(max_attempts=3)
+
+        self.assertEqual(policy.action(0, True, status=503), RETRY)
+        self.assertIsNone(policy.action(0, True, status=400))
+        self.assertIsNone(policy.action(2, True, status=503))
+        # a POST that may have reached DHL must be verified before sending it again
+        self.assertEqual(policy.action(0, False, status=503), VERIFY_AND_RETRY)
+        self.assertEqual(
+            policy.action(0, False, error=Exception(), not_sent=True), RETRY
+        )
+
+    def test_backoff(self):
+        policy = DHLRetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual(policy.backoff(1), 2)
+        self.assertEqual(policy.backoff(10), 5)
+
+        policy = DHLRetryPolicy(backoff_factor=1, max_backoff=5)
+        for attempt in range(1, 10):
+            self.assertTrue(0 <= policy.backoff(attempt) <= 5)
+
+    def test_full_jitter(self):
+        policy = DHLRetryPolicy(backoff_factor=0.5, max_backoff=3)
+        with mock.patch("python_dhl.retry.random.uniform") as uniform:
+            uniform.side_effect = lambda low, high: high
+            self.assertEqual(
+                [1.0, 2.0, 3.0, 3.0], [policy.backoff(a) for a in range(1, 5)]
+            )
+        self.assertEqual(
+            [(0, 1.0), (0, 2.0), (0, 3), (0, 3)],
+            [call.args for call in uniform.call_args_list],
+        )
+        random.seed(7)
+        delays = [policy.backoff(a) for a in range(1, 50)]
+        random.seed(7)
+        self.assertEqual(delays, [policy.backoff(a) for a in range(1, 50)])
+        for attempt, delay in enumerate(delays, 1):
+            self.assertTrue(0 <= delay <= min(3, 0.5 * 2**attempt))
+        # jittered: the waits of many clients are spread, not all equal to the cap
+        self.assertGreater(len(set(delays)), 40)
+
+    def test_idempotency_store(self):
+        store = DHLIdempotencyStore(max_size=2)
+        store.set("a", 1)
+        store.set("b", 2)
+        store.set("c", 3)
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("c"), 3)
+
+        store = DHLIdempotencyStore(ttl=-1)
+        store.set("a", 1)
+        self.assertIsNone(store.get("a"))
+
+
+class TestRetriedRequests(unittest.TestCase):
+    def request(self, method, endpoint, *answers, policy=None, **settings):
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            retry_policy=policy or DHLRetryPolicy(max_attempts=3, backoff_factor=0),
+            transport=ScriptedTransport(*answers),
+            **settings,
+        )
+        try:
+            status = service._request(method, endpoint.value, endpoint).status_code
+        except requests.RequestException as err:
+            status = type(err)
+        return status, service.transport.calls
+
+    def test_retryable_statuses(self):
+        for status in (500, 502, 503, 504):
+            self.assertEqual(
+                (200, 2), self.request("GET", Endpoint.TRACKING, status, 200)
+            )
+        for status in (400, 401, 404, 422):
+            self.assertEqual(
+                (status, 1), self.request("GET", Endpoint.TRACKING, status, 200)
+            )
+        self.assertEqual(
+            (503, 3), self.request("GET", Endpoint.RATES, 503, 503, 503, 200)
+        )
+        policy = DHLRetryPolicy(backoff_factor=0, retry_statuses=(500,))
+        self.assertEqual(
+            (503, 1), self.request("GET", Endpoint.RATES, 503, 200, policy=policy)
+        )
+
+    def test_network_errors(self):
+        self.assertEqual(
+            (200, 2),
+            self.request("GET", Endpoint.TRACKING, requests.ReadTimeout(), 200),
+        )
+        self.assertEqual(
+            (requests.ReadTimeout, 3),
+            self.request("GET", Endpoint.TRACKING, *[requests.ReadTimeout()] * 3),
+        )
+
+    def test_creations_are_not_resent_blindly(self):
+        # a POST that may have reached DHL and cannot be verified is not sent again
+        self.assertEqual((503, 1), self.request("POST", Endpoint.PICKUPS, 503, 201))
+        self.assertEqual(
+            (requests.ReadTimeout, 1),
+            self.request("POST", Endpoint.PICKUPS, requests.ReadTimeout(), 201),
+        )
+        # unless it surely did not reach DHL
+        self.assertEqual(
+            (201, 2),
+            self.request("POST", Endpoint.PICKUPS, requests.ConnectTimeout(), 201),
+        )
+
+    def test_policy_per_endpoint(self):
+        settings = {
+            "retry_policies": {
+                Endpoint.RATES.value: DHLRetryPolicy(max_attempts=1),
+            }
+        }
+        self.assertEqual(
+            (503, 1), self.request("GET", Endpoint.RATES, 503, 200, **settings)
+        )
+        self.assertEqual(
+            (200, 2), self.request("GET", Endpoint.TRACKING, 503, 200, **settings)
+        )
+
+
+class TestVerifyAndRetry(unittest.TestCase):
+    def setUp(self):
+        self.fake = DHLFakeServer()
+        self.transport = TimingOutTransport(self.fake)
+        self.service = DHLService(
+            "key",
+            "secret",
+            "123",
+            retry_policy=DHLRetryPolicy(backoff_factor=0),
+            transport=self.transport,
+        )
+        self.output_format = shipment.DHLShipmentOutput(
+            dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+        )
+
+    def shipment(self, **row):
+        return shipment_from_row(dict(ROW, **row), "123", self.output_format)
+
+    def test_created_shipment_is_found(self):
+        self.transport.reached = True
+        response = self.service.ship(self.shipment())
+        self.assertTrue(response.success)
+        self.assertEqual(list(self.fake.shipments), [response.tracking_number])
+
+    def test_other_shipment_with_the_reference_is_not_taken(self):
+        first = self.service.ship(self.shipment())
+        for dhl_shipment in (
+            self.shipment(receiver_postal_code="10115", receiver_country="DE"),
+            self.shipment(ship_datetime="2024-05-20T10:00:00+02:00"),
+        ):
+            self.transport.reached = False
+            response = self.service.ship(dhl_shipment)
+            self.assertTrue(response.success)
+            self.assertNotEqual(first.tracking_number, response.tracking_number)
+        dhl_shipment = self.shipment()
+        dhl_shipment.customer_references = ["ORDER-1", "ORDER-2"]
+        self.transport.reached = False
+        response = self.service.ship(dhl_shipment)
+        self.assertNotEqual(first.tracking_number, response.tracking_number)
+        self.assertEqual(4, len(self.fake.shipments))
+        lookup = self.service._shipment_lookup_params(dhl_shipment)
+        self.assertEqual("2024-05-01", lookup["dateRangeFrom"])
+        self.assertEqual("2024-05-03", lookup["dateRangeTo"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# to run tests: python -m unittest discover -s tests
+
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+
+from python_dhl.async_service import AsyncDHLService, httpx
+from python_dhl.manifest import shipment_from_row
+from python_dhl.resources import shipment
+from python_dhl.service import DHLService
+from python_dhl.stream import DHLDocumentWriter, ijson, parse_documents
+from python_dhl.transport import DHLTransport
+from tests.helpers import ROW
+
+LABEL = bytes(range(256)) * 2000
+
+
+def shipment_answer():
+    return json.dumps(
+        {
+            "shipmentTrackingNumber": "123",
+            "documents": [
+                {
+                    "imageFormat": "PDF",
+                    "content": base64.b64encode(LABEL).decode(),
+                    "typeCode": "label",
+                },
+                {"imageFormat": "PNG", "content": "aW52", "typeCode": "invoice"},
+            ],
+            "packages": [{"referenceNumber": 1, "trackingNumber": "JD01"}],
+            "dispatchConfirmationNumber": "PRG1",
+        }
+    ).encode()
+
+
+class StreamingTransport(DHLTransport):
+    """
+    Answers POST /shipments with a body read from response.raw
+    """
+
+    def __init__(self, status=201, body=None):
+        self.status = status
+        self.body = body if body is not None else shipment_answer()
+        self.streamed = None
+
+    def request(self, method, url, stream=False, **kwargs):
+        self.streamed = stream
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = url
+        response.raw = io.BytesIO(self.body)
+        return response
+
+
+@unittest.skipIf(ijson is None, "ijson is not installed")
+class TestParseDocuments(unittest.TestCase):
+    def test_documents_are_passed_to_the_sink(self):
+        body = {
+            "shipmentTrackingNumber": "123",
+            "documents": [
+                {"imageFormat": "PDF", "content": "aGVsbG8=", "typeCode": "label"},
+                {"imageFormat": "PDF", "content": "aW52", "typeCode": "invoice"},
+            ],
+            "packages": [{"referenceNumber": 1, "trackingNumber": "JD01"}],
+        }
+        documents = []
+
+        data = parse_documents(io.BytesIO(json.dumps(body).encode()), documents.append)
+
+        self.assertEqual(documents, body["documents"])
+        self.assertEqual(data["documents"], [])
+        self.assertEqual(data["shipmentTrackingNumber"], "123")
+        self.assertEqual(data["packages"], body["packages"])
+
+
+@unittest.skipIf(ijson is None, "ijson is not installed")
+class TestStreamedShipment(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.writer = DHLDocumentWriter(self.directory.name, "ORDER-1", chunk_size=999)
+        self.shipment = shipment_from_row(
+            ROW,
+            "123",
+            shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+        )
+
+    def check_documents(self, response):
+        self.assertTrue(response.success)
+        self.assertEqual("123", response.tracking_number)
+        self.assertEqual("PRG1", response.dispatch_confirmation_number)
+        self.assertEqual("JD01", response.data["packages"][0]["trackingNumber"])
+        # the documents went to the sink only
+        self.assertEqual([], response.documents_bytes)
+        self.assertEqual(
+            ["ORDER-1-0-label.pdf", "ORDER-1-1-invoice.png"],
+            [os.path.basename(path) for path in self.writer.paths],
+        )
+        with open(self.writer.paths[0], "rb") as file:
+            self.assertEqual(LABEL, file.read())
+        with open(self.writer.paths[1], "rb") as file:
+            self.assertEqual(b"inv", file.read())
+
+    def test_label_streamed_to_files(self):
+        transport = StreamingTransport()
+        service = DHLService("key", "secret", "123", transport=transport)
+        response = service.ship(self.shipment, document_sink=self.writer)
+        self.assertTrue(transport.streamed)
+        self.check_documents(response)
+
+    def test_error_answer_is_not_streamed_to_the_sink(self):
+        transport = StreamingTransport(
+            400, json.dumps({"title": "Bad request", "detail": "No"}).encode()
+        )
+        service = DHLService("key", "secret", "123", transport=transport)
+        response = service.ship(self.shipment, document_sink=self.writer)
+        self.assertFalse(response.success)
+        self.assertEqual("No", response.error_detail)
+        self.assertEqual([], self.writer.paths)
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_label_streamed_to_files(self):
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(201, content=shipment_answer())
+        )
+        service = AsyncDHLService("key", "secret", "123", transport=transport)
+
+        async def ship():
+            try:
+                return await service.ship(self.shipment, document_sink=self.writer)
+            finally:
+                await service.close()
+
+        self.check_documents(asyncio.run(ship()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# to run tests: python -m unittest discover -s tests
+
+import json
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from python_dhl.resources import address, shipment
+from python_dhl.resources.helper import AccountType, ShipperType
+from python_dhl.service import DHLService
+
+
+class TestShipmentTemplate(unittest.TestCase):
+    def setUp(self):
+        self.service = DHLService("key", "secret", "123456789")
+        self.sender_contact = address.DHLContactInformation(
+            company_name="Test Co.",
+            full_name="Name and surname",
+            phone="+39000000000",
+            email="mail@mail.com",
+            contact_type=ShipperType.BUSINESS.value,
+        )
+        self.sender_address = address.DHLPostalAddress(
+            street_line1="Via Roma 1",
+            street_line2="Scala B",
+            postal_code="36016",
+            province_code="VI",
+            country_code="IT",
+            city_name="Thiene",
+        )
+        self.content = shipment.DHLShipmentContent(
+            packages=[shipment.DHLProduct(weight=1, length=35, width=28, height=8)],
+            is_custom_declarable=False,
+            description="Shipment test",
+            incoterm_code="DAP",
+            unit_of_measurement="metric",
+            product_code="N",
+        )
+
+    def tearDown(self):
+        self.service.close()
+
+    def shipment(self, receiver_name, reference):
+        return shipment.DHLShipment(
+            accounts=[
+                shipment.DHLAccountType(type_code=AccountType.SHIPPER, number="123")
+            ],
+            sender_contact=self.sender_contact,
+            sender_address=self.sender_address,
+            receiver_contact=address.DHLContactInformation(
+                full_name=receiver_name,
+                phone="+39000000000",
+                contact_type=ShipperType.PRIVATE.value,
+            ),
+            receiver_address=address.DHLPostalAddress(
+                street_line1="Via Milano 2",
+                postal_code="20121",
+                country_code="IT",
+                city_name="Milano",
+            ),
+            ship_datetime=datetime(2024, 5, 2, 10, tzinfo=ZoneInfo("Europe/Rome")),
+            added_services=[],
+            product_code="N",
+            content=self.content,
+            output_format=shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+            customer_references=[reference],
+        )
+
+    def test_payload_matches_create_shipment(self):
+        template = self.service.shipment_template(self.shipment("Prototype", "ref0"))
+        expected = self.shipment("Receiver", "ref1")
+        templated = template.shipment(
+            expected.receiver_contact,
+            expected.receiver_address,
+            expected.content,
+            ["ref1"],
+        )
+
+        payload = self.service._shipment_payload(templated)
+        self.assertIsInstance(payload, bytes)
+        self.assertEqual(json.loads(payload), self.service._create_shipment(expected))
+        self.assertEqual(
+            json.loads(payload)["pickup"]["pickupDetails"]["postalAddress"][
+                "addressLine2"
+            ],
+            "Scala B",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
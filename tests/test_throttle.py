@@ -0,0 +1,123 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+from unittest import mock
+
+from python_dhl.resources.helper import Endpoint
+from python_dhl.service import DHLService
+from python_dhl.throttle import DHLRateLimiter, DHLTokenBucket, parse_retry_after
+from tests.helpers import Clock, ScriptedTransport
+
+
+def throttling(throttled):
+    """
+    Answers 429 with Retry-After the first throttled times, then an empty tracking answer
+    """
+    return ScriptedTransport(
+        *[(429, {}, {"Retry-After": "0.2"})] * throttled, (200, {"shipments": []})
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("python_dhl.throttle.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        bucket = DHLTokenBucket(2, burst=2)
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(0.0, bucket.reserve())
+        # the bucket is empty: the next token comes in 1 / rate seconds
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        self.clock.now += 10
+        # refilled up to burst, not more
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        self.assertEqual(6, bucket.stats()["calls"])
+
+    def test_max_wait(self):
+        bucket = DHLTokenBucket(1, burst=1)
+        bucket.reserve()
+        self.assertIsNone(bucket.reserve(max_wait=0.5))
+        self.assertEqual(1, bucket.stats()["calls"])
+
+    def test_pause(self):
+        bucket = DHLTokenBucket(10, burst=10)
+        limiter = DHLRateLimiter({Endpoint.SHIPMENTS.value: bucket})
+        limiter.throttled(Endpoint.SHIPMENTS.value, 3)
+        self.assertAlmostEqual(3.0, bucket.reserve())
+        self.clock.now += 3
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(1, bucket.stats()["throttled"])
+        # endpoints without a bucket are neither limited nor paused
+        limiter.throttled(Endpoint.TRACKING.value, 3)
+        self.assertEqual(0.0, limiter.acquire(Endpoint.TRACKING.value))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(2.0, parse_retry_after("2"))
+        self.assertEqual(0.0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TestThrottledCalls(unittest.TestCase):
+    def track(self, service):
+        with mock.patch("python_dhl.service.time.sleep") as sleep:
+            results = service.track_group(["1"])
+        return results, [call.args[0] for call in sleep.call_args_list]
+
+    def test_retry_after_without_limiter(self):
+        service = DHLService("key", "secret", "123", transport=throttling(2))
+        results, sleeps = self.track(service)
+        self.assertEqual(3, service.transport.calls)
+        self.assertEqual([0.2, 0.2], sleeps)
+        self.assertEqual(404, results["1"].status)
+
+    def test_retry_after_paces_the_bucket(self):
+        bucket = DHLTokenBucket(100, burst=100)
+        limiter = DHLRateLimiter({Endpoint.TRACKING.value: bucket})
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            rate_limiter=limiter,
+            transport=throttling(1),
+        )
+        results, sleeps = self.track(service)
+        self.assertEqual(2, service.transport.calls)
+        # the wait is done by the paused bucket, not by the service
+        self.assertEqual(1, len(sleeps))
+        self.assertAlmostEqual(0.2, sleeps[0], places=1)
+        self.assertEqual(1, bucket.stats()["throttled"])
+
+    def test_retry_after_for_endpoint_without_bucket(self):
+        limiter = DHLRateLimiter({Endpoint.SHIPMENTS.value: DHLTokenBucket(5)})
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            rate_limiter=limiter,
+            transport=throttling(2),
+        )
+        results, sleeps = self.track(service)
+        self.assertEqual(3, service.transport.calls)
+        self.assertEqual([0.2, 0.2], sleeps)
+
+    def test_retries_exhausted(self):
+        service = DHLService(
+            "key",
+            "secret",
+            "123",
+            max_throttle_retries=1,
+            transport=throttling(5),
+        )
+        results, sleeps = self.track(service)
+        self.assertEqual(2, service.transport.calls)
+        self.assertEqual(429, results["1"].status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+
+from python_dhl.service import DHLService
+from python_dhl.tracking import DHLTrackingResults, tracking_groups
+
+
+class TestTrackMany(unittest.TestCase):
+    def setUp(self):
+        self.service = DHLService("key", "secret", "123456789")
+        self.groups = []
+
+    def tearDown(self):
+        self.service.close()
+
+    def track_group(self, tracking_numbers, timeout=None, deadline=None):
+        self.groups.append(tracking_numbers)
+        return self.service._tracking_results(
+            tracking_numbers,
+            {
+                "shipments": [
+                    {"shipmentTrackingNumber": t, "status": "transit"}
+                    for t in tracking_numbers
+                    if not t.startswith("X")
+                ]
+            },
+        )
+
+    def test_tracking_groups(self):
+        self.assertEqual(
+            [["1", "2"], ["3", "4"], ["5"]],
+            list(tracking_groups(iter([1, 2, 3, 4, 5]), 2)),
+        )
+        with self.assertRaises(ValueError):
+            list(tracking_groups([1], 0))
+
+    def test_results_by_tracking_number(self):
+        results = self.service._tracking_results(
+            ["1", "2"],
+            {"shipments": [{"shipmentTrackingNumber": "2", "status": "delivered"}]},
+        )
+        self.assertIsInstance(results, DHLTrackingResults)
+        self.assertFalse(results.success)
+        self.assertEqual(
+            [{"shipmentTrackingNumber": "2", "status": "delivered"}],
+            results["2"].shipments,
+        )
+        self.assertFalse(results["1"].success)
+        self.assertEqual(404, results["1"].status)
+
+    def test_not_found_answer(self):
+        results = self.service._tracking_results(
+            ["1"], {"title": "Not Found", "detail": "No shipment", "status": 404}
+        )
+        self.assertEqual("Not Found", results["1"].error_title)
+        self.assertEqual("No shipment", results["1"].error_detail)
+
+    def test_track_many(self):
+        self.service.track_group = self.track_group
+        numbers = ["1", "2", "X3", "4", "5"]
+        batch = self.service.track_many(numbers, group_size=2, max_concurrency=2)
+        results = batch.results()
+        self.assertEqual(sorted(numbers), sorted(results))
+        self.assertEqual([["1", "2"], ["5"], ["X3", "4"]], sorted(self.groups))
+        self.assertFalse(results["X3"].success)
+        self.assertEqual("transit", results["4"].shipments[0]["status"])
+        self.assertEqual((4, 1), (batch.tracked, batch.not_tracked))
+        self.assertEqual(3, batch.stats.count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# to run tests: python -m unittest discover -s tests
+
+import threading
+import unittest
+from unittest import mock
+
+import requests
+from requests.auth import HTTPBasicAuth
+
+from python_dhl.service import DHLService
+from python_dhl.transport import DHLRequestsTransport
+from tests.helpers import scripted_response
+
+
+def answer(session, method, url, **kwargs):
+    return scripted_response(url, 200, {"shipments": []})
+
+
+class TestRequestsTransport(unittest.TestCase):
+    def test_pool_settings(self):
+        transport = DHLRequestsTransport(
+            "key", "secret", pool_connections=3, pool_maxsize=20, pool_block=True
+        )
+        self.assertEqual(HTTPBasicAuth("key", "secret"), transport.session.auth)
+        for prefix in ("https://", "http://"):
+            adapter = transport.session.get_adapter(prefix + "express.api.dhl.com")
+            pool_manager = adapter.poolmanager
+            self.assertEqual(3, pool_manager.pools._maxsize)
+            self.assertEqual(20, pool_manager.connection_pool_kw["maxsize"])
+            self.assertTrue(pool_manager.connection_pool_kw["block"])
+            # urllib3 does not retry: the DHLRetryPolicy of the service decides
+            self.assertEqual(0, adapter.max_retries.total)
+            self.assertFalse(adapter.max_retries.read)
+        self.assertEqual("keep-alive", transport.session.headers["Connection"])
+        transport.close()
+
+    def test_without_keep_alive(self):
+        transport = DHLRequestsTransport("key", "secret", keep_alive=False)
+        self.assertEqual("close", transport.session.headers["Connection"])
+        transport.close()
+
+    def test_service_pool_settings(self):
+        with DHLService("key", "secret", "123", pool_maxsize=32) as service:
+            adapter = service.transport.session.get_adapter(
+                "https://express.api.dhl.com"
+            )
+            self.assertEqual(32, adapter.poolmanager.connection_pool_kw["maxsize"])
+
+
+class TestSessionReuse(unittest.TestCase):
+    def test_one_session_for_every_call_and_thread(self):
+        service = DHLService("key", "secret", "123")
+        with mock.patch.object(
+            requests.Session, "request", autospec=True, side_effect=answer
+        ) as request:
+            service.track_group(["1"])
+            service.check_shipment("1")
+            threads = [
+                threading.Thread(target=service.track_group, args=(["2"],))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(6, request.call_count)
+        self.assertEqual(
+            {id(service.transport.session)},
+            {id(call.args[0]) for call in request.call_args_list},
+        )
+        # the credentials are set once on the session, not on every request
+        self.assertTrue(
+            all("auth" not in call.kwargs for call in request.call_args_list)
+        )
+        service.close()
+
+    def test_close_releases_the_session(self):
+        service = DHLService("key", "secret", "123")
+        with mock.patch.object(service.transport.session, "close") as close:
+            service.close()
+        close.assert_called_once_with()
+
+        with DHLService("key", "secret", "123") as service:
+            session = service.transport.session
+            adapter = session.get_adapter("https://express.api.dhl.com")
+            adapter.poolmanager.connection_from_url("https://express.api.dhl.com")
+            self.assertEqual(1, len(adapter.poolmanager.pools))
+        # leaving the block closed the pooled connections
+        self.assertEqual(0, len(adapter.poolmanager.pools))
+
+
+if __name__ == "__main__":
+    unittest.main()
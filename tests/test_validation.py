@@ -0,0 +1,142 @@
+# to run tests: python -m unittest discover -s tests
+
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from python_dhl.exceptions import DHLValidationError
+from python_dhl.resources import address, shipment
+from python_dhl.resources.helper import (
+    AccountType,
+    ProductCode,
+    ResponseStatus,
+    ShipperType,
+)
+from python_dhl.service import DHLService
+from python_dhl.validation import SHIPMENT, DHLPayloadValidator
+
+
+class TestPayloadValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = DHLPayloadValidator()
+        self.service = DHLService(
+            "key", "secret", "123456789", validator=self.validator
+        )
+
+    def tearDown(self):
+        self.service.close()
+
+    def shipment(self, content=None, product_code="N"):
+        contact = address.DHLContactInformation(
+            full_name="Name and surname",
+            phone="+39000000000",
+            contact_type=ShipperType.BUSINESS.value,
+        )
+        postal_address = address.DHLPostalAddress(
+            street_line1="Via Roma 1",
+            postal_code="36016",
+            country_code="IT",
+            city_name="Thiene",
+        )
+        return shipment.DHLShipment(
+            accounts=[
+                shipment.DHLAccountType(type_code=AccountType.SHIPPER, number="123")
+            ],
+            sender_contact=contact,
+            sender_address=postal_address,
+            receiver_contact=contact,
+            receiver_address=postal_address,
+            ship_datetime=datetime(2024, 5, 2, 10, tzinfo=ZoneInfo("Europe/Rome")),
+            added_services=[],
+            product_code=product_code,
+            content=content or self.content(),
+            output_format=shipment.DHLShipmentOutput(
+                dpi=300, logo_file_format="png", logo_file_base64="AAAA"
+            ),
+            customer_references=["ref1"],
+        )
+
+    def content(self, weight=2, line_items=None):
+        export_declaration = None
+        if line_items is not None:
+            export_declaration = shipment.DHLExportDeclaration(
+                line_items=line_items,
+                invoice_number="INV1",
+                invoice_date="2024-05-02",
+                terms_of_payment="",
+                export_reason_type="permanent",
+            )
+        return shipment.DHLShipmentContent(
+            packages=[
+                shipment.DHLProduct(weight=weight, length=35, width=28, height=8)
+            ],
+            is_custom_declarable=line_items is not None,
+            description="Shipment test",
+            incoterm_code="DAP",
+            unit_of_measurement="metric",
+            declared_value=100 if line_items is not None else None,
+            declared_value_currency="EUR" if line_items is not None else None,
+            export_declaration=export_declaration,
+        )
+
+    def line_item(self, net_weight, gross_weight):
+        return shipment.DHLLineItem(
+            number=1,
+            description="Shoes",
+            price=50,
+            quantity_value=2,
+            quantity_unit="PCS",
+            manufacturer_country="IT",
+            net_weight=net_weight,
+            gross_weight=gross_weight,
+        )
+
+    def test_valid_payload(self):
+        payload = self.service._create_shipment(self.shipment())
+        self.assertEqual([], self.validator.errors(SHIPMENT, payload))
+
+    def test_field_errors(self):
+        payload = self.service._create_shipment(self.shipment(product_code="ZZ"))
+        del payload["customerDetails"]["receiverDetails"]["postalAddress"]["cityName"]
+        payload["content"]["packages"][0]["weight"] = 0
+        self.assertEqual(
+            [
+                "/productCode: must be one of %s"
+                % ", ".join(sorted(p.value for p in ProductCode)),
+                "/customerDetails/receiverDetails/postalAddress/cityName: is required",
+                "/content/packages/0/weight: must be greater than 0",
+            ],
+            self.validator.errors(SHIPMENT, payload),
+        )
+
+    def test_weight_consistency(self):
+        content = self.content(
+            weight=1, line_items=[self.line_item(3, 2.5), self.line_item(0.5, 1)]
+        )
+        payload = self.service._create_shipment(self.shipment(content))
+        self.assertEqual(
+            [
+                "/content/exportDeclaration/lineItems/0/weight: net weight is greater than the gross weight",
+                "/content/exportDeclaration/lineItems: net weight of the line items (3.5) is greater than the weight of the packages (1)",
+            ],
+            self.validator.errors(SHIPMENT, payload),
+        )
+
+    def test_ship_fails_without_calling_dhl(self):
+        response = self.service.ship(self.shipment(product_code="ZZ"))
+        self.assertFalse(response.success)
+        self.assertEqual(ResponseStatus.INVALID_PAYLOAD.value, response.status)
+        self.assertEqual(1, len(response.additional_error_details))
+        self.assertTrue(
+            response.additional_error_details[0].startswith("/productCode:")
+        )
+
+    def test_validation_error(self):
+        with self.assertRaises(DHLValidationError) as context:
+            self.validator.validate(SHIPMENT, {})
+        self.assertEqual(SHIPMENT, context.exception.kind)
+        self.assertEqual(5, len(context.exception.details))
+
+
+if __name__ == "__main__":
+    unittest.main()